@@ -1,4 +1,5 @@
-from flask import Flask, jsonify
+import logging
+from flask import Flask, current_app, jsonify
 from flask_login import LoginManager
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
@@ -9,7 +10,15 @@ login_manager = LoginManager()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        return cache.load(int(user_id))
+    return db.session.get(User, int(user_id))
+
+def configure_logging(app):
+    """Configure application logging"""
+    if not app.debug:
+        app.logger.setLevel(logging.INFO)
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -19,10 +28,25 @@ def create_app(config_class=Config):
     configure_logging(app)
     
     # Initialize extensions
-    db.init_app(app)
+    from .services.database import init_database
+    init_database(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
+    # Initialize the shared upstream client
+    from .services.openai_service import OpenAIService
+    from .services.rate_limiter import init_rate_limiter
+    from .services.response_cache import init_response_cache
+    from .services.user_cache import init_user_cache
+    OpenAIService(app)
+    init_response_cache(app)
+    init_rate_limiter(app)
+    init_user_cache(app)
+    
+    # Thread pool answering the items of batch requests
+    from .services.batch import init_batch_executor
+    init_batch_executor(app)
+    
     # Configure CORS
     CORS(app, resources={
         r"/api/*": {
@@ -43,10 +67,41 @@ def create_app(config_class=Config):
     app.register_blueprint(chat_bp, url_prefix='/api/chat')
     app.register_blueprint(health_bp, url_prefix='/api/health')
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-        app.logger.info("Database tables created")
+    # Compress large JSON responses
+    from .services.compression import init_compression
+    init_compression(app)
+    
+    # Register JSON error handlers
+    from .error_handlers import register_error_handlers
+    register_error_handlers(app)
+    
+    # Apply pending schema migrations; deployments running several workers
+    # turn this off and run `python -m backend.migrations` once instead
+    if app.config.get('AUTO_MIGRATE', True):
+        from .migrations import migrate_app
+        migrate_app(app)
+    
+    # Full-text search over chat messages, where the migrations created the index
+    from .services.search import init_search
+    init_search(app, db)
+    
+    # Local FAQ index answering common questions without an upstream call
+    from .services.faq_index import init_faq_index
+    init_faq_index(app)
+    
+    # Collect request, SQL and dependency metrics and slow-request diagnostics
+    from .services.metrics import init_metrics
+    from .services.profiling import init_profiling
+    init_metrics(app, db)
+    init_profiling(app, db)
+    
+    # Start write-behind persistence once the schema exists
+    from .services.message_writer import init_message_writer
+    init_message_writer(app)
+    
+    # Resume unfinished chat jobs; otherwise the runner starts on the first job
+    from .services.chat_jobs import resume_chat_jobs
+    resume_chat_jobs(app)
     
     # Add root route handler
     @app.route('/')
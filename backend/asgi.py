@@ -0,0 +1,14 @@
+"""
+ASGI entry point for serving the backend with an async server:
+
+    uvicorn backend.asgi:app --host 0.0.0.0 --port 5000 --workers 1
+
+Chat messages (`POST /api/chat/message`) are handled natively on the event
+loop, so requests waiting on the model do not hold a thread each. Every
+other route runs the unchanged Flask app on a thread pool.
+"""
+from . import create_app
+from .async_app import AsyncChatApp
+
+# Create the ASGI application
+app = AsyncChatApp(create_app())
@@ -0,0 +1,161 @@
+"""
+ASGI wrapper around the Flask app that serves selected routes with
+coroutine views; see `backend/asgi.py`.
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from .routes.chat import send_message_async
+from .services.async_openai_service import AsyncOpenAIService
+
+
+class AsyncChatApp:
+    """
+    ASGI application wrapping the Flask app.
+
+    Requests matching one of `async_routes` are dispatched to a coroutine
+    view inside a regular Flask request context, so before/after request
+    hooks, error handlers, sessions and CORS headers apply as they do for
+    the WSGI routes. Every other request runs the WSGI app on a pool of
+    `ASGI_WSGI_THREADS` threads, streaming the response body back to the
+    event loop chunk by chunk.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.async_routes = {
+            ('POST', '/api/chat/message'): send_message_async
+        }
+        self.executor = ThreadPoolExecutor(max_workers=flask_app.config.get('ASGI_WSGI_THREADS', 32),
+                                           thread_name_prefix='wsgi')
+        AsyncOpenAIService(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        body = await self._read_body(receive)
+        if body is None:
+            return  # The client disconnected before sending the body
+        environ = self._build_environ(scope, body)
+
+        view = self.async_routes.get((scope['method'], scope['path']))
+        if view is not None:
+            await self._dispatch(view, environ, send)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._run_wsgi, environ, send, loop)
+
+    @staticmethod
+    async def _lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                return bytes(body)
+
+    @staticmethod
+    def _build_environ(scope, body):
+        """Build the WSGI environ for an ASGI HTTP request"""
+        script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+        path_info = scope['path'].encode('utf8').decode('latin1')
+        if path_info.startswith(script_name):
+            path_info = path_info[len(script_name):]
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': script_name,
+            'PATH_INFO': path_info,
+            'QUERY_STRING': scope['query_string'].decode('ascii'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin1').upper().replace('-', '_')
+            if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                name = f"HTTP_{name}"
+            value = value.decode('latin1')
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+        return environ
+
+    @staticmethod
+    def _start_message(status, headers):
+        return {
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+        }
+
+    def _run_wsgi(self, environ, send, loop):
+        """Run the WSGI app on a pool thread, forwarding the response to the event loop"""
+        def sync_send(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start['message'] = self._start_message(status, headers)
+
+        result = self.flask_app(environ, start_response)
+        try:
+            sync_send(response_start['message'])
+            # Streamed responses (SSE, exports) are forwarded as they are produced
+            for chunk in result:
+                if chunk:
+                    sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            sync_send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    async def _dispatch(self, view, environ, send):
+        """Run a coroutine view through the Flask request lifecycle"""
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            # Mirrors `Flask.full_dispatch_request` with an awaited view
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view()
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+
+        try:
+            await send(self._start_message(response.status, response.headers.to_wsgi_list()))
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+        finally:
+            response.close()
+            ctx.pop(error)
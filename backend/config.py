@@ -13,10 +13,132 @@ class Config:
     # Database configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', 'true').lower() == 'true'  # Apply migrations at startup; else run `python -m backend.migrations` per deploy
+    
+    # SQLite connection pragmas, set on every connection; empty leaves the SQLite default
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # Readers and the writer no longer block each other
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # Safe with WAL; a power loss may drop the last commits
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))  # Wait this long for a lock before "database is locked"
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # Bytes of the file read through mmap
+    
+    # Connection pool for server databases (Postgres, MySQL)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Seconds; keep below the server's idle timeout
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    
+    # Chat history pagination
+    CHAT_HISTORY_PAGE_SIZE = int(os.getenv('CHAT_HISTORY_PAGE_SIZE', '50'))
+    CHAT_HISTORY_MAX_PAGE_SIZE = int(os.getenv('CHAT_HISTORY_MAX_PAGE_SIZE', '200'))
+    CHAT_EXPORT_BATCH_SIZE = int(os.getenv('CHAT_EXPORT_BATCH_SIZE', '1000'))
+    
+    # Chat history search
+    SEARCH_FTS_ENABLED = os.getenv('SEARCH_FTS_ENABLED', 'true').lower() == 'true'  # SQLite FTS5 index, else LIKE scans
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+    SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '100'))
+    
+    # Batch chat requests
+    CHAT_BATCH_MAX_ITEMS = int(os.getenv('CHAT_BATCH_MAX_ITEMS', '50'))
+    CHAT_BATCH_MAX_WORKERS = int(os.getenv('CHAT_BATCH_MAX_WORKERS', '50'))  # Items answered at once, per process; upstream calls stay capped by OPENAI_MAX_CONCURRENT_REQUESTS
+    
+    # Background chat jobs (/api/chat/jobs)
+    CHAT_JOBS_WORKERS = int(os.getenv('CHAT_JOBS_WORKERS', '4'))  # Jobs answered at once, per process, from its first job on; 0 leaves them to other processes
+    CHAT_JOBS_LEASE_SECONDS = int(os.getenv('CHAT_JOBS_LEASE_SECONDS', '120'))  # A job whose worker stops renewing this is claimed again
+    CHAT_JOBS_MAX_ATTEMPTS = int(os.getenv('CHAT_JOBS_MAX_ATTEMPTS', '3'))  # Claims before a repeatedly interrupted job fails
+    CHAT_JOBS_POLL_INTERVAL = float(os.getenv('CHAT_JOBS_POLL_INTERVAL', '1.0'))  # Seconds between checks for jobs queued by other processes
+    CHAT_JOBS_MAX_WAIT = float(os.getenv('CHAT_JOBS_MAX_WAIT', '25'))  # Longest long-poll, in seconds
+    CHAT_JOBS_MAX_PENDING_PER_USER = int(os.getenv('CHAT_JOBS_MAX_PENDING_PER_USER', '20'))
+    
+    # Response compression
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # Bytes; smaller responses are sent as is
+    COMPRESSION_MIMETYPES = ['application/json']
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))  # Used when the brotli package is installed
+    
+    # Write-behind persistence of chat messages
+    CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'false').lower() == 'true'
+    CHAT_WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('CHAT_WRITE_BEHIND_QUEUE_SIZE', '10000'))
+    CHAT_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('CHAT_WRITE_BEHIND_BATCH_SIZE', '500'))
+    CHAT_WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('CHAT_WRITE_BEHIND_FLUSH_INTERVAL', '0.05'))
+    CHAT_WRITE_BEHIND_PUT_TIMEOUT = float(os.getenv('CHAT_WRITE_BEHIND_PUT_TIMEOUT', '1.0'))
+    CHAT_WRITE_BEHIND_WORKER_ID = int(os.environ['CHAT_WRITE_BEHIND_WORKER_ID']) if os.getenv('CHAT_WRITE_BEHIND_WORKER_ID') else None  # 0-255, unique per process; unset leases one from the database
+    CHAT_WRITE_BEHIND_DEAD_LETTER_PATH = os.getenv('CHAT_WRITE_BEHIND_DEAD_LETTER_PATH')  # Messages that could not be written; defaults to the instance folder
     
     # OpenAI configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # Override for OpenAI-compatible servers
+    OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+    OPENAI_RETRY_BASE_DELAY = float(os.getenv('OPENAI_RETRY_BASE_DELAY', '0.5'))
+    OPENAI_RETRY_MAX_DELAY = float(os.getenv('OPENAI_RETRY_MAX_DELAY', '8'))
+    OPENAI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('OPENAI_CIRCUIT_FAILURE_THRESHOLD', '5'))
+    OPENAI_CIRCUIT_RESET_TIMEOUT = float(os.getenv('OPENAI_CIRCUIT_RESET_TIMEOUT', '30'))
+    
+    # PHI redaction of everything sent upstream (backend/utils/redaction.py)
+    REDACTION_ENABLED = os.getenv('REDACTION_ENABLED', 'true').lower() == 'true'
+    REDACTION_RULES = [rule.strip() for rule in os.getenv('REDACTION_RULES', 'email,ssn,mrn,dob,phone,name').split(',') if rule.strip()]
+    REDACTION_RESTORE = os.getenv('REDACTION_RESTORE', 'true').lower() == 'true'  # Put the masked values back into replies
+    
+    # Upstream concurrency limits
+    OPENAI_MAX_CONCURRENT_REQUESTS = int(os.getenv('OPENAI_MAX_CONCURRENT_REQUESTS', '10'))
+    OPENAI_QUEUE_TIMEOUT = float(os.getenv('OPENAI_QUEUE_TIMEOUT', '30'))  # 0 rejects immediately with 503
+    OPENAI_COALESCE_REQUESTS = os.getenv('OPENAI_COALESCE_REQUESTS', 'true').lower() == 'true'
+    
+    # ASGI serving (backend/asgi.py)
+    OPENAI_ASYNC_MAX_CONCURRENT_REQUESTS = int(os.getenv('OPENAI_ASYNC_MAX_CONCURRENT_REQUESTS', '500'))
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '32'))  # Threads running the sync routes
+    
+    # Conversation context window
+    CONTEXT_ENABLED = os.getenv('CONTEXT_ENABLED', 'true').lower() == 'true'
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '3000'))  # Estimated prompt tokens per request
+    CONTEXT_MAX_MESSAGES = int(os.getenv('CONTEXT_MAX_MESSAGES', '200'))  # Recent messages loaded per request
+    CONTEXT_SUMMARY_ENABLED = os.getenv('CONTEXT_SUMMARY_ENABLED', 'true').lower() == 'true'
+    CONTEXT_SUMMARY_MODEL = os.getenv('CONTEXT_SUMMARY_MODEL') or OPENAI_MODEL
+    CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv('CONTEXT_SUMMARY_MAX_TOKENS', '300'))
+    CONTEXT_SUMMARY_KEEP_RATIO = float(os.getenv('CONTEXT_SUMMARY_KEEP_RATIO', '0.5'))  # Share of the budget kept verbatim after folding
+    
+    # Local FAQ retrieval (index built with `python -m backend.services.faq_index build`)
+    FAQ_INDEX_PATH = os.getenv('FAQ_INDEX_PATH')  # Index directory; unset disables the FAQ tier
+    FAQ_INDEX_MMAP = os.getenv('FAQ_INDEX_MMAP', 'true').lower() == 'true'  # Share the matrix pages between workers
+    FAQ_ANSWER_THRESHOLD = float(os.getenv('FAQ_ANSWER_THRESHOLD', '0.8'))  # Cosine similarity to answer from the FAQ
+    FAQ_CONTEXT_TOP_K = int(os.getenv('FAQ_CONTEXT_TOP_K', '3'))  # Related entries added to prompts, 0 disables
+    FAQ_CONTEXT_MIN_SCORE = float(os.getenv('FAQ_CONTEXT_MIN_SCORE', '0.3'))
+    
+    # Session user cache
+    USER_CACHE_ENABLED = os.getenv('USER_CACHE_ENABLED', 'true').lower() == 'true'
+    USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '1024'))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '60'))  # Seconds
+    
+    # Rate limiting of chat requests, per user or per IP for anonymous callers
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # memory or sqlite
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH')  # SQLite file, defaults to the instance folder
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))  # Buckets kept by the memory backend; least recently used are evicted
+    RATE_LIMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_PER_MINUTE', '30'))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '10'))
+    RATE_LIMIT_BATCH_ITEMS_PER_MINUTE = float(os.getenv('RATE_LIMIT_BATCH_ITEMS_PER_MINUTE', '100'))  # Batch items; each caller's bucket holds CHAT_BATCH_MAX_ITEMS
+    
+    # Response cache configuration
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')  # memory, sqlite or none
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '3600'))  # Seconds
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH')  # SQLite file, defaults to the instance folder
+    
+    # Metrics exposed at /api/health/metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')  # Shared directory for multi-worker servers
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+    
+    # Request profiling and slow-request diagnostics
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # Fraction of requests profiled without a token
+    PROFILE_TOKEN_MAX_AGE = int(os.getenv('PROFILE_TOKEN_MAX_AGE', '3600'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR')  # Defaults to the instance folder
+    SLOW_REQUEST_THRESHOLD_MS = float(os.getenv('SLOW_REQUEST_THRESHOLD_MS', '2000'))  # 0 disables the slow-request log
+    REPEATED_QUERY_THRESHOLD = int(os.getenv('REPEATED_QUERY_THRESHOLD', '3'))
     
     # Additional configuration
     CORS_SUPPORTS_CREDENTIALS = True
@@ -33,10 +33,15 @@ def register_error_handlers(app):
     
     @app.errorhandler(429)
     def too_many_requests(error):
-        return jsonify({
+        response = jsonify({
             'error': 'Too many requests',
             'message': 'Rate limit exceeded. Please try again later.'
-        }), 429
+        })
+        response.status_code = 429
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            response.headers['Retry-After'] = str(retry_after)
+        return response
     
     @app.errorhandler(500)
     def internal_server_error(error):
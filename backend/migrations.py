@@ -0,0 +1,228 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once per database; the applied versions are recorded
+in the `schema_migrations` table. Run them once per deploy, before the new
+workers start:
+
+    python -m backend.migrations            # apply pending migrations
+    python -m backend.migrations --status   # show applied and pending versions
+
+With `AUTO_MIGRATE` on (the default, convenient for development)
+`create_app` applies pending migrations itself, which costs one query per
+boot once the schema is current. Turn it off for multi-worker deployments
+so workers never touch the schema.
+
+Databases created before this table existed already have most of the
+schema but no recorded versions, so every migration checks for what it
+creates before creating it.
+"""
+import argparse
+from datetime import datetime
+from flask import Flask
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, inspect, select
+from sqlalchemy.exc import IntegrityError
+from .config import Config
+from .models import db
+from .services.database import init_database
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(120), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def _add_column(connection, table_name, column_name, definition):
+    if column_name not in {column['name'] for column in inspect(connection).get_columns(table_name)}:
+        connection.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+
+
+# Tables as each migration creates them, frozen: never edit these to
+# follow the models, add a migration instead
+_frozen = MetaData()
+
+_users = Table(
+    'users', _frozen,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(80), unique=True, nullable=False),
+    Column('email', String(120), unique=True, nullable=False),
+    Column('password_hash', String(128))
+)
+
+_chat_messages = Table(
+    'chat_messages', _frozen,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=True),
+    Column('content', Text, nullable=False),
+    Column('is_bot', Boolean),
+    Column('timestamp', DateTime)
+)
+
+_conversations = Table(
+    'conversations', _frozen,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('title', String(120), nullable=False),
+    Column('created_at', DateTime),
+    Column('last_message_at', DateTime, nullable=False),
+    Column('last_message_preview', String(200), nullable=False),
+    Column('message_count', Integer, nullable=False),
+    Column('summary', Text, nullable=True),
+    Column('summary_through_timestamp', DateTime, nullable=True),
+    Column('summary_through_message_id', Integer, nullable=True),
+    Column('summary_folded_tokens', Integer, nullable=False)
+)
+
+_chat_jobs = Table(
+    'chat_jobs', _frozen,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('conversation_id', Integer, ForeignKey('conversations.id'), nullable=False),
+    Column('message', Text, nullable=False),
+    Column('status', String(16), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('lease_owner', String(120), nullable=True),
+    Column('lease_expires_at', DateTime, nullable=True),
+    Column('result', Text, nullable=True),
+    Column('message_id', Integer, nullable=True),
+    Column('error', Text, nullable=True),
+    Column('error_type', String(40), nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('finished_at', DateTime, nullable=True)
+)
+
+_message_writer_workers = Table(
+    'message_writer_workers', _frozen,
+    Column('worker_id', Integer, primary_key=True),
+    Column('owner', String(120), nullable=False),
+    Column('heartbeat_at', DateTime, nullable=False)
+)
+
+
+def _create_index(connection, name, table_name, columns):
+    connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table_name} ({', '.join(columns)})")
+
+
+def _create_tables(connection):
+    # The schema of the first release
+    for table in (_users, _chat_messages):
+        table.create(connection, checkfirst=True)
+
+
+def _add_conversation_id(connection):
+    _conversations.create(connection, checkfirst=True)
+    # Messages saved before conversations existed keep a NULL thread
+    _add_column(connection, 'chat_messages', 'conversation_id', "INTEGER REFERENCES conversations (id)")
+
+
+def _add_history_version(connection):
+    _add_column(connection, 'users', 'history_version', "INTEGER NOT NULL DEFAULT 0")
+
+
+def _create_indexes(connection):
+    _create_index(connection, 'ix_chat_messages_user_timestamp_id', 'chat_messages', ('user_id', 'timestamp', 'id'))
+    _create_index(connection, 'ix_chat_messages_conversation_timestamp_id', 'chat_messages',
+                  ('conversation_id', 'timestamp', 'id'))
+    _create_index(connection, 'ix_conversations_user_last_message_id', 'conversations',
+                  ('user_id', 'last_message_at', 'id'))
+
+
+def _create_message_fts(connection):
+    from .services.search import create_fts_index
+    create_fts_index(connection)
+
+
+def _create_chat_jobs(connection):
+    _chat_jobs.create(connection, checkfirst=True)
+    _create_index(connection, 'ix_chat_jobs_status_id', 'chat_jobs', ('status', 'id'))
+    _create_index(connection, 'ix_chat_jobs_user_status', 'chat_jobs', ('user_id', 'status'))
+
+
+def _create_message_writer_workers(connection):
+    _message_writer_workers.create(connection, checkfirst=True)
+
+
+# (version, name, function taking a connection); append only, never renumber
+MIGRATIONS = [
+    (1, 'create tables', _create_tables),
+    (2, 'create conversations and add chat_messages.conversation_id', _add_conversation_id),
+    (3, 'add users.history_version', _add_history_version),
+    (4, 'create conversation and message indexes', _create_indexes),
+    (5, 'create chat_messages_fts', _create_message_fts),
+    (6, 'create chat_jobs', _create_chat_jobs),
+    (7, 'create message_writer_workers', _create_message_writer_workers),
+]
+
+
+def applied_versions(engine):
+    """Return the set of migration versions applied to the database"""
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(schema_migrations.name):
+            return set()
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine, logger=None):
+    """
+    Apply pending migrations in order, each in its own transaction with
+    the row recording it.
+
+    A migration applied concurrently by another process is skipped: the
+    steps check for what they create, and the version row is only
+    recorded once.
+
+    Returns:
+        list: Versions applied by this call
+    """
+    done = applied_versions(engine)
+    pending = [migration for migration in MIGRATIONS if migration[0] not in done]
+    if pending:
+        with engine.begin() as connection:
+            schema_migrations.create(connection, checkfirst=True)
+
+    applied = []
+    for version, name, migrate in pending:
+        try:
+            with engine.begin() as connection:
+                migrate(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            continue  # Recorded by another process first
+        applied.append(version)
+        if logger is not None:
+            logger.info(f"Applied migration {version}: {name}")
+    return applied
+
+
+def migrate_app(app):
+    """Apply pending migrations to the database of `app`"""
+    with app.app_context():
+        return upgrade(db.engine, app.logger)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply versioned database migrations')
+    parser.add_argument('--status', action='store_true', help='List applied and pending migrations without applying them')
+    args = parser.parse_args(argv)
+
+    # A bare app: enough for the database URI and instance folder, without
+    # starting any of the services `create_app` does
+    app = Flask(__package__)
+    app.config.from_object(Config)
+    init_database(app, db)
+    with app.app_context():
+        if args.status:
+            applied = applied_versions(db.engine)
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:4d}  {'applied' if version in applied else 'pending':7s}  {name}")
+            return
+        versions = upgrade(db.engine)
+    print(f"Applied migrations {', '.join(map(str, versions))}" if versions else "Database schema is up to date")
+
+
+if __name__ == '__main__':
+    main()
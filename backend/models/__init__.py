@@ -12,6 +12,8 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
+    # Bumped whenever the user's chat history changes; the ETag of history responses
+    history_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -19,6 +21,8 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+from .conversation import Conversation
 from .chat_message import ChatMessage
+from .chat_job import ChatJob
 
-__all__ = ['db', 'User', 'ChatMessage']
+__all__ = ['db', 'User', 'Conversation', 'ChatMessage', 'ChatJob']
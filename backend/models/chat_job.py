@@ -0,0 +1,53 @@
+from datetime import datetime
+from . import db
+
+class ChatJob(db.Model):
+    """
+    A chat message answered in the background. Jobs are claimed by the
+    worker pool of any process under a lease that its owner renews while
+    generating, so a job whose worker died is claimed again once the lease
+    runs out.
+    """
+    __tablename__ = 'chat_jobs'
+    __table_args__ = (
+        # Backs claiming the oldest queued job and finding expired leases
+        db.Index('ix_chat_jobs_status_id', 'status', 'id'),
+        # Backs counting a user's unfinished jobs
+        db.Index('ix_chat_jobs_user_status', 'user_id', 'status'),
+    )
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    FINISHED = (SUCCEEDED, FAILED)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    lease_owner = db.Column(db.String(120), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    # The saved bot message; null until the reply is saved
+    message_id = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    error_type = db.Column(db.String(40), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'conversation_id': self.conversation_id,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if self.status == self.SUCCEEDED:
+            data.update(message=self.result, message_id=self.message_id)
+        elif self.status == self.FAILED:
+            data.update(error=self.error, error_type=self.error_type)
+        return data
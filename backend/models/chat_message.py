@@ -4,9 +4,17 @@ from . import db
 class ChatMessage(db.Model):
     """Model for storing chat messages"""
     __tablename__ = 'chat_messages'
+    __table_args__ = (
+        # Backs keyset pagination of a user's history on (timestamp, id)
+        db.Index('ix_chat_messages_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+        # Backs fetching one thread and building its context window
+        db.Index('ix_chat_messages_conversation_timestamp_id', 'conversation_id', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    # Null for messages saved before conversations existed
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=True)
     content = db.Column(db.Text, nullable=False)
     is_bot = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -15,7 +23,25 @@ class ChatMessage(db.Model):
         return {
             'id': self.id,
             'user_id': self.user_id,
+            'conversation_id': self.conversation_id,
             'content': self.content,
             'is_bot': self.is_bot,
             'timestamp': self.timestamp.isoformat()
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def columns(cls):
+        """Columns selected for lightweight row projections"""
+        return (cls.id, cls.user_id, cls.conversation_id, cls.content, cls.is_bot, cls.timestamp)
+
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a row selected with `columns()` like `to_dict()`"""
+        return {
+            'id': row.id,
+            'user_id': row.user_id,
+            'conversation_id': row.conversation_id,
+            'content': row.content,
+            'is_bot': row.is_bot,
+            'timestamp': row.timestamp.isoformat()
+        }
@@ -0,0 +1,56 @@
+from datetime import datetime
+from . import db
+
+class Conversation(db.Model):
+    """
+    A chat thread. The last message time, preview and message count are
+    denormalized from its messages and updated in the same transaction as
+    every insert, so listing threads never touches `chat_messages`.
+    """
+    __tablename__ = 'conversations'
+    __table_args__ = (
+        # Backs keyset pagination of a user's threads, most recently active first
+        db.Index('ix_conversations_user_last_message_id', 'user_id', 'last_message_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    title = db.Column(db.String(120), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_message_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_message_preview = db.Column(db.String(200), nullable=False, default='')
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    # Rolling summary of the messages older than the context window, up to
+    # the (timestamp, id) position of the last message folded into it
+    summary = db.Column(db.Text, nullable=True)
+    summary_through_timestamp = db.Column(db.DateTime, nullable=True)
+    summary_through_message_id = db.Column(db.Integer, nullable=True)
+    # Estimated prompt tokens of all folded messages, for the tokens-saved metrics
+    summary_folded_tokens = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'created_at': self.created_at.isoformat(),
+            'last_message_at': self.last_message_at.isoformat(),
+            'last_message_preview': self.last_message_preview,
+            'message_count': self.message_count
+        }
+
+    @classmethod
+    def columns(cls):
+        """Columns selected for listing threads"""
+        return (cls.id, cls.title, cls.created_at, cls.last_message_at, cls.last_message_preview, cls.message_count)
+
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a row selected with `columns()` like `to_dict()`"""
+        return {
+            'id': row.id,
+            'title': row.title,
+            'created_at': row.created_at.isoformat(),
+            'last_message_at': row.last_message_at.isoformat(),
+            'last_message_preview': row.last_message_preview,
+            'message_count': row.message_count
+        }
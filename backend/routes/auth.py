@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from ..models import User
 from .. import db
+from ..services.user_cache import invalidate_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -86,6 +87,7 @@ def login():
 def logout():
     """Log out a user"""
     try:
+        invalidate_user(current_user.id)
         logout_user()
         return jsonify({'message': 'Logout successful'}), 200
     except Exception as e:
@@ -1,112 +1,587 @@
-from flask import Blueprint, request, jsonify, current_app
+import asyncio
+import json
+import zlib
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_login import login_required, current_user
-from ..models import ChatMessage
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import NotFound
+from ..models import ChatMessage, Conversation
 from .. import db
-from ..services.openai_service import get_openai_response
+from ..utils.helpers import decode_cursor, encode_cursor
+from ..services.batch import get_chat_responses
+from ..services.chat_jobs import TooManyJobs, submit_chat_job, wait_for_chat_job
+from ..services.message_writer import save_exchange, save_exchanges
+from ..services.errors import UpstreamError
+from ..services.history_version import bump_history_versions, conditional_history
+from ..services.async_openai_service import get_chat_response_async
+from ..services.context_window import build_context, discard_summary_if_folded
+from ..services.conversations import get_conversation, latest_conversation, record_deletion
+from ..services.openai_service import get_chat_response, stream_openai_response
+from ..services.rate_limiter import rate_limit_key, rate_limited
+from ..services.search import make_snippet, search_terms
 
 chat_bp = Blueprint('chat', __name__)
 
 @chat_bp.route('/message', methods=['POST'])
+@rate_limited
 def send_message():
     """
     Process a chat message from the user and get a response from OpenAI.
+
+    Authenticated users' messages go to the thread given by
+    `conversation_id`, to a new thread with `new_conversation`, or else to
+    their most recently active thread.
     """
     data = request.get_json()
     
     if not data or not data.get('message'):
         return jsonify({'error': 'Message is required'}), 400
     
+    conversation = _find_conversation(data)
+
     # Get response from OpenAI
     try:
         # Get response from OpenAI first to avoid saving failed messages
-        bot_response = get_openai_response(data['message'])
-        
-        # Define error phrases that indicate different types of errors
-        service_errors = [
-            "service configuration error",
-            "service authentication error",
-            "contact support"
-        ]
-        temporary_errors = [
-            "high demand",
-            "temporarily unavailable",
-            "try again in a few moments",
-            "try again in a minute"
-        ]
-        
-        # Check for different types of error responses
-        response_lower = bot_response.lower()
-        if any(error in response_lower for error in service_errors):
-            return jsonify({
-                'error': bot_response,
-                'error_type': 'service_error'
-            }), 500
-        elif any(error in response_lower for error in temporary_errors):
-            return jsonify({
-                'error': bot_response,
-                'error_type': 'temporary_error'
-            }), 503
-
-        # Process authenticated users
-        if hasattr(current_user, 'is_authenticated') and current_user.is_authenticated:
+        context = _conversation_context(conversation, data['message'])
+        try:
+            chat_response = get_chat_response(data['message'], context)
+        except UpstreamError as e:
+            current_app.logger.warning(f"Upstream error in send_message: {type(e).__name__}")
+            return upstream_error_response(e)
+
+        return _exchange_response(conversation, data['message'], chat_response)
+            
+    except Exception as e:
+        current_app.logger.error(f"Error in send_message: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+async def send_message_async():
+    """
+    Async version of `send_message`, served by the ASGI entry point
+    (`backend/asgi.py`). The upstream call is awaited instead of holding a
+    thread, and the messages are saved on a worker thread.
+    """
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is not None:
+        limiter.check(rate_limit_key())
+
+    data = request.get_json()
+
+    if not data or not data.get('message'):
+        return jsonify({'error': 'Message is required'}), 400
+
+    conversation = await asyncio.to_thread(_find_conversation, data)
+
+    try:
+        # Loading history and folding the summary block, so run them on a worker thread
+        context = await asyncio.to_thread(_conversation_context, conversation, data['message'])
+        try:
+            chat_response = await get_chat_response_async(data['message'], context)
+        except UpstreamError as e:
+            current_app.logger.warning(f"Upstream error in send_message: {type(e).__name__}")
+            return upstream_error_response(e)
+
+        # The worker thread sees this request's context through the copied contextvars
+        return await asyncio.to_thread(_exchange_response, conversation, data['message'], chat_response)
+
+    except Exception as e:
+        current_app.logger.error(f"Error in send_message: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _find_conversation(data):
+    """
+    Resolve the thread a message is sent in: the `conversation_id` of the
+    request, None for a new thread (`new_conversation`) or for guests, or
+    else the user's most recently active thread.
+
+    Raises:
+        NotFound: If `conversation_id` is not one of the user's threads
+    """
+    if not current_user.is_authenticated or data.get('new_conversation'):
+        return None
+    if data.get('conversation_id') is not None:
+        conversation = get_conversation(current_user.id, data['conversation_id'])
+        if conversation is None:
+            raise NotFound()
+        return conversation
+    return latest_conversation(current_user.id)
+
+def _conversation_context(conversation, user_text):
+    """Build the context of a thread, or None for new threads and guests"""
+    if conversation is None:
+        return None
+    try:
+        return build_context(conversation, user_text)
+    except SQLAlchemyError as e:
+        # Answer without context rather than failing the message
+        db.session.rollback()
+        current_app.logger.error(f"Database error when loading conversation context: {str(e)}")
+        return None
+
+def _exchange_response(conversation, user_text, chat_response):
+    """Save the exchange for authenticated users and build the JSON reply"""
+    bot_response = chat_response.content
+    message_id = 0
+    conversation_id = conversation.id if conversation is not None else None
+
+    # Process authenticated users
+    if hasattr(current_user, 'is_authenticated') and current_user.is_authenticated:
+        try:
+            # Save user and bot messages to database
+            message_id, conversation_id = save_exchange(current_user.id, user_text, bot_response, conversation_id)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Database error when saving messages: {str(e)}")
+            # Still return the response even if saving to DB failed
+
+    return jsonify({
+        'message': bot_response,
+        'message_id': message_id,
+        'conversation_id': conversation_id,
+        'cached': chat_response.cached,
+        'faq_id': chat_response.faq_id
+    }), 200
+
+def upstream_error_response(error):
+    """Build the JSON error response for a failed upstream call"""
+    response = jsonify({
+        'error': error.message,
+        'error_type': error.error_type
+    })
+    response.status_code = error.status_code
+    if error.retry_after:
+        response.headers['Retry-After'] = str(int(error.retry_after))
+    return response
+
+def _sse_event(data, event=None):
+    """Format a payload as a Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+@chat_bp.route('/stream', methods=['POST'])
+@rate_limited
+def stream_message():
+    """
+    Process a chat message from the user and stream the response from OpenAI
+    as Server-Sent Events.
+
+    Each content delta is sent as a `data: {"delta": ...}` frame. The stream
+    ends with a `done` event carrying the saved message and conversation
+    ids, or an `error` event if the upstream call failed. Messages are only
+    saved once the completion has finished. Threads are chosen as in
+    `send_message`.
+    """
+    data = request.get_json()
+
+    if not data or not data.get('message'):
+        return jsonify({'error': 'Message is required'}), 400
+
+    user_text = data['message']
+    user_id = current_user.id if current_user.is_authenticated else None
+    conversation = _find_conversation(data)
+    conversation_id = conversation.id if conversation is not None else None
+
+    try:
+        deltas = stream_openai_response(user_text, _conversation_context(conversation, user_text))
+    except UpstreamError as e:
+        current_app.logger.warning(f"Upstream error in stream_message: {type(e).__name__}")
+        return upstream_error_response(e)
+    except Exception as e:
+        current_app.logger.error(f"Error in stream_message: {str(e)}")
+        return jsonify({'error': str(e), 'error_type': 'service_error'}), 500
+
+    def generate():
+        chunks = []
+        try:
+            for delta in deltas:
+                chunks.append(delta)
+                yield _sse_event({'delta': delta})
+        except UpstreamError as e:
+            current_app.logger.warning(f"Upstream error in stream_message: {type(e).__name__}")
+            yield _sse_event({'error': e.message, 'error_type': e.error_type}, event='error')
+            return
+        except Exception as e:
+            current_app.logger.error(f"Error in stream_message: {str(e)}")
+            yield _sse_event({'error': str(e)}, event='error')
+            return
+
+        bot_response = ''.join(chunks).strip()
+        message_id = 0
+        saved_conversation_id = conversation_id
+
+        if user_id is not None:
             try:
-                # Save user message to database
-                user_message = ChatMessage(
-                    user_id=current_user.id,
-                    content=data['message'],
-                    is_bot=False
-                )
-                db.session.add(user_message)
-                db.session.flush()  # Get user message ID
-
-                # Save bot message to database
-                bot_message = ChatMessage(
-                    user_id=current_user.id,
-                    content=bot_response,
-                    is_bot=True
-                )
-                db.session.add(bot_message)
-                db.session.commit()  # Commit both messages
-
-                return jsonify({
-                    'message': bot_response,
-                    'message_id': bot_message.id
-                }), 200
+                # Save both messages in a single transaction
+                message_id, saved_conversation_id = save_exchange(user_id, user_text, bot_response, conversation_id)
             except Exception as e:
                 db.session.rollback()
-                current_app.logger.error(f"Database error when saving messages: {str(e)}")
-                # Still return the response even if saving to DB failed
-                return jsonify({
-                    'message': bot_response,
-                    'message_id': 0
-                }), 200
+                current_app.logger.error(f"Database error when saving streamed messages: {str(e)}")
+
+        yield _sse_event({'message_id': message_id, 'conversation_id': saved_conversation_id}, event='done')
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable proxy buffering
+    return response
+
+@chat_bp.route('/batch', methods=['POST'])
+def send_batch():
+    """
+    Answer a list of messages concurrently, e.g. the questions of a
+    questionnaire.
+
+    Items are answered independently, without conversation context, on a
+    pool of `CHAT_BATCH_MAX_WORKERS` threads, and returned in order. Each
+    result has its own `status`: 200 with the reply, or the error status and
+    message of that item. Answered items of authenticated users are saved
+    with one bulk insert, in the thread chosen as in `send_message`.
+
+    A batch spends one token of the caller's request rate limit, and one
+    token per item from a separate bucket of `CHAT_BATCH_MAX_ITEMS` tokens
+    refilled at `RATE_LIMIT_BATCH_ITEMS_PER_MINUTE`.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'A JSON object is required'}), 400
+    messages = data.get('messages')
+
+    if not isinstance(messages, list) or not messages:
+        return jsonify({'error': 'A non-empty list of messages is required'}), 400
+    max_items = current_app.config.get('CHAT_BATCH_MAX_ITEMS', 50)
+    if len(messages) > max_items:
+        return jsonify({'error': f'At most {max_items} messages per batch'}), 400
+
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is not None:
+        limiter.check(rate_limit_key())
+        current_app.extensions['batch_rate_limiter'].check(rate_limit_key(), cost=len(messages))
+
+    conversation = _find_conversation(data)
+    conversation_id = conversation.id if conversation is not None else None
+
+    results = [None] * len(messages)
+    pending = []
+    for index, message in enumerate(messages):
+        if isinstance(message, str) and message.strip():
+            pending.append(index)
         else:
-            # Return response without database entry for unauthenticated users
-            return jsonify({
-                'message': bot_response,
-                'message_id': 0
-            }), 200
-            
+            results[index] = {'status': 400, 'error': 'Message is required', 'error_type': 'invalid_request'}
+
+    answered = []
+    for index, outcome in zip(pending, get_chat_responses([messages[index] for index in pending])):
+        if isinstance(outcome, UpstreamError):
+            current_app.logger.warning(f"Upstream error in send_batch: {type(outcome).__name__}")
+            results[index] = {'status': outcome.status_code, 'error': outcome.message, 'error_type': outcome.error_type}
+            if outcome.retry_after:
+                results[index]['retry_after'] = int(outcome.retry_after)
+        elif isinstance(outcome, Exception):
+            current_app.logger.error(f"Error in send_batch: {str(outcome)}")
+            results[index] = {'status': 500, 'error': str(outcome), 'error_type': 'service_error'}
+        else:
+            results[index] = {'status': 200, 'message': outcome.content, 'message_id': 0,
+                              'cached': outcome.cached, 'faq_id': outcome.faq_id}
+            answered.append(index)
+
+    if answered and current_user.is_authenticated:
+        try:
+            message_ids, conversation_id = save_exchanges(
+                current_user.id, [(messages[index], results[index]['message']) for index in answered], conversation_id
+            )
+            for index, message_id in zip(answered, message_ids):
+                results[index]['message_id'] = message_id
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Database error when saving batch messages: {str(e)}")
+
+    return jsonify({'results': results, 'conversation_id': conversation_id}), 200
+
+@chat_bp.route('/jobs', methods=['POST'])
+@login_required
+@rate_limited
+def submit_job():
+    """
+    Queue a message to be answered in the background and return its job
+    right away with status 202, for clients that cannot hold a connection
+    open while the model answers.
+
+    Threads are chosen as in `send_message`; when a new one is needed it is
+    created now. Poll `GET /jobs/<id>` for the result, which is also saved
+    to the thread like any other exchange.
+    """
+    data = request.get_json()
+
+    if not data or not data.get('message'):
+        return jsonify({'error': 'Message is required'}), 400
+
+    conversation = _find_conversation(data)
+    try:
+        job = submit_chat_job(current_user.id, data['message'], conversation.id if conversation is not None else None)
+    except TooManyJobs:
+        return jsonify({'error': 'Too many unfinished jobs', 'error_type': 'too_many_jobs'}), 429
     except Exception as e:
-        current_app.logger.error(f"Error in send_message: {str(e)}")
+        db.session.rollback()
+        current_app.logger.error(f"Error in submit_job: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = f"{request.path}/{job.id}"
+    return response
+
+@chat_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """
+    Get a background job of the authenticated user: its status (`queued`,
+    `running`, `succeeded` or `failed`) and, once finished, the reply and
+    its `message_id` or the error.
+
+    With `wait=<seconds>` the request long-polls: it returns as soon as the
+    job finishes, or unfinished after `wait` seconds (at most
+    `CHAT_JOBS_MAX_WAIT`).
+    """
+    wait = min(max(request.args.get('wait', 0, type=float), 0), current_app.config.get('CHAT_JOBS_MAX_WAIT', 25))
+    try:
+        job = wait_for_chat_job(current_user.id, job_id, wait)
+    except Exception as e:
+        current_app.logger.error(f"Error in get_job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
 @chat_bp.route('/history', methods=['GET'])
 @login_required
+@conditional_history
 def get_chat_history():
-    """Get chat history for the authenticated user"""
+    """
+    Get chat history for the authenticated user.
+
+    Without query parameters the full history is returned. With `limit`,
+    `before` or `after` a single page is returned using keyset pagination
+    on (timestamp, id):
+
+    - `limit` alone returns the most recent messages
+    - `before=<cursor>` returns messages older than the cursor
+    - `after=<cursor>` returns messages newer than the cursor
+
+    Pages are always in chronological order and include `before_cursor` /
+    `after_cursor` for fetching the neighbouring pages.
+
+    Responses carry a weak ETag of the user's history version; polling
+    clients send it back in `If-None-Match` and get 304 Not Modified until
+    a message is added or deleted.
+    """
     try:
-        # Get chat history for current user
-        messages = ChatMessage.query.filter_by(user_id=current_user.id).order_by(ChatMessage.timestamp).all()
-        
-        # Format messages
-        history = [message.to_dict() for message in messages]
-        
-        return jsonify({'history': history}), 200
+        query = select(*ChatMessage.columns()).where(ChatMessage.user_id == current_user.id)
+        page, error = _message_page(query)
+        if error is not None:
+            return jsonify({'error': error}), 400
+        return jsonify(page), 200
     except Exception as e:
         current_app.logger.error(f"Error in get_chat_history: {str(e)}")
         return jsonify({'error': str(e), 'history': []}), 500
 
+def _message_page(query):
+    """
+    Fetch the messages selected by `query` as described for
+    `get_chat_history`, reading `limit`, `before` and `after` from the
+    request.
+
+    Returns:
+        tuple: The response payload, or None and an error message for
+        invalid parameters
+    """
+    before = request.args.get('before')
+    after = request.args.get('after')
+    limit = request.args.get('limit', type=int)
+
+    if before is None and after is None and limit is None:
+        # Full history, projected to plain rows without ORM hydration
+        rows = db.session.execute(query.order_by(ChatMessage.timestamp, ChatMessage.id)).all()
+        return {'history': [ChatMessage.row_to_dict(row) for row in rows]}, None
+
+    if before is not None and after is not None:
+        return None, 'Use either before or after, not both'
+
+    max_limit = current_app.config.get('CHAT_HISTORY_MAX_PAGE_SIZE', 200)
+    limit = min(max(limit or current_app.config.get('CHAT_HISTORY_PAGE_SIZE', 50), 1), max_limit)
+
+    try:
+        if after is not None:
+            timestamp, message_id = decode_cursor(after)
+            query = query.where(or_(
+                ChatMessage.timestamp > timestamp,
+                and_(ChatMessage.timestamp == timestamp, ChatMessage.id > message_id)
+            )).order_by(ChatMessage.timestamp, ChatMessage.id)
+        else:
+            if before is not None:
+                timestamp, message_id = decode_cursor(before)
+                query = query.where(or_(
+                    ChatMessage.timestamp < timestamp,
+                    and_(ChatMessage.timestamp == timestamp, ChatMessage.id < message_id)
+                ))
+            query = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+    except ValueError as e:
+        return None, str(e)
+
+    # Fetch one extra row to know whether another page exists
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+
+    return {
+        'history': [ChatMessage.row_to_dict(row) for row in rows],
+        'has_more': has_more,
+        'before_cursor': encode_cursor(rows[0].timestamp, rows[0].id) if rows else before,
+        'after_cursor': encode_cursor(rows[-1].timestamp, rows[-1].id) if rows else after
+    }, None
+
+@chat_bp.route('/conversations', methods=['GET'])
+@login_required
+@conditional_history
+def list_conversations():
+    """
+    List the authenticated user's threads, most recently active first.
+
+    Pages of `limit` threads are fetched with keyset pagination on
+    (last_message_at, id); pass the returned `next_cursor` as `before` for
+    the next page. Only the `conversations` table is read, so the cost per
+    thread does not grow with the number of messages in it.
+    """
+    before = request.args.get('before')
+    max_limit = current_app.config.get('CHAT_HISTORY_MAX_PAGE_SIZE', 200)
+    limit = min(max(request.args.get('limit', type=int) or current_app.config.get('CHAT_HISTORY_PAGE_SIZE', 50), 1), max_limit)
+
+    try:
+        query = select(*Conversation.columns()).where(Conversation.user_id == current_user.id)
+        if before is not None:
+            try:
+                timestamp, conversation_id = decode_cursor(before)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.where(or_(
+                Conversation.last_message_at < timestamp,
+                and_(Conversation.last_message_at == timestamp, Conversation.id < conversation_id)
+            ))
+        rows = db.session.execute(
+            query.order_by(Conversation.last_message_at.desc(), Conversation.id.desc()).limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return jsonify({
+            'conversations': [Conversation.row_to_dict(row) for row in rows],
+            'has_more': has_more,
+            'next_cursor': encode_cursor(rows[-1].last_message_at, rows[-1].id) if has_more else None
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in list_conversations: {str(e)}")
+        return jsonify({'error': str(e), 'conversations': []}), 500
+
+@chat_bp.route('/conversations/<int:conversation_id>', methods=['GET'])
+@login_required
+@conditional_history
+def get_conversation_messages(conversation_id):
+    """
+    Get one of the authenticated user's threads with its messages, paginated
+    with `limit`, `before` and `after` like `/history`.
+    """
+    try:
+        conversation = get_conversation(current_user.id, conversation_id)
+        if conversation is None:
+            return jsonify({'error': 'Conversation not found'}), 404
+
+        query = select(*ChatMessage.columns()).where(ChatMessage.conversation_id == conversation.id)
+        page, error = _message_page(query)
+        if error is not None:
+            return jsonify({'error': error}), 400
+        return jsonify(dict(page, conversation=conversation.to_dict())), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in get_conversation_messages: {str(e)}")
+        return jsonify({'error': str(e), 'history': []}), 500
+
+@chat_bp.route('/search', methods=['GET'])
+@login_required
+def search_messages():
+    """
+    Search the authenticated user's chat history.
+
+    Every word of `q` must appear in a message. Results are ranked by BM25
+    relevance when full-text search is available and newest first
+    otherwise (`ranked` tells which), and are paginated with `limit` and
+    `offset`. Each result carries an HTML-escaped `snippet` with the
+    matches wrapped in `<mark>` tags.
+    """
+    terms = search_terms(request.args.get('q'))
+    if not terms:
+        return jsonify({'error': 'Search query is required'}), 400
+
+    max_limit = current_app.config.get('SEARCH_MAX_PAGE_SIZE', 100)
+    limit = min(max(request.args.get('limit', type=int) or current_app.config.get('SEARCH_PAGE_SIZE', 20), 1), max_limit)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    try:
+        search = current_app.extensions['message_search']
+        results, has_more = search.search(db.session, current_user.id, terms, limit, offset)
+    except Exception as e:
+        current_app.logger.error(f"Error in search_messages: {str(e)}")
+        return jsonify({'error': str(e), 'results': []}), 500
+
+    return jsonify({
+        'results': [
+            dict(ChatMessage.row_to_dict(row), snippet=make_snippet(row.content, terms), rank=rank)
+            for row, rank in results
+        ],
+        'ranked': search.fts,
+        'has_more': has_more,
+        'next_offset': offset + len(results) if has_more else None
+    }), 200
+
+@chat_bp.route('/export', methods=['GET'])
+@login_required
+def export_chat_history():
+    """
+    Export the authenticated user's full chat history as NDJSON.
+
+    Rows are streamed from the database in batches of
+    `CHAT_EXPORT_BATCH_SIZE`, so memory use stays flat regardless of the
+    history size. Pass `gzip=1` to download a gzip-compressed file.
+    """
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    batch_size = current_app.config.get('CHAT_EXPORT_BATCH_SIZE', 1000)
+    user_id = current_user.id
+
+    def generate_lines():
+        query = (
+            select(*ChatMessage.columns())
+            .where(ChatMessage.user_id == user_id)
+            .order_by(ChatMessage.timestamp, ChatMessage.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = db.session.execute(query)
+        for rows in result.partitions():
+            yield ''.join(json.dumps(ChatMessage.row_to_dict(row)) + '\n' for row in rows).encode('utf-8')
+
+    def generate_gzip():
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        for chunk in generate_lines():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    filename = 'chat-history.ndjson.gz' if compress else 'chat-history.ndjson'
+    response = Response(
+        stream_with_context(generate_gzip() if compress else generate_lines()),
+        mimetype='application/gzip' if compress else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @chat_bp.route('/message/<int:message_id>', methods=['DELETE'])
 @login_required
 def delete_message(message_id):
@@ -119,8 +594,16 @@ def delete_message(message_id):
         if not message:
             return jsonify({'error': 'Message not found'}), 404
         
-        # Delete message
+        conversation = None
+        if message.conversation_id is not None:
+            conversation = db.session.get(Conversation, message.conversation_id)
+
+        # Delete message, and the conversation summary if it includes it
+        discard_summary_if_folded(conversation, message)
         db.session.delete(message)
+        if conversation is not None:
+            record_deletion(conversation, message)
+        bump_history_versions([current_user.id])
         db.session.commit()
         
         return jsonify({'message': 'Message deleted successfully'}), 200
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, make_response, request
+from flask import Blueprint, Response, current_app, jsonify, make_response, request
 
 health_bp = Blueprint('health', __name__)
 
@@ -15,4 +15,12 @@ def health_check():
     return jsonify({
         "status": "ok",
         "message": "Service is running"
-    }), 200
\ No newline at end of file
+    }), 200
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose application metrics in the Prometheus text format"""
+    registry = current_app.extensions.get('metrics')
+    if registry is None:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,211 @@
+import asyncio
+import time
+from flask import current_app
+from .faq_index import lookup_faq
+from .metrics import record_upstream_call
+from .errors import UpstreamBusyError, UpstreamConfigError, UpstreamError, UpstreamServerError, UpstreamTimeoutError
+from .openai_service import (
+    ChatResponse, SYSTEM_PROMPT, _build_messages, _restore_completion, _sampling_params, _translate_error
+)
+from .response_cache import ResponseCache
+from .single_flight import AsyncSingleFlight
+
+
+class AsyncOpenAIService:
+    """
+    Async counterpart of `OpenAIService` used by the ASGI entry point.
+
+    Upstream waits are awaited on the event loop instead of holding a worker
+    thread, so one process can keep hundreds of chat completions in flight.
+    Settings, the circuit breaker, PHI redaction and the error translation
+    are shared with the app's `OpenAIService`; only the client, the
+    concurrency limit (`OPENAI_ASYNC_MAX_CONCURRENT_REQUESTS`) and request
+    coalescing are separate, because they belong to the event loop.
+    """
+
+    def __init__(self, app=None):
+        self._client = None
+        self._semaphore = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        sync_service = app.extensions['openai_service']
+        self.api_key = sync_service.api_key
+        self.model = sync_service.model
+        self.base_url = sync_service.base_url
+        self.timeout = sync_service.timeout
+        self.max_retries = sync_service.max_retries
+        self.queue_timeout = sync_service.queue_timeout
+        self.breaker = sync_service.breaker
+        self._backoff = sync_service._backoff
+        self.redact = sync_service.redact
+        self.max_concurrent_requests = app.config.get('OPENAI_ASYNC_MAX_CONCURRENT_REQUESTS', 500)
+        self.inflight = AsyncSingleFlight() if sync_service.inflight is not None else None
+        app.extensions['async_openai_service'] = self
+
+    @property
+    def client(self):
+        """The shared async OpenAI client, created on first use inside the event loop"""
+        if self._client is None:
+            # Imported on first use, like the sync client's SDK
+            from openai import AsyncOpenAI
+            # Retries are handled by `_call` so they share the circuit breaker
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                       timeout=self.timeout, max_retries=0)
+        return self._client
+
+    async def _acquire_slot(self):
+        """Wait for one of the upstream concurrency slots"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.BoundedSemaphore(self.max_concurrent_requests)
+        if not self.queue_timeout:
+            if self._semaphore.locked():
+                raise UpstreamBusyError()
+            await self._semaphore.acquire()
+            return
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise UpstreamBusyError()
+
+    async def _call(self, func):
+        """
+        Await an upstream call inside a concurrency slot, guarded by the
+        circuit breaker and retried on transient failures.
+
+        Args:
+            func (callable): Zero-argument coroutine function performing the API call
+
+        Returns:
+            The result of `func`
+
+        Raises:
+            UpstreamError: If the call fails or is rejected
+        """
+        import openai
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_slot()
+            started = None
+            try:
+                self.breaker.before_call()
+                started = time.perf_counter()
+                result = await func()
+            except openai.OpenAIError as e:
+                self._semaphore.release()
+                error = _translate_error(e)
+                record_upstream_call(time.perf_counter() - started, type(error).__name__)
+                if isinstance(error, (UpstreamTimeoutError, UpstreamServerError)):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()  # The upstream answered
+                if not error.retryable or attempt == self.max_retries:
+                    raise error from e
+                delay = self._backoff(attempt, error.retry_after)
+                current_app.logger.warning(f"Upstream call failed ({str(e)}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except UpstreamError:
+                self._semaphore.release()
+                raise
+            except asyncio.CancelledError:
+                # The client went away; this says nothing about the upstream
+                self._semaphore.release()
+                raise
+            except BaseException:
+                self._semaphore.release()
+                self.breaker.record_failure()
+                raise
+            else:
+                self._semaphore.release()
+                self.breaker.record_success()
+                record_upstream_call(time.perf_counter() - started, 'success', getattr(result, 'usage', None))
+                return result
+
+    async def complete(self, messages, max_tokens, temperature, top_p):
+        """
+        Create a chat completion.
+
+        Returns:
+            ChatCompletion: The completion returned by the API
+
+        Raises:
+            UpstreamError: If the completion could not be created
+        """
+        messages, redaction = self.redact(messages)
+        response = await self._call(lambda: self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p
+        ))
+        return _restore_completion(response, redaction) if redaction is not None else response
+
+
+def get_async_openai_service():
+    """Return the async OpenAI service initialized by the ASGI entry point"""
+    return current_app.extensions['async_openai_service']
+
+
+async def _in_cache(cache, method, *args):
+    """Call a response cache method, on a worker thread if it does disk I/O"""
+    if cache.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def get_chat_response_async(user_message, context=None):
+    """
+    Async version of `get_chat_response`.
+
+    The FAQ index and the response cache are consulted first and concurrent
+    identical requests share one upstream call, exactly as in the sync path.
+
+    Args:
+        user_message (str): The message from the user
+        context (ContextWindow): Earlier conversation to send with it, if any
+
+    Returns:
+        ChatResponse: The reply and whether it came from the cache or the FAQ
+
+    Raises:
+        UpstreamError: If no reply could be obtained
+    """
+    # A sub-millisecond in-memory lookup, so it runs on the event loop
+    entry, passages = lookup_faq(user_message)
+    if entry is not None:
+        return ChatResponse(entry['answer'], faq_id=entry['id'])
+
+    service = get_async_openai_service()
+
+    if not service.api_key:
+        current_app.logger.error("OpenAI API key is not set in environment variables or application config")
+        raise UpstreamConfigError()
+
+    cache = current_app.extensions.get('response_cache')
+    request_key = ResponseCache.make_key(user_message, SYSTEM_PROMPT, service.model, _sampling_params(),
+                                         context=context.cache_context() if context is not None else None)
+
+    if cache is not None:
+        cached_content = await _in_cache(cache, cache.get, request_key)
+        if cached_content is not None:
+            return ChatResponse(cached_content, cached=True)
+
+    async def complete():
+        response = await service.complete(_build_messages(user_message, context, passages), **_sampling_params())
+
+        if response.choices and len(response.choices) > 0:
+            content = response.choices[0].message.content.strip()
+            if cache is not None:
+                await _in_cache(cache, cache.set, request_key, content)
+            return content
+        return None
+
+    if service.inflight is not None:
+        content, shared = await service.inflight.do(request_key, complete)
+    else:
+        content, shared = await complete(), False
+
+    if content is None:
+        return ChatResponse("I apologize, but I couldn't generate a response. Please try again.")
+    return ChatResponse(content, shared=shared)
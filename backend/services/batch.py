@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import copy_current_request_context, current_app
+from .openai_service import get_chat_response
+
+
+def init_batch_executor(app):
+    """
+    Create the thread pool that answers the items of batch requests. It is
+    shared by all requests, so `CHAT_BATCH_MAX_WORKERS` bounds the batch
+    items in flight per process.
+
+    Returns:
+        ThreadPoolExecutor: The pool, also stored in `app.extensions['batch_executor']`
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=app.config.get('CHAT_BATCH_MAX_WORKERS', 50),
+        thread_name_prefix='chat-batch'
+    )
+    app.extensions['batch_executor'] = executor
+    return executor
+
+
+def get_chat_responses(user_messages):
+    """
+    Answer several messages concurrently on the batch pool, each as
+    `get_chat_response` would without conversation context, so the batch
+    takes about as long as its slowest item.
+
+    Args:
+        user_messages (list): The messages
+
+    Returns:
+        list: For each message in order, its `ChatResponse` or the exception
+        that prevented one
+    """
+    executor = current_app.extensions['batch_executor']
+    futures = []
+    for user_message in user_messages:
+        # Every item runs in its own copy of the request context
+        answer = copy_current_request_context(get_chat_response)
+        futures.append(executor.submit(answer, user_message))
+
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
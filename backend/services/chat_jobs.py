@@ -0,0 +1,357 @@
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from ..models import db, ChatJob
+from .context_window import build_context
+from .conversations import create_conversation, get_conversation
+from .errors import UpstreamError
+from .message_writer import save_exchange
+from .metrics import record_chat_job
+from .openai_service import get_chat_response
+
+
+_runner_lock = threading.Lock()
+
+
+class TooManyJobs(Exception):
+    """The user already has the maximum number of unfinished jobs"""
+
+
+class ChatJobRunner:
+    """
+    Answers queued chat jobs on a bounded pool of threads.
+
+    Jobs live in the `chat_jobs` table, so any process running a runner can
+    answer them. A dispatcher thread claims the oldest queued job whenever
+    a pool thread is free, under a lease of `lease_seconds` that it renews
+    for every job it is still generating. A job whose worker died is
+    claimed again by any runner once its lease expires, up to
+    `max_attempts` times, after which it fails.
+
+    Jobs submitted in this process wake the dispatcher at once; jobs
+    submitted elsewhere are picked up within `poll_interval` seconds.
+    """
+
+    def __init__(self, app, max_workers=4, lease_seconds=120, poll_interval=1.0, max_attempts=3):
+        self.app = app
+        self.max_workers = max_workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._slots = threading.Semaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-job')
+        self._wakeup = threading.Event()
+        self._finished = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._renewed_at = 0.0
+        self._failing = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='chat-job-dispatcher', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5.0):
+        """
+        Stop claiming jobs. Jobs still generating are abandoned and claimed
+        again elsewhere when their leases expire.
+        """
+        if self._thread is None or self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def notify(self):
+        """Wake the dispatcher to claim a newly queued job"""
+        self._wakeup.set()
+
+    def wait(self, timeout):
+        """Wait up to `timeout` seconds for a job of this process to finish"""
+        with self._finished:
+            self._finished.wait(timeout)
+
+    def _lease_expiry(self):
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job_id = None
+            try:
+                self._maintain_leases()
+                if not self._slots.acquire(timeout=self.poll_interval):
+                    continue
+                try:
+                    job_id = self._claim()
+                finally:
+                    if job_id is None:
+                        self._slots.release()
+                self._failing = False
+            except Exception as e:
+                # E.g. the table does not exist yet; keep polling, logging once
+                if not self._failing:
+                    self.app.logger.error(f"Error claiming chat jobs: {str(e)}")
+                self._failing = True
+            if job_id is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._executor.submit(self._process, job_id)
+
+    def _claimable(self, now):
+        return or_(
+            ChatJob.status == ChatJob.QUEUED,
+            and_(ChatJob.status == ChatJob.RUNNING, ChatJob.lease_expires_at < now,
+                 ChatJob.attempts < self.max_attempts)
+        )
+
+    def _claim(self):
+        """
+        Lease the oldest claimable job to this runner.
+
+        Returns:
+            int: The id of the claimed job, or None if there is none
+        """
+        with self.app.app_context():
+            for _ in range(3):
+                now = datetime.utcnow()
+                job_id = db.session.execute(
+                    select(ChatJob.id).where(self._claimable(now)).order_by(ChatJob.id).limit(1)
+                ).scalar()
+                if job_id is None:
+                    return None
+                # Only one runner's conditional update matches
+                claimed = db.session.execute(
+                    update(ChatJob).where(ChatJob.id == job_id, self._claimable(now)).values(
+                        status=ChatJob.RUNNING, lease_owner=self.owner, lease_expires_at=self._lease_expiry(),
+                        attempts=ChatJob.attempts + 1
+                    )
+                ).rowcount
+                db.session.commit()
+                if claimed:
+                    return job_id
+            return None
+
+    def _maintain_leases(self):
+        """
+        Every third of a lease, renew the leases of the jobs this runner is
+        generating, and fail the jobs whose workers died too often.
+        """
+        if time.monotonic() - self._renewed_at < self.lease_seconds / 3:
+            return
+        self._renewed_at = time.monotonic()
+        with self.app.app_context():
+            now = datetime.utcnow()
+            db.session.execute(
+                update(ChatJob).where(ChatJob.status == ChatJob.RUNNING, ChatJob.lease_owner == self.owner)
+                .values(lease_expires_at=self._lease_expiry())
+            )
+            abandoned = db.session.execute(
+                update(ChatJob).where(ChatJob.status == ChatJob.RUNNING, ChatJob.lease_expires_at < now,
+                                      ChatJob.attempts >= self.max_attempts)
+                .values(status=ChatJob.FAILED, error='The job was interrupted too many times',
+                        error_type='job_abandoned', finished_at=now, lease_owner=None, lease_expires_at=None)
+            ).rowcount
+            db.session.commit()
+            for _ in range(abandoned):
+                record_chat_job('abandoned')
+
+    def _process(self, job_id):
+        try:
+            with self.app.app_context():
+                self._answer(db.session.get(ChatJob, job_id))
+        except Exception as e:
+            self.app.logger.error(f"Error processing chat job {job_id}: {str(e)}")
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+            with self._finished:
+                self._finished.notify_all()
+
+    def _answer(self, job):
+        conversation = get_conversation(job.user_id, job.conversation_id)
+        try:
+            context = build_context(conversation, job.message) if conversation is not None else None
+        except SQLAlchemyError as e:
+            # Answer without context rather than failing the job
+            db.session.rollback()
+            current_app.logger.error(f"Database error when loading conversation context: {str(e)}")
+            context = None
+
+        try:
+            reply = get_chat_response(job.message, context).content
+        except UpstreamError as e:
+            current_app.logger.warning(f"Upstream error in chat job {job.id}: {type(e).__name__}")
+            self._finish(job.id, 'failed', status=ChatJob.FAILED, error=e.message, error_type=e.error_type)
+            return
+        except Exception as e:
+            current_app.logger.error(f"Error in chat job {job.id}: {str(e)}")
+            self._finish(job.id, 'failed', status=ChatJob.FAILED, error=str(e), error_type='service_error')
+            return
+
+        job_id, user_id, conversation_id, message = job.id, job.user_id, job.conversation_id, job.message
+        # Mark the job done in the transaction that saves the exchange, so a
+        # job is never answered twice into the history
+        if not self._finish(job_id, None, status=ChatJob.SUCCEEDED, result=reply):
+            return
+        try:
+            message_id, _ = save_exchange(user_id, message, reply, conversation_id)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Database error when saving chat job {job_id}: {str(e)}")
+            self._finish(job_id, 'failed', status=ChatJob.FAILED, error='The reply could not be saved',
+                         error_type='database_error')
+            return
+        record_chat_job('succeeded')
+        db.session.execute(update(ChatJob).where(ChatJob.id == job_id).values(message_id=message_id))
+        db.session.commit()
+
+    def _finish(self, job_id, outcome, **values):
+        """
+        Record the outcome of a job this runner still holds the lease of,
+        committing it unless `outcome` is None.
+
+        Returns:
+            bool: False if the lease was lost and the job is another runner's
+        """
+        updated = db.session.execute(
+            update(ChatJob).where(ChatJob.id == job_id, ChatJob.status == ChatJob.RUNNING,
+                                  ChatJob.lease_owner == self.owner)
+            .values(finished_at=datetime.utcnow(), lease_owner=None, lease_expires_at=None, **values)
+        ).rowcount
+        if not updated:
+            db.session.rollback()
+            current_app.logger.warning(f"Lost the lease of chat job {job_id}; discarding its result")
+            return False
+        if outcome is not None:
+            db.session.commit()
+            record_chat_job(outcome)
+        return True
+
+
+def submit_chat_job(user_id, message, conversation_id=None):
+    """
+    Queue a message to be answered in the background.
+
+    Without `conversation_id` a new thread is created for it now, so the
+    job's thread is known before it runs.
+
+    Returns:
+        ChatJob: The committed job
+
+    Raises:
+        TooManyJobs: If the user has `CHAT_JOBS_MAX_PENDING_PER_USER` unfinished jobs
+    """
+    limit = current_app.config.get('CHAT_JOBS_MAX_PENDING_PER_USER', 20)
+    pending = db.session.execute(
+        select(func.count()).select_from(ChatJob)
+        .where(ChatJob.user_id == user_id, ChatJob.status.in_((ChatJob.QUEUED, ChatJob.RUNNING)))
+    ).scalar()
+    if pending >= limit:
+        raise TooManyJobs()
+
+    if conversation_id is None:
+        conversation_id = create_conversation(user_id, message, commit=False).id
+    job = ChatJob(user_id=user_id, conversation_id=conversation_id, message=message)
+    db.session.add(job)
+    db.session.commit()
+    record_chat_job('submitted')
+
+    runner = init_chat_jobs(current_app._get_current_object())
+    if runner is not None:
+        runner.notify()
+    return job
+
+
+def wait_for_chat_job(user_id, job_id, timeout):
+    """
+    Return one of the user's jobs, waiting up to `timeout` seconds for it
+    to finish.
+
+    Jobs answered in this process end the wait as soon as they finish;
+    others are re-read every `CHAT_JOBS_POLL_INTERVAL` seconds.
+
+    Returns:
+        ChatJob: The job, finished or not, or None if the user has no such job
+    """
+    runner = init_chat_jobs(current_app._get_current_object())
+    poll_interval = current_app.config.get('CHAT_JOBS_POLL_INTERVAL', 1.0)
+    deadline = time.monotonic() + timeout
+    while True:
+        job = db.session.execute(
+            select(ChatJob).where(ChatJob.id == job_id, ChatJob.user_id == user_id)
+        ).scalar_one_or_none()
+        remaining = deadline - time.monotonic()
+        if job is None or job.status in ChatJob.FINISHED or remaining <= 0:
+            return job
+        # End the read so the next one sees jobs finished since
+        db.session.rollback()
+        if runner is not None:
+            runner.wait(min(remaining, poll_interval))
+        else:
+            time.sleep(min(remaining, poll_interval))
+
+
+def init_chat_jobs(app):
+    """
+    Start the background runner answering chat jobs, unless it is running
+    or `CHAT_JOBS_WORKERS` is 0 (jobs are then answered by other processes).
+
+    Called at startup by `resume_chat_jobs` when jobs are unfinished, and
+    otherwise when a job is first submitted or waited for, so processes
+    that never see a job (CLI commands, benchmarks) start no threads.
+
+    Returns:
+        ChatJobRunner: The running runner, or None
+    """
+    runner = app.extensions.get('chat_job_runner')
+    workers = app.config.get('CHAT_JOBS_WORKERS', 4)
+    if runner is not None or workers <= 0:
+        return runner
+
+    with _runner_lock:
+        runner = app.extensions.get('chat_job_runner')
+        if runner is None:
+            runner = ChatJobRunner(
+                app,
+                max_workers=workers,
+                lease_seconds=app.config.get('CHAT_JOBS_LEASE_SECONDS', 120),
+                poll_interval=app.config.get('CHAT_JOBS_POLL_INTERVAL', 1.0),
+                max_attempts=app.config.get('CHAT_JOBS_MAX_ATTEMPTS', 3)
+            )
+            runner.start()
+            app.extensions['chat_job_runner'] = runner
+    return runner
+
+
+def resume_chat_jobs(app):
+    """
+    Start the runner at startup if any job is unfinished, so jobs queued,
+    or orphaned by a restart, are answered without waiting for new /jobs
+    requests. Jobs still leased to a dead worker are claimed once their
+    leases expire.
+
+    Returns:
+        ChatJobRunner: The running runner, or None
+    """
+    try:
+        with app.app_context():
+            unfinished = db.session.execute(
+                select(ChatJob.id).where(ChatJob.status.in_((ChatJob.QUEUED, ChatJob.RUNNING))).limit(1)
+            ).first()
+    except SQLAlchemyError as e:
+        # E.g. the migrations creating the table have not run yet
+        app.logger.warning(f"Could not check for unfinished chat jobs: {str(e)}")
+        return None
+    return init_chat_jobs(app) if unfinished is not None else None
@@ -0,0 +1,52 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional dependency; responses are gzip-compressed without it
+    brotli = None
+
+
+def _compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.get('COMPRESSION_BROTLI_QUALITY', 5))
+    return gzip.compress(data, compresslevel=config.get('COMPRESSION_GZIP_LEVEL', 6))
+
+
+def init_compression(app):
+    """
+    Compress buffered responses of the configured mimetypes that are at
+    least `COMPRESSION_MIN_SIZE` bytes, with brotli when the client accepts
+    it and the `brotli` package is installed, else gzip. Streamed responses
+    (SSE, exports) are left alone, as is anything already encoded.
+    """
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+
+    config = app.config
+    mimetypes = set(config.get('COMPRESSION_MIMETYPES', ['application/json']))
+    min_size = config.get('COMPRESSION_MIN_SIZE', 1024)
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in mimetypes or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        compressed = _compress(data, encoding, config)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        metrics = app.extensions.get('metrics')
+        if metrics is not None:
+            metrics.inc('http_compression_bytes_total', len(data), {'encoding': encoding, 'stage': 'original'})
+            metrics.inc('http_compression_bytes_total', len(compressed), {'encoding': encoding, 'stage': 'compressed'})
+        return response
@@ -0,0 +1,208 @@
+from flask import current_app
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from ..models import db, ChatMessage
+from ..utils.tokens import MESSAGE_OVERHEAD_TOKENS, REPLY_PRIMING_TOKENS, message_tokens
+from .errors import UpstreamError
+from .metrics import record_context_window, record_summary_update
+from .openai_service import SYSTEM_PROMPT, get_openai_service
+
+SUMMARY_PROMPT = "You maintain a running summary of a conversation between a user and a medical assistant. Merge the new conversation turns into the current summary. Keep the user's symptoms, conditions, medications, allergies, relevant history and any advice already given; drop pleasantries. Reply with the updated summary only, in a few short sentences or bullet points."
+
+# Rough characters per token, used for messages that were never loaded
+CHARS_PER_TOKEN = 4
+
+
+class ContextWindow:
+    """Conversation context sent along with one chat turn"""
+
+    def __init__(self, summary, turns, prompt_tokens, history_tokens):
+        self.summary = summary
+        self.turns = turns
+        self.prompt_tokens = prompt_tokens
+        self.history_tokens = history_tokens
+
+    def cache_context(self):
+        """The part of the prompt that distinguishes this turn in cache keys"""
+        return {'summary': self.summary, 'turns': self.turns}
+
+
+def _fit(tokens, available):
+    """Index of the oldest message such that it and every newer one fit in `available` tokens"""
+    start = len(tokens)
+    used = 0
+    while start > 0 and used + tokens[start - 1] <= available:
+        start -= 1
+        used += tokens[start]
+    return start
+
+
+def _after(conversation):
+    """Filter for messages newer than the last one folded into the conversation's summary"""
+    return or_(
+        ChatMessage.timestamp > conversation.summary_through_timestamp,
+        and_(ChatMessage.timestamp == conversation.summary_through_timestamp,
+             ChatMessage.id > conversation.summary_through_message_id)
+    )
+
+
+def _unloaded_tokens(conversation, oldest):
+    """Estimate the tokens of unsummarized messages older than the loaded ones"""
+    query = select(func.count(ChatMessage.id), func.coalesce(func.sum(func.length(ChatMessage.content)), 0)).where(
+        ChatMessage.conversation_id == conversation.id,
+        or_(ChatMessage.timestamp < oldest.timestamp,
+            and_(ChatMessage.timestamp == oldest.timestamp, ChatMessage.id < oldest.id))
+    )
+    if conversation.summary is not None:
+        query = query.where(_after(conversation))
+    count, chars = db.session.execute(query).one()
+    return chars // CHARS_PER_TOKEN + count * MESSAGE_OVERHEAD_TOKENS
+
+
+def _fold(conversation, rows, through, folded_tokens):
+    """
+    Merge messages into the conversation's rolling summary with one
+    completion and store it as covering everything up to `through`.
+
+    Returns:
+        bool: Whether the summary was updated; the previous summary is kept
+        if a new one could not be produced or saved
+    """
+    config = current_app.config
+    transcript = '\n'.join(f"{'Assistant' if row.is_bot else 'User'}: {row.content}" for row in rows)
+    current = conversation.summary if conversation.summary is not None else '(none)'
+    messages = [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Current summary:\n{current}\n\nNew conversation turns:\n{transcript}"}
+    ]
+
+    try:
+        response = get_openai_service().complete(
+            messages,
+            max_tokens=config.get('CONTEXT_SUMMARY_MAX_TOKENS', 300),
+            temperature=0.2,
+            model=config.get('CONTEXT_SUMMARY_MODEL')
+        )
+    except UpstreamError as e:
+        current_app.logger.warning(f"Could not update conversation summary: {type(e).__name__}")
+        record_summary_update(type(e).__name__)
+        return False
+    if not response.choices or not response.choices[0].message.content:
+        record_summary_update('empty')
+        return False
+
+    try:
+        conversation.summary = response.choices[0].message.content.strip()
+        conversation.summary_through_timestamp = through.timestamp
+        conversation.summary_through_message_id = through.id
+        conversation.summary_folded_tokens = (conversation.summary_folded_tokens or 0) + folded_tokens
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error when saving conversation summary: {str(e)}")
+        record_summary_update('db_error')
+        return False
+
+    record_summary_update('success')
+    return True
+
+
+def build_context(conversation, user_message):
+    """
+    Build the context for the next message in a conversation.
+
+    The most recent turns are sent verbatim while they fit in
+    `CONTEXT_TOKEN_BUDGET` estimated prompt tokens, together with the system
+    prompt, the rolling summary and the new message. When older turns no
+    longer fit, they are merged into the stored summary along with enough of
+    the oldest remaining turns to bring the verbatim part down to
+    `CONTEXT_SUMMARY_KEEP_RATIO` of the budget, so the summary is updated
+    once every several turns rather than on each one.
+
+    Args:
+        conversation (Conversation): The thread the message is sent in, or
+            None for a new thread
+        user_message (str): The new message
+
+    Returns:
+        ContextWindow: The context to send, or None when context is
+        disabled or the thread has no earlier messages
+    """
+    config = current_app.config
+    if not config.get('CONTEXT_ENABLED', True) or conversation is None:
+        return None
+
+    budget = config.get('CONTEXT_TOKEN_BUDGET', 3000)
+    max_messages = config.get('CONTEXT_MAX_MESSAGES', 200)
+
+    query = select(ChatMessage.id, ChatMessage.content, ChatMessage.is_bot, ChatMessage.timestamp).where(
+        ChatMessage.conversation_id == conversation.id
+    )
+    if conversation.summary is not None:
+        query = query.where(_after(conversation))
+    rows = db.session.execute(
+        query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(max_messages)
+    ).all()
+    if not rows and conversation.summary is None:
+        return None
+    rows.reverse()
+
+    tokens = [message_tokens(row.content) for row in rows]
+    unloaded = 0
+    fixed = message_tokens(SYSTEM_PROMPT) + message_tokens(user_message) + REPLY_PRIMING_TOKENS
+
+    def available():
+        return budget - fixed - (message_tokens(conversation.summary) if conversation.summary is not None else 0)
+
+    start = _fit(tokens, available())
+    if start > 0 and config.get('CONTEXT_SUMMARY_ENABLED', True):
+        # Fold past the overflow until the kept turns fill only part of the budget
+        keep = available() * config.get('CONTEXT_SUMMARY_KEEP_RATIO', 0.5)
+        fold_end = start
+        kept = sum(tokens[fold_end:])
+        while fold_end < len(rows) and kept > keep:
+            kept -= tokens[fold_end]
+            fold_end += 1
+
+        # Older unsummarized messages beyond the load limit are skipped by the
+        # summary; count them as folded so the saved-token metrics stay honest
+        if len(rows) == max_messages:
+            unloaded = _unloaded_tokens(conversation, rows[0])
+
+        # A first fold of a long history only summarizes its most recent part
+        transcript_start = min(_fit(tokens[:fold_end], budget * 2), fold_end - 1)
+        if _fold(conversation, rows[transcript_start:fold_end], rows[fold_end - 1],
+                 sum(tokens[:fold_end]) + unloaded):
+            unloaded = 0
+            rows, tokens = rows[fold_end:], tokens[fold_end:]
+            start = _fit(tokens, available())
+
+    window = rows[start:]
+    summary = conversation.summary
+    summary_tokens = message_tokens(summary) if summary is not None else 0
+    prompt_tokens = fixed + summary_tokens + sum(tokens[start:])
+    history_tokens = fixed + (conversation.summary_folded_tokens or 0) + sum(tokens) + unloaded
+    record_context_window(prompt_tokens, history_tokens)
+
+    return ContextWindow(
+        summary=summary,
+        turns=[{'role': 'assistant' if row.is_bot else 'user', 'content': row.content} for row in window],
+        prompt_tokens=prompt_tokens,
+        history_tokens=history_tokens
+    )
+
+
+def discard_summary_if_folded(conversation, message):
+    """
+    Drop the conversation's summary if it includes `message`, so a deleted
+    message does not live on in it. The summary is rebuilt from the
+    remaining messages on the next turn. Call before committing the deletion.
+    """
+    if conversation is None or conversation.summary is None:
+        return
+    if (message.timestamp, message.id) <= (conversation.summary_through_timestamp,
+                                           conversation.summary_through_message_id):
+        conversation.summary = None
+        conversation.summary_through_timestamp = None
+        conversation.summary_through_message_id = None
+        conversation.summary_folded_tokens = 0
@@ -0,0 +1,111 @@
+import re
+from sqlalchemy import func, select, update
+from ..models import db, ChatMessage, Conversation
+from .history_version import bump_history_versions
+
+TITLE_LENGTH = 80
+PREVIEW_LENGTH = 200
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _shorten(text, length):
+    """Collapse whitespace and cut `text` to `length` characters"""
+    text = _WHITESPACE.sub(' ', text or '').strip()
+    return text if len(text) <= length else text[:length - 1].rstrip() + '…'
+
+
+def create_conversation(user_id, first_message, commit=True):
+    """
+    Create a thread titled after its first message.
+
+    Args:
+        user_id (int): Owner of the thread
+        first_message (str): Message the thread is titled after
+        commit (bool): Commit the thread now; when False it is only flushed,
+            so it is saved by the transaction of whatever is added to it
+
+    Returns:
+        Conversation: The conversation, with its id assigned
+    """
+    conversation = Conversation(user_id=user_id, title=_shorten(first_message, TITLE_LENGTH) or 'New conversation')
+    db.session.add(conversation)
+    bump_history_versions([user_id])
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    return conversation
+
+
+def get_conversation(user_id, conversation_id):
+    """Return one of the user's conversations, or None"""
+    return db.session.execute(
+        select(Conversation).where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+    ).scalar_one_or_none()
+
+
+def latest_conversation(user_id):
+    """Return the user's most recently active conversation, or None"""
+    return db.session.execute(
+        select(Conversation).where(Conversation.user_id == user_id)
+        .order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+def record_messages(rows):
+    """
+    Update the denormalized fields of the conversations the given message
+    rows belong to. Call in the transaction that inserts the rows.
+
+    Counts are incremented in SQL, so concurrent writers to one thread do
+    not lose updates.
+
+    Args:
+        rows (list): Column dicts of the inserted messages, in insertion order
+    """
+    latest = {}
+    counts = {}
+    for row in rows:
+        conversation_id = row.get('conversation_id')
+        if conversation_id is None:
+            continue
+        counts[conversation_id] = counts.get(conversation_id, 0) + 1
+        latest[conversation_id] = row
+
+    for conversation_id, count in counts.items():
+        row = latest[conversation_id]
+        db.session.execute(
+            update(Conversation).where(Conversation.id == conversation_id).values(
+                message_count=Conversation.message_count + count,
+                last_message_at=row['timestamp'],
+                last_message_preview=_shorten(row['content'], PREVIEW_LENGTH)
+            )
+        )
+
+
+def record_deletion(conversation, message):
+    """
+    Update a conversation's denormalized fields after `message` is deleted
+    from it, reading back the new last message when needed. Call in the
+    transaction that deletes the message, after deleting it.
+
+    The count is decremented in SQL, so concurrent deletions from one
+    thread do not lose updates.
+    """
+    values = {'message_count': func.max(Conversation.message_count - 1, 0)}
+    if message.timestamp >= conversation.last_message_at:
+        db.session.flush()
+        last = db.session.execute(
+            select(ChatMessage.content, ChatMessage.timestamp)
+            .where(ChatMessage.conversation_id == conversation.id)
+            .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+            .limit(1)
+        ).first()
+        if last is not None:
+            values.update(last_message_at=last.timestamp,
+                          last_message_preview=_shorten(last.content, PREVIEW_LENGTH))
+        else:
+            values.update(last_message_preview='')
+    db.session.execute(update(Conversation).where(Conversation.id == conversation.id).values(**values))
@@ -0,0 +1,63 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(config):
+    """
+    SQLAlchemy engine options for the configured database.
+
+    Server databases get a connection pool sized by `DB_POOL_SIZE`,
+    `DB_MAX_OVERFLOW`, `DB_POOL_TIMEOUT` and `DB_POOL_RECYCLE`, with
+    connections pinged before use. SQLite keeps SQLAlchemy's default pool;
+    its connections are tuned by `_configure_sqlite` instead. Options set
+    in `SQLALCHEMY_ENGINE_OPTIONS` take precedence.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+        return options
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 10))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 20))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    # Recycle before servers or proxies drop idle connections
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+    return options
+
+
+def _configure_sqlite(engine, config):
+    """
+    Set the connection pragmas on every new SQLite connection.
+
+    In WAL mode readers no longer block the writer or each other, so
+    concurrent requests only wait on one another's writes, and with a busy
+    timeout they wait instead of failing with "database is locked".
+    """
+    pragmas = [
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        ('mmap_size', config.get('SQLITE_MMAP_SIZE', 0)),
+    ]
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas if value not in (None, '')]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def init_database(app, db):
+    """
+    Bind `db` to the app with the engine options for its database, and
+    tune SQLite connections.
+    """
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        _configure_sqlite(engine, app.config)
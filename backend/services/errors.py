@@ -0,0 +1,67 @@
+class UpstreamError(Exception):
+    """
+    Base class for failures of the upstream completion service.
+
+    Each subclass carries the HTTP status and error type the API returns
+    for it, and whether the call may be retried.
+    """
+    status_code = 502
+    error_type = 'service_error'
+    retryable = False
+    default_message = "I'm experiencing technical difficulties. Please try again later."
+
+    def __init__(self, message=None, retry_after=None):
+        self.message = message or self.default_message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class UpstreamConfigError(UpstreamError):
+    """The upstream client is not configured, e.g. no API key is set"""
+    status_code = 500
+    default_message = "I'm having trouble connecting to my knowledge service. Please try again later or contact support."
+
+
+class UpstreamAuthError(UpstreamError):
+    """The upstream rejected our credentials"""
+    status_code = 500
+    default_message = "Service authentication error. Please contact support."
+
+
+class UpstreamRateLimitError(UpstreamError):
+    """The upstream is rate limiting our requests"""
+    status_code = 503
+    error_type = 'temporary_error'
+    retryable = True
+    default_message = "I'm currently experiencing high demand. Please try again in a few moments."
+
+
+class UpstreamTimeoutError(UpstreamError):
+    """The upstream did not answer within the configured timeout"""
+    status_code = 504
+    error_type = 'temporary_error'
+    retryable = True
+    default_message = "The request took too long to complete. Please try again in a few moments."
+
+
+class UpstreamServerError(UpstreamError):
+    """The upstream failed with a server error or could not be reached"""
+    status_code = 502
+    error_type = 'temporary_error'
+    retryable = True
+    default_message = "My knowledge service is temporarily unavailable. Please try again in a few moments."
+
+
+class UpstreamUnavailableError(UpstreamError):
+    """The upstream is not being called, e.g. because the circuit breaker is open"""
+    status_code = 503
+    error_type = 'temporary_error'
+    default_message = "My knowledge service is temporarily unavailable. Please try again in a few moments."
+
+
+class UpstreamBusyError(UpstreamUnavailableError):
+    """No upstream slot freed up within the configured queue timeout"""
+    default_message = "I'm currently experiencing high demand. Please try again in a few moments."
+
+    def __init__(self, message=None, retry_after=1):
+        super().__init__(message, retry_after)
@@ -0,0 +1,307 @@
+"""
+Local retrieval over a curated FAQ corpus.
+
+Questions are embedded locally as hashed n-gram TF-IDF vectors: word
+unigrams and bigrams plus character 3-5 grams of every word, hashed into
+`dim` signed buckets, weighted by inverse document frequency and L2
+normalized. No model, network or GPU is involved.
+
+Build an index from a JSON Lines corpus with one entry per line,
+`{"id": ..., "question": ..., "answer": ..., "alternates": [...]}`
+(`id` and `alternates` are optional):
+
+    python -m backend.services.faq_index build faq.jsonl instance/faq_index
+    python -m backend.services.faq_index query instance/faq_index "Can I take ibuprofen with food?"
+
+and point `FAQ_INDEX_PATH` at the output directory.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from flask import current_app
+
+# numpy is an optional dependency, imported by `_require_numpy` when an
+# index is first built or loaded, so apps without an FAQ index never pay for it
+np = None
+
+INDEX_VERSION = 1
+DEFAULT_DIM = 4096
+CHAR_NGRAM_SIZES = (3, 4, 5)
+
+MATRIX_FILE = 'matrix.npy'
+IDF_FILE = 'idf.npy'
+ENTRIES_FILE = 'entries.json'
+
+_WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def _require_numpy(action):
+    """Import numpy on first use, raising RuntimeError naming `action` if it is not installed"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError(f'numpy is required to {action} the FAQ index')
+        np = numpy
+    return np
+
+
+def _features(text):
+    """Word unigrams and bigrams and character n-grams of the words of `text`"""
+    words = _WORD_PATTERN.findall(text.lower())
+    features = [f'w:{word}' for word in words]
+    features.extend(f'b:{first} {second}' for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f'<{word}>'
+        for size in CHAR_NGRAM_SIZES:
+            features.extend(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return features
+
+
+def _hashed_counts(texts, dim):
+    """Signed bucket counts of the features of each text, as a dense (len(texts), dim) matrix"""
+    rows, buckets, signs = [], [], []
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            # crc32 is stable across processes, unlike hash()
+            value = zlib.crc32(feature.encode('utf-8'))
+            rows.append(row)
+            buckets.append(value % dim)
+            signs.append(1.0 if value & 0x80000000 else -1.0)
+    counts = np.zeros((len(texts), dim), dtype=np.float32)
+    np.add.at(counts, (np.asarray(rows, dtype=np.intp), np.asarray(buckets, dtype=np.intp)),
+              np.asarray(signs, dtype=np.float32))
+    return counts
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    vectors /= norms
+    return vectors
+
+
+class FaqMatch:
+    """An FAQ entry and its cosine similarity to a query"""
+
+    def __init__(self, entry, score):
+        self.entry = entry
+        self.score = score
+
+
+class FaqIndex:
+    """
+    In-memory FAQ index.
+
+    The embedding matrix is stored term-major, one row per hash bucket and
+    one column per indexed question, so a query only reads the rows of the
+    buckets its own n-grams fall in. Entries may have several phrasings;
+    their columns are contiguous and an entry scores as its best phrasing.
+
+    Loaded with `mmap=True`, the matrix is memory-mapped read-only, so every
+    worker process on the host shares the same pages.
+    """
+
+    def __init__(self, matrix, idf, entries, entry_starts):
+        self.matrix = matrix
+        self.idf = idf
+        self.entries = entries
+        self.entry_starts = np.asarray(entry_starts, dtype=np.intp)
+        self.dim = idf.shape[0]
+
+    @classmethod
+    def build(cls, entries, dim=DEFAULT_DIM):
+        """
+        Embed the questions of `entries`.
+
+        Args:
+            entries (list): Dicts with `question`, `answer` and optionally
+                `id` and `alternates`
+            dim (int): Number of hash buckets
+
+        Returns:
+            FaqIndex: The index
+        """
+        _require_numpy('build')
+        questions, entry_starts, kept = [], [], []
+        for position, entry in enumerate(entries):
+            if not entry.get('question') or not entry.get('answer'):
+                raise ValueError(f"FAQ entry {position} needs a question and an answer")
+            phrasings = [entry['question'], *entry.get('alternates', [])]
+            entry_starts.append(len(questions))
+            questions.extend(phrasings)
+            kept.append({'id': entry.get('id', position), 'question': entry['question'], 'answer': entry['answer']})
+        if not questions:
+            raise ValueError('The FAQ corpus is empty')
+
+        counts = _hashed_counts(questions, dim)
+        document_frequency = np.count_nonzero(counts, axis=0)
+        idf = (np.log((1 + len(questions)) / (1 + document_frequency)) + 1).astype(np.float32)
+        vectors = _normalize(counts * idf)
+        return cls(np.ascontiguousarray(vectors.T), idf, kept, entry_starts)
+
+    def save(self, path):
+        """Write the index to the directory `path`"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, MATRIX_FILE), self.matrix)
+        np.save(os.path.join(path, IDF_FILE), self.idf)
+        with open(os.path.join(path, ENTRIES_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'dim': self.dim,
+                'entry_starts': self.entry_starts.tolist(),
+                'entries': self.entries
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an index written by `save`, memory-mapping the matrix if `mmap`"""
+        _require_numpy('load')
+        with open(os.path.join(path, ENTRIES_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported FAQ index version {meta.get('version')}; rebuild the index")
+        matrix = np.load(os.path.join(path, MATRIX_FILE), mmap_mode='r' if mmap else None)
+        idf = np.load(os.path.join(path, IDF_FILE))
+        return cls(matrix, idf, meta['entries'], meta['entry_starts'])
+
+    def embed(self, texts):
+        """TF-IDF vectors of `texts`, one L2-normalized row per text"""
+        return _normalize(_hashed_counts(texts, self.dim) * self.idf)
+
+    def search(self, texts, k=1):
+        """
+        Find the entries most similar to each text, in one batched pass.
+
+        Args:
+            texts (list): Query texts
+            k (int): Matches returned per text
+
+        Returns:
+            list: For each text, up to `k` `FaqMatch`es, best first
+        """
+        queries = self.embed(texts)
+        # Only the buckets some query uses contribute to the dot products
+        buckets = np.flatnonzero(np.any(queries, axis=0))
+        scores = queries[:, buckets] @ self.matrix[buckets]
+        scores = np.maximum.reduceat(scores, self.entry_starts, axis=1)
+
+        k = min(k, len(self.entries))
+        if k < len(self.entries):
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(len(self.entries)), scores.shape)
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates], kind='stable')]
+            results.append([FaqMatch(self.entries[i], float(scores[row, i])) for i in ranked])
+        return results
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def lookup_faq(user_message):
+    """
+    Look a message up in the app's FAQ index.
+
+    Returns:
+        tuple: The entry to answer with when the best match reaches
+        `FAQ_ANSWER_THRESHOLD`, else None, and the entries to add to the
+        prompt (up to `FAQ_CONTEXT_TOP_K` scoring `FAQ_CONTEXT_MIN_SCORE` or more)
+    """
+    index = current_app.extensions.get('faq_index')
+    if index is None:
+        return None, []
+    config = current_app.config
+    top_k = config.get('FAQ_CONTEXT_TOP_K', 3)
+
+    matches = index.search([user_message], k=max(top_k, 1))[0]
+    if matches and matches[0].score >= config.get('FAQ_ANSWER_THRESHOLD', 0.8):
+        _record_lookup('answered')
+        return matches[0].entry, []
+
+    min_score = config.get('FAQ_CONTEXT_MIN_SCORE', 0.3)
+    passages = [match.entry for match in matches[:top_k] if match.score >= min_score]
+    _record_lookup('context' if passages else 'miss')
+    return None, passages
+
+
+def _record_lookup(outcome):
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.inc('faq_lookups_total', 1, {'outcome': outcome})
+
+
+def init_faq_index(app):
+    """
+    Load the FAQ index at `FAQ_INDEX_PATH`, if configured.
+
+    Returns:
+        FaqIndex: The index, also stored in `app.extensions['faq_index']`,
+        or None if it is not configured or cannot be loaded
+    """
+    path = app.config.get('FAQ_INDEX_PATH')
+    if not path:
+        return None
+    try:
+        index = FaqIndex.load(path, mmap=app.config.get('FAQ_INDEX_MMAP', True))
+    except RuntimeError as e:
+        app.logger.warning(f"FAQ_INDEX_PATH is set but {str(e)}; FAQ retrieval disabled")
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        app.logger.error(f"Could not load the FAQ index from {path}: {str(e)}")
+        return None
+
+    app.extensions['faq_index'] = index
+    app.logger.info(f"Loaded FAQ index with {len(index)} entries")
+    return index
+
+
+def read_corpus(path):
+    """Read FAQ entries from a JSON Lines file, skipping blank lines"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the local FAQ index')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='Build an index from a JSON Lines corpus')
+    build.add_argument('corpus')
+    build.add_argument('output')
+    build.add_argument('--dim', type=int, default=DEFAULT_DIM, help='Hash buckets per vector')
+    query = commands.add_parser('query', help='Show the best matches for a question')
+    query.add_argument('index')
+    query.add_argument('question')
+    query.add_argument('-k', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    try:
+        _require_numpy(args.command)
+    except RuntimeError:
+        sys.exit('numpy is required: pip install numpy')
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = FaqIndex.build(read_corpus(args.corpus), dim=args.dim)
+        index.save(args.output)
+        print(f"Indexed {len(index)} entries ({index.matrix.shape[1]} phrasings, {index.dim} buckets, "
+              f"{index.matrix.nbytes / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s")
+    else:
+        index = FaqIndex.load(args.index)
+        start = time.perf_counter()
+        matches = index.search([args.question], k=args.k)[0]
+        elapsed = (time.perf_counter() - start) * 1000
+        for match in matches:
+            print(f"{match.score:.3f}  [{match.entry['id']}] {match.entry['question']}")
+        print(f"{elapsed:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
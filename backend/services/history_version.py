@@ -0,0 +1,48 @@
+from functools import wraps
+from flask import current_app, make_response, request
+from flask_login import current_user
+from sqlalchemy import select, update
+from ..models import db, User
+
+
+def bump_history_versions(user_ids):
+    """
+    Mark the chat history of users as changed. Call in the transaction that
+    inserts or deletes their messages or conversations.
+    """
+    for user_id in set(user_ids):
+        db.session.execute(
+            update(User).where(User.id == user_id).values(history_version=User.history_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def history_etag(user_id):
+    """The ETag of the user's current chat history, read with one primary key lookup"""
+    version = db.session.execute(select(User.history_version).where(User.id == user_id)).scalar_one_or_none()
+    return f"{user_id}-{version or 0}"
+
+
+def conditional_history(view):
+    """
+    Answer GET requests for the current user's history with 304 Not
+    Modified when their `If-None-Match` matches the history version,
+    without running the view, and tag other successful responses with the
+    version as a weak ETag.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Read before the view, so a concurrent write can only make the tag
+        # older than the body and never newer
+        etag = history_etag(current_user.id)
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        # Let clients keep the body but always revalidate it
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
@@ -0,0 +1,379 @@
+import atexit
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models import ChatMessage
+from .conversations import create_conversation, record_messages
+from .history_version import bump_history_versions
+
+
+# Worker ids leased by the processes running a writer, so no two of them
+# mint the same message ids; created by migration 7
+writer_workers = Table(
+    'message_writer_workers', MetaData(),
+    Column('worker_id', Integer, primary_key=True),
+    Column('owner', String(120), nullable=False),
+    Column('heartbeat_at', DateTime, nullable=False)
+)
+
+
+def claim_worker_id(engine, owner, stale_after, worker_ids=256):
+    """
+    Lease the lowest free writer worker id, or one whose holder has not
+    renewed it for `stale_after` seconds.
+
+    Returns:
+        int: The leased id
+
+    Raises:
+        RuntimeError: If every id is held
+    """
+    for _ in range(3):
+        now = datetime.utcnow()
+        with engine.begin() as connection:
+            held = dict(connection.execute(select(writer_workers.c.worker_id, writer_workers.c.heartbeat_at)).all())
+        free = next((worker_id for worker_id in range(worker_ids) if worker_id not in held), None)
+        try:
+            with engine.begin() as connection:
+                if free is not None:
+                    connection.execute(writer_workers.insert().values(worker_id=free, owner=owner, heartbeat_at=now))
+                    return free
+                cutoff = now - timedelta(seconds=stale_after)
+                for worker_id, heartbeat_at in sorted(held.items(), key=lambda item: item[1]):
+                    if heartbeat_at >= cutoff:
+                        break
+                    taken = connection.execute(
+                        update(writer_workers)
+                        .where(writer_workers.c.worker_id == worker_id, writer_workers.c.heartbeat_at < cutoff)
+                        .values(owner=owner, heartbeat_at=now)
+                    ).rowcount
+                    if taken:
+                        return worker_id
+        except IntegrityError:
+            continue  # Another process took the same free id first
+    raise RuntimeError('No free message writer worker id; every id is leased by a running writer')
+
+
+class MessageIdAllocator:
+    """
+    Assign time-ordered message ids before the rows are inserted.
+
+    Ids fit in 53 bits so they stay exact in JavaScript clients:
+    41 bits of milliseconds since 2024-01-01, 8 bits of worker id and a
+    4-bit sequence within the millisecond. Every process minting ids needs
+    its own worker id.
+    """
+    EPOCH_MS = 1704067200000
+    WORKER_BITS = 8
+    SEQUENCE_BITS = 4
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id < (1 << self.WORKER_BITS):
+            raise ValueError(f"Worker id must be between 0 and {(1 << self.WORKER_BITS) - 1}")
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            now_ms = int(time.time() * 1000) - self.EPOCH_MS
+            if now_ms < self._last_ms:
+                now_ms = self._last_ms  # Clock moved backwards
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) % (1 << self.SEQUENCE_BITS)
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond
+                    while now_ms <= self._last_ms:
+                        time.sleep(0.0001)
+                        now_ms = int(time.time() * 1000) - self.EPOCH_MS
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return ((now_ms << (self.WORKER_BITS + self.SEQUENCE_BITS))
+                    | (self.worker_id << self.SEQUENCE_BITS)
+                    | self._sequence)
+
+
+class MessageWriter:
+    """
+    Write-behind persistence for chat messages.
+
+    Request threads enqueue message rows with pre-assigned ids and return
+    immediately; a background thread drains the queue and inserts each
+    batch with one multi-row INSERT in a single transaction. When the queue
+    is full, callers wait up to `put_timeout` seconds and then write their
+    rows synchronously, which applies backpressure instead of dropping
+    messages. The queue is drained on interpreter shutdown.
+
+    Ids are minted with `CHAT_WRITE_BEHIND_WORKER_ID` when set, which must
+    then differ between processes; otherwise the writer leases a worker id
+    in the `message_writer_workers` table and renews it while running.
+
+    A batch that keeps failing is retried one exchange at a time, and only
+    the exchanges that still fail are set aside, appended as JSON lines to
+    `dead_letter_path` so they can be replayed.
+    """
+    HEARTBEAT_INTERVAL = 60
+    STALE_AFTER = 300
+
+    def __init__(self, app, max_queue_size=10000, batch_size=500, flush_interval=0.05, put_timeout=1.0,
+                 dead_letter_path=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dead_letter_path = dead_letter_path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        worker_id = app.config.get('CHAT_WRITE_BEHIND_WORKER_ID')
+        self._leased = worker_id is None
+        if self._leased:
+            with app.app_context():
+                worker_id = claim_worker_id(db.engine, self.owner, self.STALE_AFTER)
+        self.ids = MessageIdAllocator(worker_id)
+        self._heartbeat_at = time.monotonic()
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches_written': 0,
+            'messages_written': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'sync_writes': 0,
+            'dead_lettered': 0
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10.0):
+        """Stop accepting work and flush everything still queued"""
+        if self._thread is None or self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._leased:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(delete(writer_workers).where(
+                        writer_workers.c.worker_id == self.ids.worker_id, writer_workers.c.owner == self.owner
+                    ))
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        self._queue.join()
+
+    def save(self, rows):
+        """
+        Queue message rows for insertion.
+
+        Args:
+            rows (list): Column dicts for `chat_messages`, including their ids
+        """
+        try:
+            self._queue.put(rows, timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: write on the request thread rather than drop messages
+            current_app.logger.warning("Message write queue full, writing synchronously")
+            self._insert(rows)
+            self._record_batch(len(rows), sync=True)
+
+    def stats(self):
+        """Return queue depth and batch counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+    def _insert(self, rows):
+        db.session.execute(insert(ChatMessage), rows)
+        record_messages(rows)
+        bump_history_versions(row['user_id'] for row in rows)
+        db.session.commit()
+
+    def _record_batch(self, size, sync=False):
+        with self._stats_lock:
+            if sync:
+                self._stats['sync_writes'] += 1
+            self._stats['batches_written'] += 1
+            self._stats['messages_written'] += size
+            self._stats['last_batch_size'] = size
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], size)
+
+    def _heartbeat(self):
+        """Renew the leased worker id, failing loudly if another process took it over"""
+        if not self._leased or time.monotonic() - self._heartbeat_at < self.HEARTBEAT_INTERVAL:
+            return
+        self._heartbeat_at = time.monotonic()
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                renewed = connection.execute(
+                    update(writer_workers)
+                    .where(writer_workers.c.worker_id == self.ids.worker_id, writer_workers.c.owner == self.owner)
+                    .values(heartbeat_at=datetime.utcnow())
+                ).rowcount
+        if not renewed:
+            self.app.logger.error(f"Message writer worker id {self.ids.worker_id} was leased by another process")
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                self._heartbeat()
+            except Exception as e:
+                self.app.logger.error(f"Error renewing the message writer worker id: {str(e)}")
+            try:
+                items = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            rows = list(items[0])
+            while len(rows) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+                rows.extend(item)
+
+            self._write_batch(items, rows)
+            for _ in items:
+                self._queue.task_done()
+
+    def _write_batch(self, items, rows, attempts=3):
+        """
+        Insert the rows of several `save` calls in one transaction. If that
+        keeps failing, insert each call's rows on their own so a bad row
+        only holds back its own exchange, which is set aside.
+        """
+        with self.app.app_context():
+            for attempt in range(1, attempts + 1):
+                try:
+                    self._insert(rows)
+                    self._record_batch(len(rows))
+                    return
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Error writing message batch (attempt {attempt}): {str(e)}")
+                    time.sleep(0.1 * attempt)
+
+            for item in items:
+                try:
+                    self._insert(item)
+                    self._record_batch(len(item))
+                except Exception as e:
+                    db.session.rollback()
+                    self._dead_letter(item, e)
+
+    def _dead_letter(self, rows, error):
+        """Set aside rows that could not be inserted, keeping them for replay"""
+        with self._stats_lock:
+            self._stats['dead_lettered'] += len(rows)
+        self.app.logger.error(f"Could not write {len(rows)} messages (ids {[row['id'] for row in rows]}): {str(error)}")
+        if not self.dead_letter_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or '.', exist_ok=True)
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(dict(row, timestamp=row['timestamp'].isoformat())) + '\n')
+        except OSError as e:
+            self.app.logger.error(f"Could not write to the message dead-letter file: {str(e)}")
+
+
+def init_message_writer(app):
+    """
+    Start the write-behind writer if `CHAT_WRITE_BEHIND` is enabled.
+
+    Returns:
+        MessageWriter: The running writer, or None in synchronous mode
+    """
+    if not app.config.get('CHAT_WRITE_BEHIND', False):
+        return None
+
+    writer = MessageWriter(
+        app,
+        max_queue_size=app.config.get('CHAT_WRITE_BEHIND_QUEUE_SIZE', 10000),
+        batch_size=app.config.get('CHAT_WRITE_BEHIND_BATCH_SIZE', 500),
+        flush_interval=app.config.get('CHAT_WRITE_BEHIND_FLUSH_INTERVAL', 0.05),
+        put_timeout=app.config.get('CHAT_WRITE_BEHIND_PUT_TIMEOUT', 1.0),
+        dead_letter_path=app.config.get('CHAT_WRITE_BEHIND_DEAD_LETTER_PATH') or
+        os.path.join(app.instance_path, 'message_writer_dead_letter.jsonl')
+    )
+    writer.start()
+    app.extensions['message_writer'] = writer
+    return writer
+
+
+def save_exchange(user_id, user_text, bot_text, conversation_id=None):
+    """
+    Persist a user message and the bot's reply, and update their
+    conversation's last message, preview and count in the same transaction.
+
+    Without `conversation_id` a new conversation is created first. In
+    write-behind mode the rows are queued with pre-assigned ids; otherwise
+    both are inserted in one transaction before returning.
+
+    Returns:
+        tuple: The id of the bot message and of its conversation
+    """
+    bot_ids, conversation_id = save_exchanges(user_id, [(user_text, bot_text)], conversation_id)
+    return bot_ids[0], conversation_id
+
+
+def save_exchanges(user_id, exchanges, conversation_id=None):
+    """
+    Persist several user messages and their replies with one bulk insert,
+    as `save_exchange` does for one.
+
+    Args:
+        user_id (int): Owner of the messages
+        exchanges (list): `(user_text, bot_text)` pairs, in order
+        conversation_id (int): Thread to add them to; a new one is created
+            from the first message when None
+
+    Returns:
+        tuple: The ids of the bot messages, in order, and of their conversation
+    """
+    writer = current_app.extensions.get('message_writer')
+
+    if conversation_id is None:
+        # Written behind, the messages are inserted by another transaction,
+        # which needs the thread to exist; otherwise the thread is saved
+        # with its messages, so a failed insert leaves no empty thread
+        conversation_id = create_conversation(user_id, exchanges[0][0], commit=writer is not None).id
+
+    timestamp = datetime.utcnow()
+    rows = []
+    for user_text, bot_text in exchanges:
+        rows.append({'user_id': user_id, 'conversation_id': conversation_id, 'content': user_text,
+                     'is_bot': False, 'timestamp': timestamp})
+        rows.append({'user_id': user_id, 'conversation_id': conversation_id, 'content': bot_text,
+                     'is_bot': True, 'timestamp': timestamp})
+
+    if writer is None:
+        # One multi-row INSERT. Its rows get ascending ids in VALUES order, so
+        # sorting maps the returned ids back to the rows without asking
+        # SQLAlchemy for ordered RETURNING, which it does one row at a time
+        ids = sorted(db.session.execute(insert(ChatMessage).returning(ChatMessage.id), rows).scalars())
+        record_messages(rows)
+        bump_history_versions([user_id])
+        db.session.commit()
+        return ids[1::2], conversation_id
+
+    for row in rows:
+        row['id'] = writer.ids.allocate()
+    writer.save(rows)
+    return [row['id'] for row in rows[1::2]], conversation_id
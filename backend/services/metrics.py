@@ -0,0 +1,358 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Histogram buckets in seconds for request and dependency latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets for the number of SQL statements run by one request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in (labels or {}).items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    Low-overhead counters and histograms rendered in the Prometheus text
+    format.
+
+    Each worker process records into its own in-memory tables under one
+    lock. When `multiproc_dir` is set, every process periodically writes a
+    snapshot to `<multiproc_dir>/metrics_<pid>.json`, and rendering sums
+    the snapshots of all workers so any of them can serve the endpoint.
+    Gauges are read from callbacks at render time and describe the process
+    that serves the scrape; in multiprocess mode they carry a `pid` label.
+    """
+
+    def __init__(self, multiproc_dir=None, flush_interval=5.0):
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self._counters = {}
+        self._histograms = {}
+        self._meta = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        if multiproc_dir:
+            os.makedirs(multiproc_dir, exist_ok=True)
+            atexit.register(self.flush)
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+
+    def gauge(self, callback):
+        """
+        Register a gauge callback.
+
+        The callback returns a list of `(name, help, labels, value)` tuples
+        read when the metrics are rendered.
+        """
+        self._gauges.append(callback)
+
+    def inc(self, name, value=1, labels=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        buckets = self._meta[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """Return the recorded series as JSON-serializable data"""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(series[0]), series[1], series[2]]
+                               for (name, labels), series in self._histograms.items()]
+            }
+
+    def maybe_flush(self):
+        """Write this process's snapshot if the flush interval has passed"""
+        if self.multiproc_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.multiproc_dir:
+            return
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.multiproc_dir, f"metrics_{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(tmp_path, path)
+
+    def _collect(self):
+        """Merge the snapshots of every worker process"""
+        if not self.multiproc_dir:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics_*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        counters = {}
+        histograms = {}
+        for snapshot in self._collect():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, bucket_counts, total, count in snapshot['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                merged = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], bucket_counts)]
+                merged[1] += total
+                merged[2] += count
+
+        lines = []
+        for name, (metric_type, help_text, buckets) in sorted(self._meta.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == 'counter':
+                for (series_name, labels), value in sorted(counters.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            else:
+                for (series_name, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                    if series_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets, bucket_counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        pid_label = [('pid', os.getpid())] if self.multiproc_dir else []
+        seen = set()
+        for callback in self._gauges:
+            for name, help_text, labels, value in callback():
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{_format_labels(_label_key(labels), pid_label)} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def get_metrics():
+    """Return the app's metrics registry, or None if metrics are disabled"""
+    return current_app.extensions.get('metrics')
+
+
+def _app_gauges(app):
+    """Gauges for the app's caches, queues and upstream client"""
+    def collect():
+        values = []
+        cache = app.extensions.get('response_cache')
+        if cache is not None:
+            stats = cache.stats()
+            values += [
+                ('response_cache_entries', 'Entries in the response cache', {}, stats['size']),
+                ('response_cache_hits', 'Response cache hits since start', {}, stats['hits']),
+                ('response_cache_misses', 'Response cache misses since start', {}, stats['misses']),
+                ('response_cache_evictions', 'Response cache evictions since start', {}, stats['evictions'])
+            ]
+        writer = app.extensions.get('message_writer')
+        if writer is not None:
+            stats = writer.stats()
+            values += [
+                ('message_writer_queue_depth', 'Message batches waiting to be written', {}, stats['queue_depth']),
+                ('message_writer_last_batch_size', 'Rows in the last written batch', {}, stats['last_batch_size']),
+                ('message_writer_dead_lettered', 'Messages set aside after failed writes', {}, stats['dead_lettered'])
+            ]
+        service = app.extensions.get('openai_service')
+        if service is not None:
+            values += [
+                ('upstream_in_flight', 'Upstream calls holding a concurrency slot', {},
+                 service.active_calls),
+                ('upstream_circuit_open', 'Whether the upstream circuit breaker is open', {},
+                 int(service.breaker.state != service.breaker.CLOSED))
+            ]
+        return values
+    return collect
+
+
+def _instrument_requests(app, metrics):
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+        g._sql_count = 0
+        g._sql_time = 0.0
+        g._upstream_time = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            labels = {'route': route, 'method': request.method}
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - start, labels)
+            metrics.inc('http_requests_total', labels={**labels, 'status': response.status_code})
+            metrics.observe('http_request_db_queries', g.get('_sql_count', 0), labels)
+            metrics.observe('http_request_db_duration_seconds', g.get('_sql_time', 0.0), labels)
+            metrics.maybe_flush()
+        return response
+
+
+def _instrument_engine(engine, metrics):
+    # The start time is kept on the statement's execution context, so a
+    # statement that fails (and never reaches after_cursor_execute) leaves
+    # nothing behind to skew the timing of later ones
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_start', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        metrics.observe('db_query_duration_seconds', elapsed)
+        if has_request_context():
+            g._sql_count = g.get('_sql_count', 0) + 1
+            g._sql_time = g.get('_sql_time', 0.0) + elapsed
+
+
+def record_upstream_call(elapsed, outcome, usage=None):
+    """
+    Record the latency of one upstream call and the tokens it used.
+
+    Args:
+        elapsed (float): Seconds the call took
+        outcome (str): 'success' or the error class name
+        usage: The completion's usage object, if any
+    """
+    if has_request_context():
+        g._upstream_time = g.get('_upstream_time', 0.0) + elapsed
+    metrics = current_app.extensions.get('metrics')
+    if metrics is None:
+        return
+    metrics.observe('upstream_request_duration_seconds', elapsed, {'outcome': outcome})
+    if usage is not None:
+        metrics.inc('upstream_tokens_total', usage.prompt_tokens or 0, {'type': 'prompt'})
+        metrics.inc('upstream_tokens_total', usage.completion_tokens or 0, {'type': 'completion'})
+
+
+def record_context_window(prompt_tokens, history_tokens):
+    """
+    Record the estimated prompt size of a chat turn with conversation
+    context, and what sending the full history would have cost.
+
+    Args:
+        prompt_tokens (int): Estimated tokens of the prompt actually sent
+        history_tokens (int): Estimated tokens of a prompt with the full history
+    """
+    metrics = current_app.extensions.get('metrics')
+    if metrics is None:
+        return
+    metrics.inc('context_prompt_tokens_total', prompt_tokens)
+    metrics.inc('context_history_tokens_total', history_tokens)
+    metrics.inc('context_tokens_saved_total', max(0, history_tokens - prompt_tokens))
+
+
+def record_summary_update(outcome):
+    """Count one rolling summary update by outcome ('success' or the error class name)"""
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.inc('context_summary_updates_total', 1, {'outcome': outcome})
+
+
+def record_redactions(counts):
+    """Count the distinct values masked in one upstream request, by rule"""
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        for rule, count in counts.items():
+            metrics.inc('redactions_total', count, {'rule': rule})
+
+
+def record_chat_job(outcome):
+    """Count a background chat job event: submitted, succeeded, failed or abandoned"""
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.inc('chat_jobs_total', 1, {'outcome': outcome})
+
+
+def init_metrics(app, db):
+    """
+    Create the metrics registry and instrument requests, SQL statements and
+    the app's caches and queues.
+
+    Returns:
+        MetricsRegistry: The registry, or None if `METRICS_ENABLED` is off
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return None
+
+    metrics = MetricsRegistry(
+        multiproc_dir=app.config.get('METRICS_MULTIPROC_DIR'),
+        flush_interval=app.config.get('METRICS_FLUSH_INTERVAL', 5.0)
+    )
+    metrics.histogram('http_request_duration_seconds', 'Request latency by route')
+    metrics.counter('http_requests_total', 'Requests by route, method and status')
+    metrics.histogram('http_request_db_queries', 'SQL statements run per request', QUERY_COUNT_BUCKETS)
+    metrics.histogram('http_request_db_duration_seconds', 'Time spent in SQL per request')
+    metrics.counter('http_compression_bytes_total', 'Sizes of compressed responses before and after compression')
+    metrics.histogram('db_query_duration_seconds', 'Latency of individual SQL statements')
+    metrics.histogram('upstream_request_duration_seconds', 'Latency of upstream completion calls by outcome')
+    metrics.counter('upstream_tokens_total', 'Tokens reported by the upstream by type')
+    metrics.counter('context_prompt_tokens_total', 'Estimated prompt tokens sent with conversation context')
+    metrics.counter('context_history_tokens_total', 'Estimated prompt tokens had the full history been sent')
+    metrics.counter('context_tokens_saved_total', 'Estimated prompt tokens saved by the context window')
+    metrics.counter('context_summary_updates_total', 'Rolling conversation summary updates by outcome')
+    metrics.counter('faq_lookups_total', 'FAQ index lookups by outcome (answered, context or miss)')
+    metrics.counter('redactions_total', 'Distinct PHI values masked before upstream calls, by rule')
+    metrics.counter('chat_jobs_total', 'Background chat jobs by outcome')
+    metrics.gauge(_app_gauges(app))
+
+    _instrument_requests(app, metrics)
+    with app.app_context():
+        _instrument_engine(db.engine, metrics)
+
+    app.extensions['metrics'] = metrics
+    return metrics
@@ -1,6 +1,411 @@
 import os
-from openai import OpenAI
+import random
+import threading
+import time
+from contextlib import contextmanager
 from flask import current_app
+from .circuit_breaker import CircuitBreaker
+from .faq_index import lookup_faq
+from .metrics import record_redactions, record_upstream_call
+from .errors import (
+    UpstreamAuthError, UpstreamBusyError, UpstreamConfigError, UpstreamError,
+    UpstreamRateLimitError, UpstreamServerError, UpstreamTimeoutError
+)
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+from ..utils.redaction import DEFAULT_RULES, Redactor
+
+SYSTEM_PROMPT = "You are a helpful medical assistant. Provide accurate medical information while being concise and professional. Always remind users to consult healthcare professionals for specific medical advice."
+
+# Sampling parameters used for every chat completion
+MAX_TOKENS = 500
+TEMPERATURE = 0.7
+TOP_P = 1.0
+
+
+def _retry_after(error):
+    """Read the Retry-After header of an API error, in seconds"""
+    try:
+        return float(error.response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _translate_error(error):
+    """Map an OpenAI SDK exception to the matching `UpstreamError`"""
+    import openai
+    if isinstance(error, openai.APITimeoutError):
+        return UpstreamTimeoutError()
+    if isinstance(error, openai.APIConnectionError):
+        return UpstreamServerError()
+    if isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+        return UpstreamAuthError()
+    if isinstance(error, openai.RateLimitError):
+        return UpstreamRateLimitError(retry_after=_retry_after(error))
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return UpstreamServerError()
+    return UpstreamError()
+
+
+def _restore_completion(response, redaction):
+    """Put redacted values back into the choices of a completion"""
+    for choice in response.choices or ():
+        if choice.message.content:
+            choice.message.content = redaction.restore(choice.message.content)
+    return response
+
+
+class OpenAIService:
+    """
+    Long-lived OpenAI client shared by every request handled by the app.
+
+    The underlying client keeps its HTTP connection pool alive between
+    requests, so chat messages reuse established TLS connections instead of
+    setting up a new client each time. Concurrent upstream calls are bounded
+    by a semaphore; callers wait up to `OPENAI_QUEUE_TIMEOUT` seconds for a
+    slot (0 rejects immediately) before `UpstreamBusyError` is raised.
+
+    Failed calls raise an `UpstreamError` subclass. Rate limits, timeouts
+    and server errors are retried up to `OPENAI_MAX_RETRIES` times with
+    jittered exponential backoff, and a circuit breaker rejects calls
+    outright while the upstream keeps timing out or failing.
+
+    With `REDACTION_ENABLED`, every message sent is normalized and PHI
+    matching `REDACTION_RULES` is replaced by placeholders, which are put
+    back into the reply unless `REDACTION_RESTORE` is off.
+    """
+
+    def __init__(self, app=None):
+        self._client = None
+        self._client_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.api_key = os.getenv('OPENAI_API_KEY') or app.config.get('OPENAI_API_KEY')
+        self.model = app.config.get('OPENAI_MODEL', 'gpt-3.5-turbo')
+        self.base_url = app.config.get('OPENAI_BASE_URL')
+        self.timeout = app.config.get('OPENAI_TIMEOUT', 60.0)
+        self.max_retries = app.config.get('OPENAI_MAX_RETRIES', 2)
+        self.retry_base_delay = app.config.get('OPENAI_RETRY_BASE_DELAY', 0.5)
+        self.retry_max_delay = app.config.get('OPENAI_RETRY_MAX_DELAY', 8.0)
+        self.max_concurrent_requests = app.config.get('OPENAI_MAX_CONCURRENT_REQUESTS', 10)
+        self.queue_timeout = app.config.get('OPENAI_QUEUE_TIMEOUT', 30.0)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent_requests)
+        self._active_calls = 0
+        self._active_lock = threading.Lock()
+        self.breaker = CircuitBreaker(
+            failure_threshold=app.config.get('OPENAI_CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_timeout=app.config.get('OPENAI_CIRCUIT_RESET_TIMEOUT', 30.0)
+        )
+        self.inflight = SingleFlight() if app.config.get('OPENAI_COALESCE_REQUESTS', True) else None
+        self.redactor = Redactor(app.config.get('REDACTION_RULES', DEFAULT_RULES)) \
+            if app.config.get('REDACTION_ENABLED', True) else None
+        self.restore_redacted = app.config.get('REDACTION_RESTORE', True)
+        app.extensions['openai_service'] = self
+
+    @property
+    def client(self):
+        """The shared OpenAI client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    # The SDK takes about a second to import, so workers only
+                    # load it once they make their first upstream call
+                    from openai import OpenAI
+                    # Retries are handled by `_call` so they share the circuit breaker
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          timeout=self.timeout, max_retries=0)
+        return self._client
+
+    @contextmanager
+    def _slot(self):
+        """Hold one of the upstream concurrency slots"""
+        if self.queue_timeout:
+            acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if not acquired:
+            raise UpstreamBusyError()
+        with self._active_lock:
+            self._active_calls += 1
+        try:
+            yield
+        finally:
+            with self._active_lock:
+                self._active_calls -= 1
+            self._semaphore.release()
+
+    @property
+    def active_calls(self):
+        """Upstream calls currently holding a concurrency slot"""
+        return self._active_calls
+
+    def redact(self, messages):
+        """
+        Mask PHI in the messages of one upstream request.
+
+        Returns:
+            tuple: The messages to send, and the `Redaction` to restore the
+            reply with, or None if nothing needs restoring
+        """
+        if self.redactor is None:
+            return messages, None
+        messages, redaction = self.redactor.redact_messages(messages)
+        if not redaction:
+            return messages, None
+        record_redactions(redaction.counts)
+        return messages, redaction if self.restore_redacted else None
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, honouring Retry-After when given"""
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        return delay
+
+    def _call(self, func, hold_slot=False):
+        """
+        Run an upstream call inside a concurrency slot, guarded by the
+        circuit breaker and retried on transient failures.
+
+        Args:
+            func (callable): Zero-argument function performing the API call
+            hold_slot (bool): Keep the slot after a successful call and
+                return it with the result; the caller must release it
+
+        Returns:
+            The result of `func`, or `(result, slot)` if `hold_slot` is set
+
+        Raises:
+            UpstreamError: If the call fails or is rejected
+        """
+        import openai
+        for attempt in range(self.max_retries + 1):
+            slot = self._slot()
+            slot.__enter__()
+            started = None
+            try:
+                self.breaker.before_call()
+                started = time.perf_counter()
+                result = func()
+            except openai.OpenAIError as e:
+                slot.__exit__(None, None, None)
+                error = _translate_error(e)
+                record_upstream_call(time.perf_counter() - started, type(error).__name__)
+                if isinstance(error, (UpstreamTimeoutError, UpstreamServerError)):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()  # The upstream answered
+                if not error.retryable or attempt == self.max_retries:
+                    raise error from e
+                delay = self._backoff(attempt, error.retry_after)
+                current_app.logger.warning(f"Upstream call failed ({str(e)}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+            except UpstreamError:
+                slot.__exit__(None, None, None)
+                raise
+            except BaseException:
+                slot.__exit__(None, None, None)
+                self.breaker.record_failure()
+                raise
+            else:
+                self.breaker.record_success()
+                record_upstream_call(time.perf_counter() - started, 'success', getattr(result, 'usage', None))
+                if hold_slot:
+                    return result, slot
+                slot.__exit__(None, None, None)
+                return result
+
+    def complete(self, messages, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, top_p=TOP_P, model=None):
+        """
+        Create a chat completion.
+
+        Args:
+            messages (list): The chat messages to send
+            max_tokens (int): Maximum tokens in the reply
+            temperature (float): Sampling temperature
+            top_p (float): Nucleus sampling probability
+            model (str): Model to use instead of the configured one
+
+        Returns:
+            ChatCompletion: The completion returned by the API
+
+        Raises:
+            UpstreamError: If the completion could not be created
+        """
+        messages, redaction = self.redact(messages)
+        response = self._call(lambda: self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p
+        ))
+        return _restore_completion(response, redaction) if redaction is not None else response
+
+    def stream(self, messages, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, top_p=TOP_P):
+        """
+        Start a streaming chat completion.
+
+        The concurrency slot is acquired and the request is sent before this
+        returns, so busy and connection errors surface to the caller
+        immediately. The slot is released when the returned iterator is
+        exhausted or closed.
+
+        Returns:
+            iterator: Content deltas from the completion as they arrive
+
+        Raises:
+            UpstreamError: If the stream could not be started; errors while
+                iterating are raised as `UpstreamError` as well
+        """
+        messages, redaction = self.redact(messages)
+        stream, slot = self._call(lambda: self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            stream=True
+        ), hold_slot=True)
+        deltas = self._iter_deltas(stream, slot)
+        return redaction.restore_stream(deltas) if redaction is not None else deltas
+
+    @staticmethod
+    def _iter_deltas(stream, slot):
+        import openai
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except openai.OpenAIError as e:
+            raise _translate_error(e) from e
+        finally:
+            stream.close()
+            slot.__exit__(None, None, None)
+
+
+def get_openai_service():
+    """Return the OpenAI service initialized by `create_app`"""
+    return current_app.extensions['openai_service']
+
+
+def _build_messages(user_message, context=None, passages=None):
+    """
+    Build the chat completion message list with the medical system prompt,
+    related FAQ entries, and the summary and recent turns of the
+    conversation when given.
+    """
+    system_prompt = SYSTEM_PROMPT
+    if passages:
+        system_prompt += "\n\nVetted answers to related questions; rely on them where they apply:\n" + "\n\n".join(
+            f"Q: {passage['question']}\nA: {passage['answer']}" for passage in passages
+        )
+    turns = []
+    if context is not None:
+        if context.summary:
+            system_prompt += f"\n\nSummary of the earlier conversation:\n{context.summary}"
+        turns = context.turns
+    return [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        *turns,
+        {
+            "role": "user",
+            "content": user_message
+        }
+    ]
+
+
+class ChatResponse:
+    """Reply to a chat message and where it came from"""
+
+    def __init__(self, content, cached=False, shared=False, faq_id=None):
+        self.content = content
+        self.cached = cached
+        self.shared = shared
+        self.faq_id = faq_id
+
+
+def _sampling_params():
+    return {'max_tokens': MAX_TOKENS, 'temperature': TEMPERATURE, 'top_p': TOP_P}
+
+
+def _fetch_response(user_message, context=None, passages=None):
+    """
+    Get a reply from the response cache or, on a miss, from the upstream.
+
+    Concurrent identical requests share one upstream call. Only successful
+    upstream replies are cached, keyed on the conversation context as well
+    as the message.
+    """
+    service = get_openai_service()
+    cache = current_app.extensions.get('response_cache')
+    request_key = ResponseCache.make_key(user_message, SYSTEM_PROMPT, service.model, _sampling_params(),
+                                         context=context.cache_context() if context is not None else None)
+
+    if cache is not None:
+        cached_content = cache.get(request_key)
+        if cached_content is not None:
+            return ChatResponse(cached_content, cached=True)
+
+    def complete():
+        # Create the chat completion with medical context
+        response = service.complete(_build_messages(user_message, context, passages), **_sampling_params())
+
+        # Extract and return the assistant's response
+        if response.choices and len(response.choices) > 0:
+            content = response.choices[0].message.content.strip()
+            if cache is not None:
+                cache.set(request_key, content)
+            return content
+        return None
+
+    if service.inflight is not None:
+        content, shared = service.inflight.do(request_key, complete)
+    else:
+        content, shared = complete(), False
+
+    if content is None:
+        return ChatResponse("I apologize, but I couldn't generate a response. Please try again.")
+    return ChatResponse(content, shared=shared)
+
+
+def get_chat_response(user_message, context=None):
+    """
+    Get a response to the user's message. Questions matching the local FAQ
+    index closely enough are answered from it without an upstream call,
+    and replies are served from the response cache when the same question
+    was answered recently.
+
+    Args:
+        user_message (str): The message from the user
+        context (ContextWindow): Earlier conversation to send with it, if any
+
+    Returns:
+        ChatResponse: The reply and whether it came from the cache or the FAQ
+
+    Raises:
+        UpstreamError: If no reply could be obtained
+    """
+    entry, passages = lookup_faq(user_message)
+    if entry is not None:
+        return ChatResponse(entry['answer'], faq_id=entry['id'])
+
+    service = get_openai_service()
+
+    if not service.api_key:
+        current_app.logger.error("OpenAI API key is not set in environment variables or application config")
+        raise UpstreamConfigError()
+
+    return _fetch_response(user_message, context, passages)
+
 
 def get_openai_response(user_message):
     """
@@ -11,45 +416,35 @@ def get_openai_response(user_message):
 
     Returns:
         str: The response from OpenAI API
+
+    Raises:
+        UpstreamError: If no reply could be obtained
     """
-    try:
-        # Get the API key from environment or config
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key and current_app:
-            api_key = current_app.config.get('OPENAI_API_KEY')
-        
-        if not api_key:
-            error_msg = "OpenAI API key is not set in environment variables or application config"
-            current_app.logger.error(error_msg)
-            return "I'm having trouble connecting to my knowledge service. Please try again later or contact support."
-        
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
-        
-        # Create the chat completion with medical context
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful medical assistant. Provide accurate medical information while being concise and professional. Always remind users to consult healthcare professionals for specific medical advice."
-                },
-                {
-                    "role": "user",
-                    "content": user_message
-                }
-            ],
-            max_tokens=500,
-            temperature=0.7,
-            top_p=1.0
-        )
-        
-        # Extract and return the assistant's response
-        if response.choices and len(response.choices) > 0:
-            return response.choices[0].message.content.strip()
-        else:
-            return "I apologize, but I couldn't generate a response. Please try again."
-            
-    except Exception as e:
-        current_app.logger.error(f"Error in OpenAI service: {str(e)}")
-        return f"I'm experiencing technical difficulties. Please try again later. Error: {str(e)}"
\ No newline at end of file
+    return get_chat_response(user_message).content
+
+
+def stream_openai_response(user_message, context=None):
+    """
+    Stream a response from OpenAI API based on the user's message.
+
+    Args:
+        user_message (str): The message from the user
+        context (ContextWindow): Earlier conversation to send with it, if any
+
+    Returns:
+        iterator: Content deltas from the completion as they arrive
+
+    Raises:
+        UpstreamError: If the stream could not be started
+    """
+    entry, passages = lookup_faq(user_message)
+    if entry is not None:
+        return iter((entry['answer'],))
+
+    service = get_openai_service()
+
+    if not service.api_key:
+        current_app.logger.error("OpenAI API key is not set in environment variables or application config")
+        raise UpstreamConfigError()
+
+    return service.stream(_build_messages(user_message, context, passages), **_sampling_params())
@@ -0,0 +1,121 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from flask import g, has_request_context, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_SALT = 'request-profile'
+
+
+def create_profile_token(app):
+    """Create a signed token that enables profiling for requests carrying it"""
+    return URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=PROFILE_SALT).dumps('profile')
+
+
+def _token_is_valid(app, token):
+    serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=PROFILE_SALT)
+    try:
+        serializer.loads(token, max_age=app.config.get('PROFILE_TOKEN_MAX_AGE', 3600))
+        return True
+    except BadSignature:
+        return False
+
+
+def _should_profile(app):
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        return _token_is_valid(app, token)
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _save_profile(app, profiler, route):
+    """Dump the profile to the profile directory and log its hottest functions"""
+    profile_dir = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    os.makedirs(profile_dir, exist_ok=True)
+    profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{route.strip('/').replace('/', '_') or 'root'}"
+    profiler.dump_stats(os.path.join(profile_dir, f"{profile_id}.prof"))
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+    app.logger.info(f"Request profile {profile_id}:\n{summary.getvalue()}")
+    return profile_id
+
+
+def init_profiling(app, db):
+    """
+    Install opt-in per-request profiling and slow-request diagnostics.
+
+    With `PROFILING_ENABLED`, a request carrying a valid signed
+    `X-Profile-Token` header (or picked by `PROFILE_SAMPLE_RATE`) runs
+    under cProfile; the profile is stored in `PROFILE_DIR` and its id is
+    returned in the `X-Profile-Id` header. Requests slower than
+    `SLOW_REQUEST_THRESHOLD_MS` are logged with their upstream time, SQL
+    statement count and statements repeated within the request. Nothing is
+    installed when both are off.
+    """
+    profiling_enabled = app.config.get('PROFILING_ENABLED', False)
+    slow_threshold = app.config.get('SLOW_REQUEST_THRESHOLD_MS', 0) / 1000.0
+    repeat_threshold = app.config.get('REPEATED_QUERY_THRESHOLD', 3)
+
+    if profiling_enabled:
+        @app.cli.command('profile-token')
+        def profile_token():
+            """Print a token for the X-Profile-Token header."""
+            print(create_profile_token(app))
+
+    if not profiling_enabled and not slow_threshold:
+        return
+
+    @app.before_request
+    def start_diagnostics():
+        g._diagnostics_start = time.perf_counter()
+        g._sql_statements = Counter()
+        if profiling_enabled and _should_profile(app):
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+
+    @app.after_request
+    def finish_diagnostics(response):
+        profiler = g.pop('_profiler', None)
+        route = request.url_rule.rule if request.url_rule else request.path
+        if profiler is not None:
+            profiler.disable()
+            response.headers['X-Profile-Id'] = _save_profile(app, profiler, route)
+
+        start = g.pop('_diagnostics_start', None)
+        if slow_threshold and start is not None:
+            elapsed = time.perf_counter() - start
+            if elapsed >= slow_threshold:
+                statements = g.get('_sql_statements') or Counter()
+                record = {
+                    'route': route,
+                    'method': request.method,
+                    'status': response.status_code,
+                    'total_ms': round(elapsed * 1000, 1),
+                    'upstream_ms': round(g.get('_upstream_time', 0.0) * 1000, 1),
+                    'sql_count': sum(statements.values()),
+                    'sql_ms': round(g.get('_sql_time', 0.0) * 1000, 1),
+                    'repeated_queries': {
+                        ' '.join(statement.split()): count
+                        for statement, count in statements.items() if count >= repeat_threshold
+                    }
+                }
+                app.logger.warning(f"Slow request: {json.dumps(record)}")
+        return response
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'after_cursor_execute')
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context():
+                statements = g.get('_sql_statements')
+                if statements is not None:
+                    statements[statement] += 1
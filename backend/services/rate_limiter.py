@@ -0,0 +1,200 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+
+def _refill(tokens, updated_at, now, rate, capacity):
+    """Return the bucket level after refilling it for the elapsed time"""
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+def _retry_after(tokens, rate, cost):
+    """Seconds until the bucket holds enough tokens for `cost`"""
+    return max(1, math.ceil((cost - tokens) / rate))
+
+
+class MemoryBucketStore:
+    """
+    Token buckets held in process memory, shared by the worker's threads.
+
+    Buckets are kept in the order they were last used. Buckets idle long
+    enough to be full again carry no state and are dropped, and at most
+    `max_keys` are kept: past that the least recently used are evicted, so
+    many distinct clients cannot grow memory without bound.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity, cost=1):
+        """
+        Take `cost` tokens from the bucket for `key`.
+
+        Returns:
+            tuple: Whether the tokens were taken, and the seconds to wait otherwise
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, rate, capacity)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            self._prune(now - capacity / rate)
+        return allowed, 0 if allowed else _retry_after(tokens, rate, cost)
+
+    def _prune(self, refilled_before):
+        """Drop the buckets last used before `refilled_before` and any beyond `max_keys`"""
+        buckets = self._buckets
+        while buckets:
+            key, (_, updated_at) = next(iter(buckets.items()))
+            if updated_at >= refilled_before and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets stored in a SQLite file so every gunicorn worker on the
+    host draws from the same buckets. Each thread uses its own connection.
+    """
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, capacity, cost=1):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*row, now, rate, capacity) if row else capacity
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                # Buckets idle long enough to be full again carry no state
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - capacity / rate,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, 0 if allowed else _retry_after(tokens, rate, cost)
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter.
+
+    Each key gets a bucket of `burst` tokens refilled at `per_minute`
+    tokens per minute; a request spends one token. Limiters sharing a store
+    keep apart by prefixing their keys with `prefix`.
+    """
+
+    def __init__(self, store, per_minute=30, burst=10, prefix=''):
+        self.store = store
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.prefix = prefix
+
+    def check(self, key, cost=1):
+        """
+        Spend tokens for a request.
+
+        Raises:
+            TooManyRequests: If the bucket is empty; carries the Retry-After delay
+        """
+        allowed, retry_after = self.store.take(self.prefix + key, self.rate, self.capacity, cost)
+        if not allowed:
+            raise TooManyRequests(retry_after=retry_after)
+
+
+def init_rate_limiter(app):
+    """
+    Create the rate limiter selected by `RATE_LIMIT_BACKEND` ('memory' or
+    'sqlite') and register it on the app.
+
+    Returns:
+        RateLimiter: The limiter, or None if rate limiting is disabled
+    """
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return None
+
+    backend_name = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend_name == 'memory':
+        store = MemoryBucketStore(app.config.get('RATE_LIMIT_MAX_KEYS', 100000))
+    elif backend_name == 'sqlite':
+        path = app.config.get('RATE_LIMIT_PATH') or os.path.join(app.instance_path, 'rate_limits.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        store = SQLiteBucketStore(path)
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend_name}")
+
+    limiter = RateLimiter(
+        store,
+        per_minute=app.config.get('RATE_LIMIT_PER_MINUTE', 30),
+        burst=app.config.get('RATE_LIMIT_BURST', 10)
+    )
+    app.extensions['rate_limiter'] = limiter
+    # Batch items draw from their own buckets, as large as the largest batch
+    app.extensions['batch_rate_limiter'] = RateLimiter(
+        store,
+        per_minute=app.config.get('RATE_LIMIT_BATCH_ITEMS_PER_MINUTE', 100),
+        burst=app.config.get('CHAT_BATCH_MAX_ITEMS', 50),
+        prefix='batch:'
+    )
+    return limiter
+
+
+def rate_limit_key():
+    """Identify the caller by user id, falling back to the client IP"""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"ip:{request.remote_addr}"
+
+
+def rate_limited(view):
+    """Reject requests with 429 once the caller's token bucket is empty"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        limiter = current_app.extensions.get('rate_limiter')
+        if limiter is not None:
+            limiter.check(rate_limit_key())
+        return view(*args, **kwargs)
+    return wrapper
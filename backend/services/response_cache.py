@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU cache with per-entry expiry.
+
+    Entries are kept in access order; the least recently used entry is
+    evicted once `max_entries` is exceeded. Only shared by the threads of
+    one worker process.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    LRU cache stored in a SQLite file so every gunicorn worker on the host
+    shares the same entries. Each thread uses its own connection.
+    """
+
+    def __init__(self, path, max_entries=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_accessed_at ON response_cache (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count_evictions(self, count):
+        if count > 0:
+            with self._lock:
+                self.evictions += count
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            cursor = conn.execute("DELETE FROM response_cache WHERE key = ? AND expires_at <= ?", (key, now))
+            self._count_evictions(cursor.rowcount)
+            return None
+        conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()
+            evicted = 0
+            if count > self.max_entries:
+                cursor = conn.execute(
+                    "DELETE FROM response_cache WHERE key IN "
+                    "(SELECT key FROM response_cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                evicted = cursor.rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count_evictions(evicted)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        (count,) = self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()
+        return count
+
+
+class ResponseCache:
+    """
+    Cache of upstream replies keyed on the normalized prompt, system prompt,
+    model and sampling parameters.
+
+    Hit and miss counters are kept per worker process.
+    """
+
+    def __init__(self, backend, ttl=3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text):
+        """Normalize a prompt so trivially different phrasings share an entry"""
+        return ' '.join(text.casefold().split()).rstrip('?!. ')
+
+    @classmethod
+    def make_key(cls, prompt, system_prompt, model, params, context=None):
+        """
+        Build the cache key for a completion request.
+
+        Args:
+            prompt (str): The user's message
+            system_prompt (str): The system prompt sent with it
+            model (str): The upstream model name
+            params (dict): Sampling parameters such as temperature and max_tokens
+            context: Earlier conversation sent with the message, if any
+
+        Returns:
+            str: A hex digest identifying the request
+        """
+        parts = [cls.normalize(prompt), system_prompt, model, params]
+        if context is not None:
+            parts.append(context)
+        payload = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @property
+    def blocking(self):
+        """Whether lookups do I/O, so async callers should run them on a thread"""
+        return not isinstance(self.backend, MemoryCacheBackend)
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Return the cache counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'size': len(self.backend)
+        }
+
+
+def init_response_cache(app):
+    """
+    Create the response cache selected by `RESPONSE_CACHE_BACKEND`
+    ('memory', 'sqlite' or 'none') and register it on the app.
+
+    Returns:
+        ResponseCache: The cache, or None if caching is disabled
+    """
+    backend_name = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+    max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1000)
+
+    if backend_name == 'none':
+        return None
+    elif backend_name == 'memory':
+        backend = MemoryCacheBackend(max_entries)
+    elif backend_name == 'sqlite':
+        path = app.config.get('RESPONSE_CACHE_PATH') or os.path.join(app.instance_path, 'response_cache.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        backend = SQLiteCacheBackend(path, max_entries)
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {backend_name}")
+
+    cache = ResponseCache(backend, ttl=app.config.get('RESPONSE_CACHE_TTL', 3600))
+    app.extensions['response_cache'] = cache
+    return cache
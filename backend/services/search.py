@@ -0,0 +1,192 @@
+import html
+import re
+from flask import current_app
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from ..models import ChatMessage
+
+FTS_TABLE = 'chat_messages_fts'
+
+# External-content FTS5 index over chat_messages.content, kept in sync by triggers
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, content='chat_messages', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF content ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END"""
+]
+
+_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Words of context shown on each side of the first match in a snippet
+SNIPPET_CONTEXT_WORDS = 8
+
+
+def search_terms(query):
+    """Split a search query into lowercase word terms"""
+    return [term.lower() for term in _TERM_PATTERN.findall(query or '')]
+
+
+def _fts_query(terms):
+    """Build an FTS5 MATCH expression requiring every term, each quoted so user input is never parsed as syntax"""
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def make_snippet(content, terms, context_words=SNIPPET_CONTEXT_WORDS):
+    """
+    Build an HTML-escaped excerpt of a message around its first matching
+    term, with matches wrapped in `<mark>` tags.
+
+    Args:
+        content (str): The message text
+        terms (list): Search terms; words starting with a term are matched
+        context_words (int): Words kept on each side of the first match
+
+    Returns:
+        str: The excerpt, with `…` where text was cut
+    """
+    if not terms:
+        return html.escape(content)
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\w*', re.IGNORECASE)
+    words = content.split()
+    first = next((i for i, word in enumerate(words) if pattern.search(word)), 0)
+    start = max(0, first - context_words)
+    end = min(len(words), first + context_words + 1)
+
+    excerpt = html.escape(' '.join(words[start:end]))
+    # Terms are word characters only, so they match the same text after escaping
+    excerpt = pattern.sub(lambda match: f'<mark>{match.group(0)}</mark>', excerpt)
+    return ('…' if start > 0 else '') + excerpt + ('…' if end < len(words) else '')
+
+
+class MessageSearch:
+    """
+    Search over a user's chat messages.
+
+    On SQLite builds with FTS5, matches come from the `chat_messages_fts`
+    index and are ranked by BM25 (FTS5's default `rank`; lower is better).
+    Elsewhere, or with `SEARCH_FTS_ENABLED` off, every term is matched
+    with a `LIKE '%term%'` scan and results are ordered newest first.
+    """
+
+    def __init__(self, fts=False):
+        self.fts = fts
+
+    def search(self, session, user_id, terms, limit, offset=0):
+        """
+        Find the user's messages containing every term.
+
+        Args:
+            session: The database session
+            user_id (int): Owner of the messages
+            terms (list): Search terms from `search_terms`
+            limit (int): Maximum results to return
+            offset (int): Results to skip, for pagination
+
+        Returns:
+            tuple: A list of `(row, rank)` pairs, ranks being None without
+            FTS, and whether more results exist
+        """
+        if self.fts:
+            try:
+                return self._search_fts(session, user_id, terms, limit, offset)
+            except OperationalError as e:
+                # E.g. the index was dropped or is corrupt; answer from a scan instead
+                session.rollback()
+                current_app.logger.error(f"Full-text search failed, falling back to LIKE: {str(e)}")
+        return self._search_like(session, user_id, terms, limit, offset)
+
+    @staticmethod
+    def _search_fts(session, user_id, terms, limit, offset):
+        rows = session.execute(text(f"""
+            SELECT m.id, m.user_id, m.conversation_id, m.content, m.is_bot, m.timestamp, {FTS_TABLE}.rank AS rank
+            FROM {FTS_TABLE} JOIN chat_messages AS m ON m.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :query AND m.user_id = :user_id
+            ORDER BY {FTS_TABLE}.rank, m.id DESC
+            LIMIT :limit OFFSET :offset
+        """).columns(is_bot=ChatMessage.is_bot.type, timestamp=ChatMessage.timestamp.type), {
+            'query': _fts_query(terms), 'user_id': user_id, 'limit': limit + 1, 'offset': offset
+        }).all()
+        results = [(row, row.rank) for row in rows]
+        return results[:limit], len(results) > limit
+
+    @staticmethod
+    def _search_like(session, user_id, terms, limit, offset):
+        conditions = [ChatMessage.content.ilike(f'%{_escape_like(term)}%', escape='\\') for term in terms]
+        rows = session.execute(
+            select(*ChatMessage.columns())
+            .where(ChatMessage.user_id == user_id, *conditions)
+            .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+            .limit(limit + 1).offset(offset)
+        ).all()
+        results = [(row, None) for row in rows]
+        return results[:limit], len(results) > limit
+
+
+def _fts5_available(connection):
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(content)"))
+        connection.execute(text("DROP TABLE temp._fts5_probe"))
+        return True
+    except OperationalError:
+        return False
+
+
+def _fts_index_exists(connection):
+    return connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': FTS_TABLE}).first() is not None
+
+
+def create_fts_index(connection):
+    """
+    Create the FTS5 index and its triggers when the database supports
+    them; run by the schema migrations. An index created over existing
+    messages is populated once.
+
+    Returns:
+        bool: Whether the index exists
+    """
+    if connection.dialect.name != 'sqlite' or not _fts5_available(connection):
+        return False
+    exists = _fts_index_exists(connection)
+    for statement in FTS_SCHEMA:
+        connection.execute(text(statement))
+    if not exists:
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+def init_search(app, db):
+    """
+    Set up message search, using the FTS5 index when the migrations
+    created it.
+
+    Returns:
+        MessageSearch: The search service, also stored in `app.extensions['message_search']`
+    """
+    fts = False
+    if app.config.get('SEARCH_FTS_ENABLED', True):
+        with app.app_context():
+            engine = db.engine
+            if engine.dialect.name == 'sqlite':
+                with engine.connect() as connection:
+                    fts = _fts_index_exists(connection)
+        if not fts:
+            app.logger.info("Full-text search unavailable, falling back to LIKE scans")
+
+    search = MessageSearch(fts=fts)
+    app.extensions['message_search'] = search
+    return search
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+
+class _Call:
+    """An in-flight call whose outcome is shared with every waiter"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result, or the same
+    exception. The key is forgotten as soon as the call finishes, so
+    failures are never reused by later callers.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Run `func` once for all concurrent callers of `key`.
+
+        Args:
+            key (str): Identifies equivalent calls
+            func (callable): Zero-argument function producing the result
+
+        Returns:
+            tuple: The result and whether it was shared from another caller's call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def in_flight(self):
+        """Return the number of keys currently being executed"""
+        with self._lock:
+            return len(self._calls)
+
+
+class _AsyncCall:
+    """A shared call running as its own task, and how many callers await it"""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    `SingleFlight` for coroutines running on one event loop.
+
+    The shared call runs as its own task, which every caller for the key
+    awaits through a shield. A caller that is cancelled, e.g. because its
+    client disconnected, stops waiting without affecting the others, even
+    if it started the call; the call is only cancelled once no caller is
+    left waiting for it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """
+        Await `func()` once for all concurrent callers of `key`.
+
+        Args:
+            key (str): Identifies equivalent calls
+            func (callable): Zero-argument coroutine function producing the result
+
+        Returns:
+            tuple: The result and whether it was shared from another caller's call
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if not shared:
+            # The task runs in a copy of this caller's context
+            call = self._calls[key] = _AsyncCall(asyncio.get_running_loop().create_task(func()))
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def in_flight(self):
+        """Return the number of keys currently being executed"""
+        return len(self._calls)
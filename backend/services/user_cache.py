@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from .. import db
+from ..models import User
+
+
+class CachedUser(UserMixin):
+    """
+    Detached, read-only snapshot of a `User` used as the session user.
+
+    It carries only the fields the request handlers read, so it can be
+    shared between requests without being bound to a database session.
+    """
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class UserCache:
+    """
+    Bounded LRU cache of session users with a per-entry TTL.
+
+    Entries are dropped on logout and whenever the `User` row is updated
+    or deleted through the ORM in this process; the TTL bounds how long
+    other workers may serve a stale record.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, user_id):
+        """
+        Return the session user for `user_id`, querying the database only
+        on a miss.
+
+        Returns:
+            CachedUser: The user, or None if it does not exist
+        """
+        user = self.get(user_id)
+        if user is not None:
+            return user
+        row = db.session.execute(
+            select(User.id, User.username, User.email).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        user = CachedUser(row.id, row.username, row.email)
+        self.set(user_id, user)
+        return user
+
+
+def init_user_cache(app):
+    """
+    Create the session user cache. Entries are invalidated on ORM updates
+    and deletes of the user by `_invalidate_on_change`.
+
+    Returns:
+        UserCache: The cache, or None if `USER_CACHE_ENABLED` is off
+    """
+    if not app.config.get('USER_CACHE_ENABLED', True):
+        return None
+
+    cache = UserCache(
+        max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 1024),
+        ttl=app.config.get('USER_CACHE_TTL', 60.0)
+    )
+    app.extensions['user_cache'] = cache
+    return cache
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_change(mapper, connection, target):
+    # Registered once for all apps; each app drops the user from its own cache
+    if has_app_context():
+        invalidate_user(target.id)
+
+
+def invalidate_user(user_id):
+    """Drop a user from the session user cache, e.g. on logout"""
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.invalidate(user_id)
@@ -1,3 +1,4 @@
+import base64
 import re
 from datetime import datetime
 
@@ -49,4 +50,38 @@ def format_timestamp(timestamp):
         return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
     else:
         # Older
-        return timestamp.strftime("%Y-%m-%d %H:%M")
\ No newline at end of file
+        return timestamp.strftime("%Y-%m-%d %H:%M")
+
+def encode_cursor(timestamp, row_id):
+    """
+    Encode a (timestamp, id) keyset position as an opaque cursor.
+    
+    Args:
+        timestamp (datetime): The row timestamp
+        row_id (int): The row id
+        
+    Returns:
+        str: The URL-safe cursor string
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor created by `encode_cursor`.
+    
+    Args:
+        cursor (str): The cursor string
+        
+    Returns:
+        tuple: The (timestamp, id) keyset position
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,291 @@
+import re
+import unicodedata
+
+
+def _after(labels, separators=(' ',), ignore_case=True):
+    """
+    Lookbehind matching when one of `labels` and a separator directly
+    precede the current position. Each alternative is fixed-width, as
+    lookbehinds must be; a check of the separator's last character comes
+    first, so most positions are rejected without trying them all.
+    """
+    flags = '(?i:{})' if ignore_case else '{}'
+    last = ''.join(sorted({re.escape(separator[-1]) for separator in separators}))
+    return f'(?<=[{last}])(?:' + '|'.join(
+        flags.format(f'(?<=\\b{re.escape(label + separator)})') for label in labels for separator in separators
+    ) + ')'
+
+
+# PHI rules by name. Labelled values (names, record numbers, birth dates)
+# are matched from their first character, with the label checked by a
+# lookbehind, so only the value is masked and the label stays for the
+# model; record numbers and dates check the shape of the value first, as
+# that rules out most positions more cheaply than the labels. Every pattern
+# is bounded in length, so streamed input only needs a fixed overlap
+# between chunks.
+RULES = {
+    'email': r"(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63}){0,8}\.[A-Za-z]{2,24}(?![\w-])",
+    'ssn': r"(?<![\w-])\d{3}-\d{2}-\d{4}(?![\w-])",
+    'mrn': r"(?=[A-Z0-9][A-Z0-9-]{4,19}(?![\w-]))" +
+           _after(('mrn', 'medical record number', 'medical record no.', 'medical record'),
+                  (' ', ':', ': ', ' : ', '#', '# ', ' #', ' # ', ' no. ')) +
+           r"[A-Z0-9][A-Z0-9-]{4,19}(?![\w-])",
+    'dob': r"(?=\d{1,4}[/.-]\d{1,2}[/.-])" + _after(('dob', 'd.o.b.', 'date of birth', 'born on', 'born'), (' ', ':', ': ')) +
+           r"\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}(?![\w-])",
+    # Bare digit groups are as often readings or doses ("135 140 165",
+    # "1000 1500 2000 mg") as phone numbers, so unlabelled numbers must have
+    # a phone number's shape: a +country code, a NANP number with '-' or '.'
+    # between its groups, or a national number with a trunk 0
+    'phone': r"(?<![\w+(-])(?:\+\d{1,3}[ .-]?(?:\(\d{1,4}\)[ .-]?)?\d{2,4}(?:[ .-]?\d{2,4}){2,3}"
+             r"|(?:\(\d{3}\)[ .-]?|\d{3}[.-])\d{3}[.-]\d{4}"
+             r"|0[1-9]\d{1,3}[ .-]?\d{3,4}[ .-]?\d{3,4}"
+             r"|" + _after(('phone', 'phone number', 'tel', 'tel.', 'telephone', 'mobile', 'cell', 'fax',
+                            'call', 'call me on', 'text', 'text me on'), (' ', ':', ': ', '#', '# ')) +
+             r"(?:\(\d{2,5}\)[ .-]?|\d{2,5}[ .-]?)\d{3,4}[ .-]?\d{3,4})(?![\w-])",
+    # A title without its period ("Mr Freeze diet") only counts before a
+    # given name and surname
+    'name': '(?:(?:' + _after(('my name is', 'name is', 'name:', 'patient:', 'patient name:')) +
+            '|' + _after(('Dr.', 'Mr.', 'Mrs.', 'Ms.', 'Mx.'), ignore_case=False) +
+            r")[A-Z][a-z'-]{1,30}(?:[ \t][A-Z][a-z'-]{1,30}){0,2}" +
+            '|' + _after(('Dr', 'Mr', 'Mrs', 'Ms', 'Miss', 'Mx'), ignore_case=False) +
+            r"[A-Z][a-z'-]{1,30}(?:[ \t][A-Z][a-z'-]{1,30}){1,2})(?![\w-])",
+}
+DEFAULT_RULES = ('email', 'ssn', 'mrn', 'dob', 'phone', 'name')
+
+# HTML elements whose tags are dropped. Only these names count as tags, so
+# '<' and '>' used as comparisons ("a<b and c>d", "glucose <140") are kept
+_TAG_NAMES = (
+    'a', 'abbr', 'article', 'aside', 'audio', 'b', 'blockquote', 'body', 'br', 'button', 'caption', 'center',
+    'code', 'col', 'dd', 'del', 'details', 'div', 'dl', 'dt', 'em', 'embed', 'fieldset', 'figure', 'font',
+    'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head', 'header', 'hr', 'html', 'i', 'iframe', 'img',
+    'input', 'ins', 'kbd', 'label', 'li', 'link', 'main', 'mark', 'meta', 'nav', 'noscript', 'object', 'ol',
+    'option', 'p', 'pre', 'q', 's', 'script', 'section', 'select', 'small', 'span', 'strike', 'strong', 'style',
+    'sub', 'summary', 'sup', 'svg', 'table', 'tbody', 'td', 'template', 'textarea', 'tfoot', 'th', 'thead',
+    'title', 'tr', 'tt', 'u', 'ul', 'video',
+)
+# Attributes given a value, or bare ones from a short list: "<b and c>" is
+# valid markup in principle, but in a chat message it is a comparison
+_TAG_ATTRIBUTE = (r"""\s+(?:[A-Za-z_:][\w:.-]*\s*=\s*(?:"[^"<>\n]*"|'[^'<>\n]*'|[^\s"'<>=`]+)"""
+                  r"|(?i:async|autofocus|autoplay|checked|controls|defer|disabled|hidden|loop|multiple|muted|"
+                  r"open|readonly|required|selected)(?=[\s/>]))")
+
+# Input normalization, matched in the same scan as the PHI rules: markup
+# tags and control characters other than tab and newline are dropped. A
+# tag is at most 256 characters to its '>', which nothing in it can skip
+_NORMALIZATION = {
+    'tag': r"(?=<[^<>\n]{0,256}>)(?:<(?i:" + '|'.join(_TAG_NAMES) + r")(?=[\s/>])(?:" + _TAG_ATTRIBUTE +
+           r")*\s*/?>|</(?i:" + '|'.join(_TAG_NAMES) + r")\s*>)",
+    'control': r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]",
+}
+
+# Every character a match can start at, except that an address is found
+# from its '@' and then extended back over its local part. A letter or
+# digit right after another one cannot start a match, so the scan stops at
+# few positions: word-initial capitals and digits and the rare symbols.
+_ANCHOR = re.compile(r"[A-Z0-9@<(+\x00-\x08\x0b\x0c\x0e-\x1f\x7f](?<![A-Za-z0-9][A-Z0-9])")
+_EMAIL_LOCAL_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-')
+_EMAIL_LOCAL_MAX = 64
+
+# Longest match of any rule; streamed input keeps this much text back
+# until the next chunk shows whether a match continues into it
+MAX_MATCH_LENGTH = 512
+# Longest lookbehind of any rule (a label, its separator and the character
+# before it); streamed input keeps this much already-emitted text as context
+_MAX_LOOKBEHIND = 32
+
+PLACEHOLDER_PATTERN = re.compile(r"\[([A-Z]{2,8})_(\d{1,4})\]")
+_MAX_PLACEHOLDER_LENGTH = 15
+
+
+class Redaction:
+    """
+    The placeholders issued while redacting one request and the text each
+    stands for. The same value always gets the same placeholder.
+    """
+
+    def __init__(self):
+        self.originals = {}
+        self.counts = {}
+        self._placeholders = {}
+
+    def placeholder(self, rule, value):
+        """Return the placeholder for `value`, issuing a new one on first sight"""
+        key = (rule, value)
+        placeholder = self._placeholders.get(key)
+        if placeholder is None:
+            self.counts[rule] = self.counts.get(rule, 0) + 1
+            placeholder = f"[{rule.upper()}_{self.counts[rule]}]"
+            self._placeholders[key] = placeholder
+            self.originals[placeholder] = value
+        return placeholder
+
+    def restore(self, text):
+        """Put the original values back in place of the placeholders issued here; others are left as they are"""
+        if not self.originals or not text or '[' not in text:
+            return text
+        return PLACEHOLDER_PATTERN.sub(lambda match: self.originals.get(match.group(0), match.group(0)), text)
+
+    def restore_stream(self, deltas):
+        """
+        Restore placeholders in streamed text. A placeholder split across
+        deltas is held back until it is complete.
+
+        Args:
+            deltas (iterable): Text pieces as they arrive
+
+        Yields:
+            str: The restored text, in pieces
+        """
+        pending = ''
+        try:
+            for delta in deltas:
+                pending += delta
+                start = pending.rfind('[')
+                if start != -1 and ']' not in pending[start:] and len(pending) - start < _MAX_PLACEHOLDER_LENGTH:
+                    ready, pending = pending[:start], pending[start:]
+                else:
+                    ready, pending = pending, ''
+                if ready:
+                    yield self.restore(ready)
+            if pending:
+                yield self.restore(pending)
+        finally:
+            # Closing this iterator closes the underlying stream right away
+            close = getattr(deltas, 'close', None)
+            if close is not None:
+                close()
+
+    def __bool__(self):
+        return bool(self.originals)
+
+
+class Redactor:
+    """
+    Normalizes text and masks PHI in a single scan.
+
+    Text is NFKC-normalized (so full-width digits and similar look-alikes
+    match), then scanned once: a character class finds the few positions a
+    match can start at, and one precompiled alternation of every enabled
+    rule and the normalization patterns is tried there. Tags and control
+    characters are dropped and PHI is replaced by placeholders such as
+    `[PHONE_1]`, which `Redaction.restore` turns back into the originals.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        unknown = set(rules) - set(RULES)
+        if unknown:
+            raise ValueError(f"Unknown redaction rules: {', '.join(sorted(unknown))}")
+        self.rules = tuple(rules)
+        alternatives = {**_NORMALIZATION, **{name: RULES[name] for name in self.rules}}
+        self.pattern = re.compile('|'.join(f"(?P<{name}>{pattern})" for name, pattern in alternatives.items()))
+
+    @staticmethod
+    def normalize(text):
+        # NFKC is a no-op on ASCII, which most messages are
+        return text if text.isascii() else unicodedata.normalize('NFKC', text)
+
+    def redact(self, text, redaction=None):
+        """
+        Normalize `text` and mask its PHI.
+
+        Args:
+            text (str): The text to redact
+            redaction (Redaction): Placeholders shared with other texts of
+                the same request; a new one is started if not given
+
+        Returns:
+            tuple: The redacted text and the `Redaction`
+        """
+        redaction = redaction if redaction is not None else Redaction()
+        if not text:
+            return text, redaction
+        text = self.normalize(text)
+        return self._scan(text, 0, len(text), redaction)[0], redaction
+
+    def _scan(self, text, start, limit, redaction):
+        """
+        Redact `text[start:]` up to `limit`, stopping early before a match
+        that ends past `limit`.
+
+        Returns:
+            tuple: The redacted text and the position it covers up to
+        """
+        out = []
+        position = search_from = start
+        while True:
+            # Searched past `limit`, as an address may start before it and
+            # only be found from its '@' after it
+            anchor = _ANCHOR.search(text, search_from)
+            if anchor is None:
+                break
+            begin = anchor.start()
+            search_from = begin + 1
+            if text[begin] == '@':
+                floor = max(position, begin - _EMAIL_LOCAL_MAX)
+                while begin > floor and text[begin - 1] in _EMAIL_LOCAL_CHARS:
+                    begin -= 1
+            if begin >= limit:
+                break
+            match = self.pattern.match(text, begin)
+            if match is None:
+                continue
+            if match.end() > limit:
+                limit = begin
+                break
+            out.append(text[position:begin])
+            rule = match.lastgroup
+            if rule not in _NORMALIZATION:
+                out.append(redaction.placeholder(rule, match.group()))
+            position = search_from = match.end()
+        limit = max(limit, position)
+        out.append(text[position:limit])
+        return ''.join(out), limit
+
+    def redact_stream(self, chunks, redaction):
+        """
+        Redact text arriving in chunks, without holding all of it.
+
+        The last `MAX_MATCH_LENGTH` characters of each chunk are held back
+        until the next one arrives, so a match straddling two chunks is
+        still found; memory stays bounded by the chunk size plus that.
+
+        Args:
+            chunks (iterable): Pieces of the text in order
+            redaction (Redaction): Collects the placeholders issued
+
+        Yields:
+            str: Redacted text, in pieces
+        """
+        pending = ''
+        # After the first flush `pending` starts with up to `_MAX_LOOKBEHIND`
+        # characters already emitted, so lookbehinds still see their labels
+        lead = 0
+        for chunk in chunks:
+            pending += self.normalize(chunk)
+            if len(pending) - lead <= 2 * MAX_MATCH_LENGTH:
+                continue
+            redacted, position = self._scan(pending, lead, len(pending) - MAX_MATCH_LENGTH, redaction)
+            if position > lead:
+                lead = min(position, _MAX_LOOKBEHIND)
+                pending = pending[position - lead:]
+            yield redacted
+        if len(pending) > lead:
+            yield self._scan(pending, lead, len(pending), redaction)[0]
+
+    def redact_messages(self, messages):
+        """
+        Redact the content of chat completion messages with one shared
+        `Redaction`, so a value repeated across turns keeps its placeholder.
+
+        Returns:
+            tuple: New message dicts and the `Redaction`
+        """
+        redaction = Redaction()
+        redacted = []
+        for message in messages:
+            content = message.get('content')
+            if isinstance(content, str):
+                message = {**message, 'content': self.redact(content, redaction)[0]}
+            redacted.append(message)
+        return redacted, redaction
+
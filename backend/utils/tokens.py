@@ -0,0 +1,43 @@
+import re
+
+# Words, digit runs and single symbols, roughly the pieces a BPE tokenizer starts from
+_PIECE_PATTERN = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+
+# Tokens the chat format adds around every message, and to prime the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text without a tokenizer.
+
+    Words of up to seven letters count as one token and longer ones as one
+    per five characters; digits are grouped in threes and every symbol
+    counts as one.
+    This tracks the OpenAI tokenizers closely enough for budgeting English
+    chat text and slightly overestimates, which keeps prompts within budget.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: The estimated token count
+    """
+    if not text:
+        return 0
+    count = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        length = len(piece)
+        if piece[0].isdigit():
+            count += (length + 2) // 3
+        elif length <= 7:
+            count += 1
+        else:
+            count += (length + 4) // 5
+    return count
+
+
+def message_tokens(content):
+    """Estimate the tokens one chat message adds to a prompt"""
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
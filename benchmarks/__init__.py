@@ -0,0 +1 @@
+# Benchmarks and local tooling for exercising the backend without the paid upstream
@@ -0,0 +1,127 @@
+"""
+Compare how many concurrent chat messages one process can serve in sync
+(gunicorn threads) and async (uvicorn, `backend.asgi:app`) mode against the
+local stub upstream.
+
+Each mode is started as a separate single-process server. For every
+concurrency level, that many clients send one message each at the same
+time; with a slow upstream the sync server completes at most `--threads`
+messages per upstream round trip while the async server keeps them all in
+flight.
+
+    python -m benchmarks.bench_async --latency 1.0 --concurrency 50 100 300 --threads 32
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.stub_upstream import start_stub_server
+
+
+def server_command(mode, port, threads):
+    if mode == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '--workers', '1', '--worker-class', 'gthread',
+                '--threads', str(threads), '--bind', f"127.0.0.1:{port}", '--log-level', 'warning',
+                'backend.app:app']
+    return [sys.executable, '-m', 'uvicorn', 'backend.asgi:app', '--workers', '1',
+            '--port', str(port), '--log-level', 'warning', '--no-access-log']
+
+
+def start_server(mode, port, threads, stub_url, workdir):
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, mode + '.db')}",
+               OPENAI_API_KEY='stub-key',
+               OPENAI_BASE_URL=stub_url,
+               OPENAI_MAX_CONCURRENT_REQUESTS=str(threads),
+               RATE_LIMIT_ENABLED='false',
+               RESPONSE_CACHE_BACKEND='none',
+               OPENAI_COALESCE_REQUESTS='false')
+    process = subprocess.Popen(server_command(mode, port, threads), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"{base_url}/api/health", timeout=5)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def run_level(base_url, concurrency, timeout):
+    """Send `concurrency` simultaneous messages and collect their latencies"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def client(i):
+        nonlocal errors
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            response = requests.post(f"{base_url}/api/chat/message",
+                                     json={'message': f"Concurrent question {i} {time.time()}"}, timeout=timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return latencies, errors, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async serving concurrency benchmark')
+    parser.add_argument('--latency', type=float, default=1.0, help='Stub upstream latency in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 100, 300])
+    parser.add_argument('--threads', type=int, default=32, help='Worker threads of the sync server')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Client timeout per request')
+    parser.add_argument('--modes', nargs='+', choices=['sync', 'async'], default=['sync', 'async'])
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=args.latency)
+    print(f"Stub upstream latency {args.latency:.2f}s, sync server threads {args.threads}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for port, mode in enumerate(args.modes, start=5600):
+            process, base_url = start_server(mode, port, args.threads, stub.base_url, workdir)
+            try:
+                run_level(base_url, min(args.concurrency), args.timeout)  # Warm up connections and imports
+                for concurrency in args.concurrency:
+                    latencies, errors, wall = run_level(base_url, concurrency, args.timeout)
+                    p50 = statistics.median(latencies) * 1000 if latencies else 0.0
+                    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000 if latencies else 0.0
+                    print(f"{mode:5s} concurrency={concurrency:4d}  ok={len(latencies):4d}  errors={errors:3d}  "
+                          f"wall={wall:6.2f}s  p50={p50:8.1f}ms  p99={p99:8.1f}ms  "
+                          f"throughput={len(latencies) / wall:7.1f} msg/s")
+            finally:
+                process.terminate()
+                process.wait()
+
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
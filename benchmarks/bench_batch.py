@@ -0,0 +1,81 @@
+"""
+Compare answering a questionnaire with sequential `/api/chat/message`
+calls against one `/api/chat/batch` request, with the stub upstream adding
+a fixed latency per completion. Both runs save the messages for a logged-in
+user; the response cache is disabled so every item reaches the upstream.
+
+    python -m benchmarks.bench_batch --items 10 30 50 --latency 0.5
+"""
+import argparse
+import time
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.seed import BENCHMARK_PASSWORD, create_user
+from benchmarks.stub_upstream import start_stub_server
+
+
+def make_app(base_url, max_items):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        OPENAI_API_KEY = 'stub-key'
+        OPENAI_BASE_URL = base_url
+        RATE_LIMIT_ENABLED = False
+        RESPONSE_CACHE_BACKEND = 'none'
+        OPENAI_MAX_CONCURRENT_REQUESTS = max_items
+        CHAT_BATCH_MAX_ITEMS = max_items
+
+    return create_app(BenchConfig)
+
+
+def login(app, username):
+    client = app.test_client()
+    with app.app_context():
+        create_user(username)
+    response = client.post('/api/auth/login', json={'username': username, 'password': BENCHMARK_PASSWORD})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return client
+
+
+def run_sequential(client, questions):
+    start = time.perf_counter()
+    for question in questions:
+        response = client.post('/api/chat/message', json={'message': question})
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return time.perf_counter() - start
+
+
+def run_batch(client, questions):
+    start = time.perf_counter()
+    response = client.post('/api/chat/batch', json={'messages': questions, 'new_conversation': True})
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+    failed = [result for result in response.get_json()['results'] if result['status'] != 200]
+    assert not failed, failed[0]
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sequential messages vs one batch request')
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 30, 50])
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=args.latency)
+    try:
+        app = make_app(stub.base_url, max(args.items))
+        client = login(app, 'batch-user')
+
+        for items in args.items:
+            questions = [f"Questionnaire {items}, question {i}: how often should I check my blood pressure?"
+                         for i in range(items)]
+            sequential = run_sequential(client, questions)
+            batch = run_batch(client, questions)
+            print(f"items={items:3d} sequential={sequential:7.2f}s batch={batch:6.2f}s "
+                  f"speedup={sequential / batch:6.1f}x  (one upstream call: {args.latency:.2f}s)")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Measure the per-request overhead saved by the shared upstream client.
+
+Sends sequential completions to the local stub upstream, once creating a
+new `OpenAI` client per request (the previous behavior) and once through
+the pooled `OpenAIService` that `create_app` initializes.
+
+    python -m benchmarks.bench_client_pool --requests 200
+"""
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+
+from backend.services.openai_service import _build_messages, get_openai_service
+from benchmarks.bench_stream import make_app
+from benchmarks.stub_upstream import start_stub_server
+
+
+def per_request_client(base_url, messages):
+    client = OpenAI(api_key='stub-key', base_url=base_url)
+    client.chat.completions.create(model='gpt-3.5-turbo', messages=messages, max_tokens=500)
+
+
+def run(label, func, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:20s} mean={statistics.mean(samples):7.2f}ms  p50={statistics.median(samples):7.2f}ms  "
+          f"p95={sorted(samples)[int(len(samples) * 0.95) - 1]:7.2f}ms")
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pooled upstream client benchmark')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    stub = start_stub_server(chunks=20)
+    try:
+        app = make_app(stub.base_url)
+        messages = _build_messages('What is a normal blood pressure?')
+        with app.app_context():
+            service = get_openai_service()
+            service.complete(messages)  # Warm up the pool
+
+            fresh = run('client per request', lambda: per_request_client(stub.base_url, messages), args.requests)
+            pooled = run('shared client', lambda: service.complete(messages), args.requests)
+        print(f"overhead saved per request: {fresh - pooled:.2f}ms")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Measure bytes sent and server CPU per poll of `/api/chat/history` when the
+history has not changed: uncompressed, gzip- and brotli-compressed, and
+revalidated with `If-None-Match` (304 Not Modified).
+
+CPU is the thread time of each in-process request, so it covers the
+query, serialization and compression but no network I/O.
+
+    python -m benchmarks.bench_conditional --messages 1000 --polls 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.seed import BENCHMARK_PASSWORD, create_user, seed_messages
+
+
+def make_app(path, compression):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        RATE_LIMIT_ENABLED = False
+        METRICS_ENABLED = False
+        COMPRESSION_ENABLED = compression
+
+    return create_app(BenchConfig)
+
+
+def poll(client, query, polls, headers):
+    sent = 0
+    cpu = 0.0
+    statuses = set()
+    for _ in range(polls):
+        start = time.thread_time()
+        response = client.get(f'/api/chat/history{query}', headers=headers)
+        body = response.get_data()
+        cpu += time.thread_time() - start
+        sent += len(body)
+        statuses.add(response.status_code)
+    return sent / polls, cpu / polls * 1000, sorted(statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conditional GET and compression benchmark')
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--query', default='', help="History query string, e.g. '?limit=50'")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_conditional.db')
+    app = make_app(path, compression=False)
+    with app.app_context():
+        user_id = create_user('poll-user')
+        seed_messages(user_id, args.messages)
+
+    modes = [
+        ('uncompressed', False, {'Accept-Encoding': 'identity'}),
+        ('gzip', True, {'Accept-Encoding': 'gzip'}),
+        ('brotli', True, {'Accept-Encoding': 'br, gzip'}),
+        ('etag 304', False, None),
+    ]
+    baseline = None
+    for label, compression, headers in modes:
+        client = make_app(path, compression).test_client()
+        client.post('/api/auth/login', json={'username': 'poll-user', 'password': BENCHMARK_PASSWORD})
+        if headers is None:
+            etag = client.get(f'/api/chat/history{args.query}').headers['ETag']
+            headers = {'If-None-Match': etag}
+        poll(client, args.query, 5, headers)  # Warm up
+
+        size, cpu_ms, statuses = poll(client, args.query, args.polls, headers)
+        baseline = baseline or (size, cpu_ms)
+        print(f"{label:12s} status={statuses} bytes/poll={size:10.0f} ({size / baseline[0] * 100:6.2f}%)  "
+              f"cpu/poll={cpu_ms:7.3f}ms ({cpu_ms / baseline[1] * 100:6.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Export a large synthetic history through `/api/chat/export` and report
+throughput and resident memory growth while streaming.
+
+    python -m benchmarks.bench_export --messages 1000000
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+import zlib
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.seed import create_user, seed_messages
+
+
+def current_rss():
+    """Resident set size in bytes, falling back to the peak on non-Linux systems"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def export(client, compress):
+    query = '?gzip=1' if compress else ''
+    response = client.get(f"/api/chat/export{query}", buffered=False)
+    assert response.status_code == 200
+    decompressor = zlib.decompressobj(wbits=31) if compress else None
+
+    baseline = peak = current_rss()
+    lines = transferred = 0
+    start = time.perf_counter()
+    for chunk in response.response:
+        transferred += len(chunk)
+        lines += (decompressor.decompress(chunk) if compress else chunk).count(b'\n')
+        peak = max(peak, current_rss())
+    elapsed = time.perf_counter() - start
+    response.close()
+
+    label = 'ndjson.gz' if compress else 'ndjson'
+    print(f"{label:10s} rows={lines} bytes={transferred / 1024 / 1024:8.1f}MiB time={elapsed:6.1f}s "
+          f"rows/s={lines / elapsed:9.0f} rss_growth={(peak - baseline) / 1024 / 1024:6.1f}MiB")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming export benchmark')
+    parser.add_argument('--messages', type=int, default=1000000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_export.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        user_id = create_user('export-bench')
+        seed_messages(user_id, args.messages)
+
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'export-bench', 'password': 'benchmark-password'})
+
+    for compress in (False, True):
+        rows = export(client, compress)
+        if rows != args.messages:
+            raise SystemExit(f"expected {args.messages} rows, exported {rows}")
+
+
+if __name__ == '__main__':
+    main()
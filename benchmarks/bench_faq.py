@@ -0,0 +1,193 @@
+"""
+Measure the local FAQ retrieval tier: index build time and size, query
+latency one at a time and batched, how often exact, reworded and unrelated
+questions are answered from the FAQ, and the end-to-end latency of an
+FAQ-answered `/api/chat/message` against one that goes to the stub upstream.
+
+The corpus is generated from question templates over drug and condition
+names, so its size can be scaled freely.
+
+    python -m benchmarks.bench_faq --entries 1000 --latency 0.3
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_stream import make_app
+from benchmarks.stub_upstream import start_stub_server
+
+from backend.services.faq_index import DEFAULT_DIM, FaqIndex
+
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    raise SystemExit('numpy is required: pip install numpy')
+
+DRUGS = (
+    "ibuprofen paracetamol aspirin naproxen metformin insulin lisinopril amlodipine atorvastatin simvastatin "
+    "omeprazole lansoprazole amoxicillin doxycycline azithromycin cetirizine loratadine prednisolone salbutamol "
+    "levothyroxine warfarin apixaban clopidogrel sertraline citalopram fluoxetine gabapentin codeine tramadol "
+    "ramipril bisoprolol furosemide montelukast melatonin zinc iron folic-acid magnesium"
+).split()
+CONDITIONS = (
+    "headache migraine fever cold flu asthma eczema diabetes hypertension arthritis backache insomnia "
+    "anxiety depression heartburn constipation diarrhoea hay-fever acne gout anaemia pregnancy breastfeeding "
+    "kidney-disease liver-disease a-stomach-ulcer high-cholesterol a-sore-throat an-ear-infection a-chest-infection"
+).split()
+# Question templates and a terse alternate phrasing of each
+TEMPLATES = (
+    ("What is the usual dose of {drug} for {condition}?", "{drug} dosage {condition}"),
+    ("Can I take {drug} if I have {condition}?", "{drug} with {condition}"),
+    ("Is {drug} safe to use during {condition}?", "{drug} safety {condition}"),
+    ("What are the side effects of {drug} when treating {condition}?", "{drug} side effects {condition}"),
+    ("How long does {drug} take to work for {condition}?", "{drug} onset time {condition}"),
+    ("Should I stop taking {drug} if my {condition} gets worse?", "stop {drug} worsening {condition}"),
+)
+UNRELATED = [
+    "How do I reset my password?",
+    "What time does the clinic open on Sundays?",
+    "Tell me a joke about penguins",
+    "Which running shoes are best for flat feet?",
+    "How many calories are in a banana?",
+]
+
+
+def make_corpus(count, rng):
+    combos = [(template, drug, condition) for template in TEMPLATES for drug in DRUGS for condition in CONDITIONS]
+    if count > len(combos):
+        raise SystemExit(f"At most {len(combos)} distinct entries can be generated")
+    entries = []
+    for position, ((template, alternate), drug, condition) in enumerate(rng.sample(combos, count)):
+        fill = {'drug': drug, 'condition': condition.replace('-', ' ')}
+        entries.append({
+            'id': position,
+            'question': template.format(**fill),
+            'answer': f"Vetted answer about {fill['drug']} and {fill['condition']}.",
+            'alternates': [alternate.format(**fill)]
+        })
+    return entries
+
+
+def reword(question, rng):
+    """Lowercase, drop the punctuation and one short word, and add a typo"""
+    words = question.lower().rstrip('?').split()
+    short = [i for i, word in enumerate(words) if len(word) <= 3]
+    if short:
+        del words[rng.choice(short)]
+    long_words = [i for i, word in enumerate(words) if len(word) > 6]
+    if long_words:
+        i = rng.choice(long_words)
+        j = rng.randrange(1, len(words[i]) - 1)
+        words[i] = words[i][:j] + words[i][j + 1] + words[i][j] + words[i][j + 2:]
+    return ' '.join(words)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def time_queries(index, queries, batch_size):
+    samples = []
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        began = time.perf_counter()
+        index.search(batch, k=3)
+        samples.append((time.perf_counter() - began) * 1000)
+    per_query = sum(samples) / len(queries)
+    return statistics.median(samples), percentile(samples, 0.99), per_query
+
+
+def answer_rate(index, queries, expected, threshold, top_k, min_score):
+    """
+    Share of queries answered from the FAQ, the share of those answered
+    with the expected entry, and the share of the rest whose prompt gets the
+    expected entry (or, without one, any entry)
+    """
+    answered = correct = in_context = 0
+    for matches, entry_id in zip(index.search(queries, k=top_k), expected):
+        if matches and matches[0].score >= threshold:
+            answered += 1
+            correct += matches[0].entry['id'] == entry_id
+        elif any(entry_id in (None, match.entry['id']) and match.score >= min_score for match in matches):
+            in_context += 1
+    return answered / len(queries), correct / max(answered, 1), in_context / max(len(queries) - answered, 1)
+
+
+def time_endpoint(client, message, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.post('/api/chat/message', json={'message': message})
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(samples), response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local FAQ retrieval benchmark')
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--min-score', type=float, default=0.3)
+    parser.add_argument('--latency', type=float, default=0.3, help='Stub upstream latency in seconds')
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    entries = make_corpus(args.entries, rng)
+
+    start = time.perf_counter()
+    index = FaqIndex.build(entries, dim=args.dim)
+    build_s = time.perf_counter() - start
+    path = os.path.join(tempfile.mkdtemp(), 'faq_index')
+    index.save(path)
+    print(f"Built {len(index)} entries / {index.matrix.shape[1]} phrasings x {index.dim} buckets "
+          f"({index.matrix.nbytes / 1e6:.1f} MB) in {build_s:.2f}s")
+
+    for mmap in (False, True):
+        start = time.perf_counter()
+        FaqIndex.load(path, mmap=mmap)
+        print(f"load mmap={str(mmap):5s} {(time.perf_counter() - start) * 1000:8.2f}ms")
+    index = FaqIndex.load(path, mmap=True)
+
+    sample = rng.sample(entries, min(args.queries, len(entries)))
+    exact = [entry['question'] for entry in sample]
+    reworded = [reword(entry['question'], rng) for entry in sample]
+    expected = [entry['id'] for entry in sample]
+    index.search(exact[:8])  # Fault the mapped pages in
+
+    for batch_size in (1, args.batch_size):
+        p50, p99, per_query = time_queries(index, reworded, batch_size)
+        print(f"search batch={batch_size:3d} p50={p50:7.3f}ms p99={p99:7.3f}ms per query={per_query:7.3f}ms")
+
+    for label, queries, ids in (('exact', exact, expected), ('reworded', reworded, expected),
+                                ('unrelated', UNRELATED, [None] * len(UNRELATED))):
+        answered, precision, in_context = answer_rate(index, queries, ids, args.threshold, args.top_k, args.min_score)
+        context_label = 'passages added otherwise' if label == 'unrelated' else 'right entry in prompt otherwise'
+        print(f"{label:9s} answered from FAQ={answered * 100:5.1f}%  correct when answered={precision * 100:5.1f}%  "
+              f"{context_label}={in_context * 100:5.1f}%")
+
+    stub = start_stub_server(latency=args.latency)
+    try:
+        app = make_app(stub.base_url)
+        app.extensions.pop('response_cache', None)  # Every miss reaches the upstream
+        client = app.test_client()
+        upstream_ms, _ = time_endpoint(client, UNRELATED[0], args.requests)
+        app.extensions['faq_index'] = index
+        faq_ms, reply = time_endpoint(client, exact[0], args.requests)
+        assert reply['faq_id'] == expected[0], reply
+        print(f"/api/chat/message p50: upstream={upstream_ms:8.2f}ms  faq={faq_ms:6.2f}ms  "
+              f"upstream calls={stub.stats()['requests']}")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
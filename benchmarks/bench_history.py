@@ -0,0 +1,81 @@
+"""
+Compare the previous full-history query against keyset-paginated pages
+of `/api/chat/history` for a user with many messages.
+
+    python -m benchmarks.bench_history --messages 100000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from backend import create_app, db
+from backend.config import Config
+from backend.models import ChatMessage
+from benchmarks.seed import create_user, seed_messages
+
+
+def measure(label, func, iterations):
+    samples = []
+    tracemalloc.start()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        size = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:28s} p50={statistics.median(samples):9.2f}ms  peak_mem={peak / 1024 / 1024:8.2f}MiB  "
+          f"body={size / 1024:9.1f}KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chat history pagination benchmark')
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_history.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        user_id = create_user('history-bench')
+        seed_messages(user_id, args.messages)
+
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'history-bench', 'password': 'benchmark-password'})
+
+    def legacy_full_history():
+        # The previous implementation: hydrate every row then serialize it
+        with app.app_context():
+            messages = ChatMessage.query.filter_by(user_id=user_id).order_by(ChatMessage.timestamp).all()
+            return len(json.dumps({'history': [message.to_dict() for message in messages]}))
+
+    def endpoint(query):
+        def run():
+            response = client.get(f"/api/chat/history{query}")
+            assert response.status_code == 200, response.get_data(as_text=True)
+            return len(response.get_data())
+        return run
+
+    cursor = client.get('/api/chat/history?limit=1').get_json()['before_cursor']
+
+    measure('legacy ORM full history', legacy_full_history, args.iterations)
+    measure('projected full history', endpoint(''), args.iterations)
+    measure('latest page (limit=50)', endpoint('?limit=50'), args.iterations)
+    measure('keyset page (before)', endpoint(f"?limit=50&before={cursor}"), args.iterations)
+
+    with app.app_context():
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT id FROM chat_messages WHERE user_id = :u "
+            "ORDER BY timestamp DESC, id DESC LIMIT 51"), {'u': user_id}).all()
+        print('query plan:', '; '.join(row[-1] for row in plan))
+
+
+if __name__ == '__main__':
+    main()
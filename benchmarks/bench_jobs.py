@@ -0,0 +1,126 @@
+"""
+Compare how long request threads are held while answering messages behind
+a slow upstream: blocking `/api/chat/message` calls against submitting
+`/api/chat/jobs` and fetching the result with short polls or a long-poll.
+
+Several clients each send their messages one after another. For every
+mode the benchmark reports the request-thread seconds spent per message
+(the sum of all HTTP request durations, i.e. what a fixed pool of server
+threads has to cover) and the latency from sending a message to having its
+reply. Short polls hold a thread only for a query each; a long-poll holds
+one for as long as it waits, like a blocking call, but can be cut short
+with `wait`.
+
+    python -m benchmarks.bench_jobs --clients 8 --messages 5 --latency 2.0
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.seed import BENCHMARK_PASSWORD, create_user
+from benchmarks.stub_upstream import start_stub_server
+
+
+def make_app(base_url, workers, poll_interval):
+    class BenchConfig(Config):
+        # A file, as the job workers use their own connections
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_jobs.db')}"
+        OPENAI_API_KEY = 'stub-key'
+        OPENAI_BASE_URL = base_url
+        RATE_LIMIT_ENABLED = False
+        RESPONSE_CACHE_BACKEND = 'none'
+        METRICS_ENABLED = False
+        SLOW_REQUEST_THRESHOLD_MS = 0
+        OPENAI_MAX_CONCURRENT_REQUESTS = workers
+        CHAT_JOBS_WORKERS = workers
+        CHAT_JOBS_POLL_INTERVAL = poll_interval
+
+    return create_app(BenchConfig)
+
+
+def timed(held, func, *args, **kwargs):
+    start = time.perf_counter()
+    response = func(*args, **kwargs)
+    held.append(time.perf_counter() - start)
+    assert response.status_code in (200, 202), response.get_data(as_text=True)
+    return response
+
+
+def blocking(client, message, held, poll_interval):
+    timed(held, client.post, '/api/chat/message', json={'message': message})
+
+
+def short_poll(client, message, held, poll_interval):
+    job = timed(held, client.post, '/api/chat/jobs', json={'message': message}).get_json()
+    while job['status'] not in ('succeeded', 'failed'):
+        time.sleep(poll_interval)
+        job = timed(held, client.get, f"/api/chat/jobs/{job['id']}").get_json()
+
+
+def long_poll(client, message, held, poll_interval):
+    job = timed(held, client.post, '/api/chat/jobs', json={'message': message}).get_json()
+    while job['status'] not in ('succeeded', 'failed'):
+        job = timed(held, client.get, f"/api/chat/jobs/{job['id']}?wait=25").get_json()
+
+
+MODES = {'blocking /message': blocking, 'jobs + short polls': short_poll, 'jobs + long-poll': long_poll}
+
+
+def run_mode(app, mode, clients, messages, poll_interval):
+    held, latencies, lock = [], [], threading.Lock()
+
+    def run_client(client):
+        local_held, local_latencies = [], []
+        for i in range(messages):
+            start = time.perf_counter()
+            MODES[mode](client, f'{mode} question {i}', local_held, poll_interval)
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            held.extend(local_held)
+            latencies.extend(local_latencies)
+
+    threads = [threading.Thread(target=run_client, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    total = len(clients) * messages
+    print(f"{mode:20s} thread-seconds/message={sum(held) / total:6.3f}  requests/message={len(held) / total:5.1f}  "
+          f"latency p50={statistics.median(latencies):6.2f}s  max={max(latencies):6.2f}s  wall={elapsed:6.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Background chat job benchmark')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=5, help='Messages per client')
+    parser.add_argument('--latency', type=float, default=2.0, help='Seconds per upstream completion')
+    parser.add_argument('--workers', type=int, default=8, help='Job workers (and upstream slots)')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='Seconds between short polls')
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=args.latency)
+    try:
+        app = make_app(stub.base_url, args.workers, args.poll_interval)
+        app.extensions['openai_service'].client  # Load the SDK before timing
+        clients = []
+        for i in range(args.clients):
+            with app.app_context():
+                create_user(f'job-client-{i}')
+            client = app.test_client()
+            client.post('/api/auth/login', json={'username': f'job-client-{i}', 'password': BENCHMARK_PASSWORD})
+            clients.append(client)
+        for mode in MODES:
+            run_mode(app, mode, clients, args.messages, args.poll_interval)
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
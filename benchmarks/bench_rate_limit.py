@@ -0,0 +1,90 @@
+"""
+Overload `/api/chat/message` from a few abusive clients while one
+well-behaved client keeps sending at a modest pace, and report accepted
+throughput per second, rejections and the well-behaved client's success
+rate. With rate limiting the accepted throughput stays flat no matter how
+hard the abusive clients push.
+
+    python -m benchmarks.bench_rate_limit --abusers 8 --duration 5
+"""
+import argparse
+import collections
+import os
+import tempfile
+import threading
+import time
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.stub_upstream import start_stub_server
+
+
+def make_app(base_url, backend):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        OPENAI_API_KEY = 'stub-key'
+        OPENAI_BASE_URL = base_url
+        RESPONSE_CACHE_BACKEND = 'none'
+        OPENAI_COALESCE_REQUESTS = False
+        RATE_LIMIT_BACKEND = backend
+        RATE_LIMIT_PATH = os.path.join(tempfile.mkdtemp(), 'rate_limits.sqlite')
+        RATE_LIMIT_PER_MINUTE = 120
+        RATE_LIMIT_BURST = 5
+
+    return create_app(BenchConfig)
+
+
+def run(app, abusers, duration, polite_interval):
+    deadline = time.monotonic() + duration
+    accepted_per_second = collections.Counter()
+    statuses = collections.Counter()
+    polite = collections.Counter()
+    lock = threading.Lock()
+    start = time.monotonic()
+
+    def client_loop(address, interval, counter):
+        client = app.test_client()
+        i = 0
+        while time.monotonic() < deadline:
+            response = client.post('/api/chat/message', json={'message': f"{address} question {i}"},
+                                   environ_base={'REMOTE_ADDR': address})
+            i += 1
+            with lock:
+                counter[response.status_code] += 1
+                if response.status_code == 200:
+                    accepted_per_second[int(time.monotonic() - start)] += 1
+            if interval:
+                time.sleep(interval)
+
+    threads = [threading.Thread(target=client_loop, args=(f"10.0.0.{i + 1}", 0, statuses))
+               for i in range(abusers)]
+    threads.append(threading.Thread(target=client_loop, args=('10.0.1.1', polite_interval, polite)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    seconds = [accepted_per_second[s] for s in range(int(duration))]
+    print(f"  accepted/s per second: {seconds}")
+    print(f"  abusive clients: {dict(statuses)}")
+    print(f"  polite client:   {dict(polite)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rate limiting overload test')
+    parser.add_argument('--abusers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--polite-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=0.02, chunks=5)
+    try:
+        for backend in ('memory', 'sqlite'):
+            print(f"backend={backend}")
+            run(make_app(stub.base_url, backend), args.abusers, args.duration, args.polite_interval)
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
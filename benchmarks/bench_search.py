@@ -0,0 +1,118 @@
+"""
+Compare `/api/chat/search` backed by the SQLite FTS5 index against a
+`LIKE '%term%'` scan over a large chat history.
+
+Messages are generated from a medical vocabulary with a rare term in about
+0.1% of them and a common term in about 5%, so both selective and broad
+queries are measured. Rows are inserted through the sync triggers, which
+also shows their write cost.
+
+    python -m benchmarks.bench_search --messages 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from backend import create_app, db
+from backend.config import Config
+from backend.models import ChatMessage
+from backend.services.search import MessageSearch, search_terms
+from benchmarks.seed import create_user
+
+VOCABULARY = (
+    "blood pressure heart rate sleep hygiene exercise diet sugar insulin dose tablet morning evening "
+    "headache fever cough allergy rash fatigue dizziness nausea vitamin water stress anxiety appointment "
+    "doctor nurse clinic symptoms treatment medication side effects daily weekly pain joint muscle back"
+).split()
+RARE_TERM = 'metformin'
+COMMON_TERM = 'ibuprofen'
+
+QUERIES = {
+    'rare term': RARE_TERM,
+    'common term': COMMON_TERM,
+    'two terms': f'{COMMON_TERM} headache',
+    'no match': 'warfarin'
+}
+
+
+def make_content(rng):
+    words = rng.choices(VOCABULARY, k=rng.randint(8, 40))
+    roll = rng.random()
+    if roll < 0.001:
+        words.insert(rng.randrange(len(words)), RARE_TERM)
+    elif roll < 0.051:
+        words.insert(rng.randrange(len(words)), COMMON_TERM)
+    return ' '.join(words)
+
+
+def seed(user_ids, count, batch_size=10000):
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(seconds=count)
+    table = ChatMessage.__table__
+    for offset in range(0, count, batch_size):
+        db.session.execute(table.insert(), [
+            {
+                'user_id': user_ids[i % len(user_ids)],
+                'content': make_content(rng),
+                'is_bot': i % 2 == 1,
+                'timestamp': start + timedelta(seconds=i)
+            }
+            for i in range(offset, min(offset + batch_size, count))
+        ])
+        db.session.commit()
+
+
+def measure(search, user_id, query, limit, iterations):
+    terms = search_terms(query)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        results, _ = search.search(db.session, user_id, terms, limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FTS5 vs LIKE chat search benchmark')
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1, help='Users the messages are spread across')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_search.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        RATE_LIMIT_ENABLED = False
+        METRICS_ENABLED = False
+
+    app = create_app(BenchConfig)
+    fts_search = app.extensions['message_search']
+    if not fts_search.fts:
+        raise SystemExit('This SQLite build has no FTS5 support')
+    like_search = MessageSearch(fts=False)
+
+    with app.app_context():
+        user_ids = [create_user(f"search-user-{i}") for i in range(args.users)]
+        start = time.perf_counter()
+        seed(user_ids, args.messages)
+        print(f"Seeded {args.messages} messages for {args.users} user(s) with FTS triggers "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('optimize')")
+
+        for label, query in QUERIES.items():
+            fts_ms, fts_count = measure(fts_search, user_ids[0], query, args.limit, args.iterations)
+            like_ms, like_count = measure(like_search, user_ids[0], query, args.limit, args.iterations)
+            print(f"{label:12s} q={query!r:22s} fts p50={fts_ms:9.2f}ms ({fts_count:2d} hits)  "
+                  f"like p50={like_ms:9.2f}ms ({like_count:2d} hits)  speedup={like_ms / fts_ms:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Fire N identical concurrent `/api/chat/message` requests and count how many
+upstream completions the stub receives. With request coalescing enabled
+exactly one upstream call should be made.
+
+    python -m benchmarks.bench_single_flight --clients 50 --latency 0.5
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.bench_stream import make_app
+from benchmarks.stub_upstream import start_stub_server
+
+
+def fire(app, clients, message):
+    barrier = threading.Barrier(clients)
+    statuses = []
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/api/chat/message', json={'message': message})
+        with lock:
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Single-flight coalescing check')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    for coalesce in (False, True):
+        stub = start_stub_server(latency=args.latency)
+        try:
+            app = make_app(stub.base_url)
+            app.extensions.pop('response_cache', None)  # Measure coalescing alone
+            service = app.extensions['openai_service']
+            if not coalesce:
+                service.inflight = None
+
+            statuses, elapsed = fire(app, args.clients, 'What is a normal blood pressure?')
+            upstream_calls = stub.stats()['requests']
+            ok = sum(1 for status in statuses if status == 200)
+            print(f"coalesce={str(coalesce):5s} clients={args.clients} ok={ok} "
+                  f"upstream_calls={upstream_calls} wall={elapsed * 1000:.0f}ms")
+            if coalesce and upstream_calls != 1:
+                raise SystemExit(f"expected 1 upstream call, got {upstream_calls}")
+        finally:
+            stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
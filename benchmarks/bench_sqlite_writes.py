@@ -0,0 +1,194 @@
+"""
+Measure write throughput and the rate of "database is locked" failures of
+concurrent chat traffic against one SQLite file, with SQLite's default
+rollback journal (as before the connection pragmas were set) and with the
+production pragmas (WAL, synchronous=NORMAL, busy timeout, mmap).
+
+Several worker processes, like gunicorn workers, each run threads that
+loop saving an exchange, reading the latest history page and deleting a
+message every few iterations. The `http` workload goes through the routes
+with a stub upstream that answers immediately; a message whose exchange
+could not be saved is still answered, without a message id, and counts as
+a failed write. The `direct` workload calls `save_exchange` and runs the
+history query itself, so the database is the only contended resource.
+
+    python -m benchmarks.bench_sqlite_writes --processes 4 --threads 4 --duration 10
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from backend import create_app, db
+from backend.config import Config
+from backend.models import ChatMessage, User
+from backend.services.message_writer import save_exchange
+from benchmarks.seed import BENCHMARK_PASSWORD, create_user
+from benchmarks.stub_upstream import start_stub_server
+
+MODES = {
+    'rollback journal': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT_MS': 5000,  # sqlite3's default timeout
+        'SQLITE_MMAP_SIZE': 0
+    },
+    'wal': {},  # The Config defaults
+}
+
+DELETE_EVERY = 5
+
+
+def make_config(path, base_url, overrides):
+    return type('BenchConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'OPENAI_API_KEY': 'stub-key',
+        'OPENAI_BASE_URL': base_url,
+        'RATE_LIMIT_ENABLED': False,
+        'RESPONSE_CACHE_BACKEND': 'none',
+        'METRICS_ENABLED': False,
+        'SLOW_REQUEST_THRESHOLD_MS': 0,
+        'OPENAI_MAX_CONCURRENT_REQUESTS': 64,
+        **overrides
+    })
+
+
+def run_client(app, username, deadline, counts, lock):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': username, 'password': BENCHMARK_PASSWORD})
+    local = {'requests': 0, 'writes': 0, 'errors': 0, 'locked': 0, 'unsaved': 0}
+
+    def record(response):
+        local['requests'] += 1
+        if response.status_code == 200:
+            return True
+        local['errors'] += 1
+        local['locked'] += 'locked' in response.get_data(as_text=True)
+        return False
+
+    iteration = 0
+    while time.monotonic() < deadline:
+        iteration += 1
+        response = client.post('/api/chat/message', json={'message': f'{username} question {iteration}'})
+        if record(response):
+            # The reply is still sent when saving it fails, with no message id
+            if response.get_json()['message_id']:
+                local['writes'] += 1
+            else:
+                local['unsaved'] += 1
+        history = client.get('/api/chat/history?limit=20')
+        if record(history) and iteration % DELETE_EVERY == 0:
+            messages = history.get_json()['history']
+            if messages and record(client.delete(f"/api/chat/message/{messages[0]['id']}")):
+                local['writes'] += 1
+    with lock:
+        for key, value in local.items():
+            counts[key] = counts.get(key, 0) + value
+
+
+def run_direct(app, username, deadline, counts, lock):
+    local = {'requests': 0, 'writes': 0, 'errors': 0, 'locked': 0, 'unsaved': 0}
+    with app.app_context():
+        user_id = db.session.execute(select(User.id).where(User.username == username)).scalar_one()
+        conversation_id = None
+        iteration = 0
+        while time.monotonic() < deadline:
+            iteration += 1
+            local['requests'] += 1
+            try:
+                _, conversation_id = save_exchange(user_id, f'{username} question {iteration}', 'answer',
+                                                   conversation_id)
+                local['writes'] += 1
+                latest = db.session.execute(
+                    select(ChatMessage).where(ChatMessage.user_id == user_id)
+                    .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(20)
+                ).scalars().all()
+                if iteration % DELETE_EVERY == 0 and latest:
+                    db.session.delete(latest[-1])
+                    db.session.commit()
+                    local['writes'] += 1
+            except OperationalError as e:
+                db.session.rollback()
+                local['errors'] += 1
+                local['locked'] += 'locked' in str(e)
+    with lock:
+        for key, value in local.items():
+            counts[key] = counts.get(key, 0) + value
+
+
+WORKLOADS = {'http': run_client, 'direct': run_direct}
+
+
+def worker(path, base_url, overrides, workload, usernames, start_at, duration, results):
+    app = create_app(make_config(path, base_url, dict(overrides, AUTO_MIGRATE=False)))
+    app.extensions['openai_service'].client  # Load the SDK before the clock starts
+    counts, lock = {}, threading.Lock()
+    time.sleep(max(0.0, start_at - time.time()))  # Start every process together
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=WORKLOADS[workload], args=(app, username, deadline, counts, lock))
+               for username in usernames]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(counts)
+
+
+def run_mode(overrides, workload, base_url, processes, threads, duration):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_sqlite_writes.db')
+    app = create_app(make_config(path, base_url, overrides))
+    usernames = [[f'writer-{p}-{t}' for t in range(threads)] for p in range(processes)]
+    with app.app_context():
+        for names in usernames:
+            for username in names:
+                create_user(username)
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + 3.0  # Leave time for the children to import and build their apps
+    children = [
+        context.Process(target=worker,
+                        args=(path, base_url, overrides, workload, names, start_at, duration, results))
+        for names in usernames
+    ]
+    for child in children:
+        child.start()
+    totals = {'requests': 0, 'writes': 0, 'errors': 0, 'locked': 0, 'unsaved': 0}
+    for _ in children:
+        for key, value in results.get().items():
+            totals[key] += value
+    for child in children:
+        child.join()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite concurrent write benchmark')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='Client threads per process')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode')
+    parser.add_argument('--workload', choices=sorted(WORKLOADS), nargs='+', default=['direct', 'http'])
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=0)
+    try:
+        for workload in args.workload:
+            for mode, overrides in MODES.items():
+                totals = run_mode(overrides, workload, stub.base_url, args.processes, args.threads, args.duration)
+                failed = totals['errors'] + totals['unsaved']
+                print(f"{workload:6s} {mode:16s} writes/s={totals['writes'] / args.duration:8.1f}  "
+                      f"requests={totals['requests']:6d}  failed={failed:5d} "
+                      f"({failed / max(totals['requests'], 1) * 100:5.2f}%: {totals['unsaved']} exchanges not saved, "
+                      f"{totals['locked']} database is locked)")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Measure worker cold start: the time to import the backend package, to run
+`create_app`, and from spawning a fresh server process to its first
+healthy `/api/health` response.
+
+Each mode starts new interpreters against one already-migrated SQLite
+database:
+
+    eager         the upstream SDK and numpy imported up front, as every
+                  worker did before they were loaded lazily, and
+                  migrations checked at startup
+    auto-migrate  lazy imports, migrations checked at startup (AUTO_MIGRATE on)
+    fast          lazy imports, AUTO_MIGRATE off; migrations run once per
+                  deploy with `python -m backend.migrations`
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child: time the import and create_app, report, then serve
+SERVER = """
+import json, sys, time
+started = time.perf_counter()
+if sys.argv[2] == 'eager':
+    import openai, numpy
+import backend
+imported = time.perf_counter()
+app = backend.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'openai_loaded': 'openai' in sys.modules,
+    'modules': len(sys.modules)
+}), flush=True)
+from werkzeug.serving import make_server
+make_server('127.0.0.1', int(sys.argv[1]), app, threaded=True).serve_forever()
+"""
+
+MODES = {
+    'eager': {'AUTO_MIGRATE': 'true'},
+    'auto-migrate': {'AUTO_MIGRATE': 'true'},
+    'fast': {'AUTO_MIGRATE': 'false'},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.005)
+    raise SystemExit(f'No healthy response within {timeout}s')
+
+
+def start_once(mode, env, timeout):
+    port = free_port()
+    spawned = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-c', SERVER, str(port), mode], cwd=ROOT, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        wait_healthy(port, timeout)
+        healthy_ms = (time.perf_counter() - spawned) * 1000
+        report = json.loads(child.stdout.readline())
+    finally:
+        child.terminate()
+        child.wait()
+    report['healthy_ms'] = healthy_ms
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker startup benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_startup.db')
+    base_env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', PYTHONPATH=ROOT, METRICS_ENABLED='false')
+    subprocess.run([sys.executable, '-m', 'backend.migrations'], cwd=ROOT, env=base_env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    for mode, overrides in MODES.items():
+        env = dict(base_env, **overrides)
+        start_once(mode, env, args.timeout)  # Warm the OS page cache
+        reports = [start_once(mode, env, args.timeout) for _ in range(args.runs)]
+        medians = {key: statistics.median(report[key] for report in reports)
+                   for key in ('import_ms', 'create_app_ms', 'healthy_ms')}
+        print(f"{mode:12s} import={medians['import_ms']:7.1f}ms  create_app={medians['create_app_ms']:7.1f}ms  "
+              f"spawn to healthy={medians['healthy_ms']:7.1f}ms  openai loaded={reports[0]['openai_loaded']}  "
+              f"modules={reports[0]['modules']}")
+
+
+if __name__ == '__main__':
+    main()
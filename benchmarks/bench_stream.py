@@ -0,0 +1,73 @@
+"""
+Compare time-to-first-token of `/api/chat/stream` against the blocking
+`/api/chat/message` endpoint using the local stub upstream.
+
+    python -m benchmarks.bench_stream --latency 0.3 --chunk-delay 0.05 --chunks 40
+"""
+import argparse
+import statistics
+import time
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.stub_upstream import start_stub_server
+
+
+def make_app(base_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        OPENAI_API_KEY = 'stub-key'
+        OPENAI_BASE_URL = base_url
+        RATE_LIMIT_ENABLED = False
+
+    return create_app(BenchConfig)
+
+
+def time_blocking(client):
+    start = time.perf_counter()
+    response = client.post('/api/chat/message', json={'message': 'What is a normal blood pressure?'})
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return elapsed, elapsed
+
+
+def time_streaming(client):
+    start = time.perf_counter()
+    response = client.post('/api/chat/stream', json={'message': 'What is a normal blood pressure?'},
+                           buffered=False)
+    first_token = None
+    for frame in response.response:
+        if first_token is None and b'"delta"' in frame:
+            first_token = time.perf_counter() - start
+    total = time.perf_counter() - start
+    response.close()
+    assert first_token is not None, 'no delta frames received'
+    return first_token, total
+
+
+def report(name, samples):
+    ttft = [s[0] * 1000 for s in samples]
+    total = [s[1] * 1000 for s in samples]
+    print(f"{name:10s} first byte p50={statistics.median(ttft):8.1f}ms  "
+          f"total p50={statistics.median(total):8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming time-to-first-token benchmark')
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--chunk-delay', type=float, default=0.05)
+    parser.add_argument('--chunks', type=int, default=40)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=args.latency, chunk_delay=args.chunk_delay, chunks=args.chunks)
+    try:
+        client = make_app(stub.base_url).test_client()
+        report('message', [time_blocking(client) for _ in range(args.iterations)])
+        report('stream', [time_streaming(client) for _ in range(args.iterations)])
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Measure history polling throughput with and without the session user
+cache, counting SQL statements per request.
+
+    python -m benchmarks.bench_user_cache --polls 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from backend import create_app, db
+from backend.config import Config
+from benchmarks.seed import BENCHMARK_PASSWORD, create_user, seed_messages
+
+
+def run(cache_enabled, polls):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_user_cache.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        USER_CACHE_ENABLED = cache_enabled
+        METRICS_ENABLED = False
+        SLOW_REQUEST_THRESHOLD_MS = 0
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        seed_messages(create_user('poller'), 200)
+        statements = [0]
+        event.listen(db.engine, 'after_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'poller', 'password': BENCHMARK_PASSWORD})
+    statements[0] = 0
+
+    start = time.perf_counter()
+    for _ in range(polls):
+        response = client.get('/api/chat/history?limit=20')
+        assert response.status_code == 200
+    elapsed = time.perf_counter() - start
+
+    label = 'cached user' if cache_enabled else 'query per request'
+    print(f"{label:18s} polls/s={polls / elapsed:8.1f}  mean={elapsed / polls * 1000:6.2f}ms  "
+          f"sql/request={statements[0] / polls:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session user cache benchmark')
+    parser.add_argument('--polls', type=int, default=2000)
+    args = parser.parse_args()
+
+    for cache_enabled in (False, True):
+        run(cache_enabled, args.polls)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare synchronous and write-behind persistence of chat messages under
+concurrent load against a SQLite file database.
+
+    python -m benchmarks.bench_write_behind --clients 16 --requests 50
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from backend import create_app, db
+from backend.config import Config
+from backend.models import ChatMessage
+from benchmarks.seed import create_user
+from benchmarks.stub_upstream import start_stub_server
+
+
+def run(write_behind, base_url, clients, requests_per_client):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_write_behind.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        OPENAI_API_KEY = 'stub-key'
+        OPENAI_BASE_URL = base_url
+        RESPONSE_CACHE_BACKEND = 'none'
+        OPENAI_COALESCE_REQUESTS = False
+        OPENAI_MAX_CONCURRENT_REQUESTS = clients
+        CHAT_WRITE_BEHIND = write_behind
+        RATE_LIMIT_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        create_user('writer-bench')
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        client.post('/api/auth/login', json={'username': 'writer-bench', 'password': 'benchmark-password'})
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            response = client.post('/api/chat/message', json={'message': f"question {i}"})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200 or not response.get_json()['message_id']:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    writer = app.extensions.get('message_writer')
+    if writer is not None:
+        writer.flush()
+        stats = writer.stats()
+        writer.stop()
+    else:
+        stats = {}
+
+    with app.app_context():
+        saved = db.session.query(ChatMessage).count()
+
+    latencies.sort()
+    label = 'write-behind' if write_behind else 'synchronous'
+    print(f"{label:12s} p50={statistics.median(latencies):7.2f}ms p95={latencies[int(len(latencies) * 0.95) - 1]:7.2f}ms "
+          f"rps={len(latencies) / wall:7.1f} errors={len(errors)} saved={saved} "
+          f"max_batch={stats.get('max_batch_size', '-')} batches={stats.get('batches_written', '-')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write-behind persistence benchmark')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    stub = start_stub_server(chunks=5)
+    try:
+        for write_behind in (False, True):
+            run(write_behind, stub.base_url, args.clients, args.requests)
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+End-to-end load test of the Flask app against the local stub upstream.
+
+Serves the app built by `create_app` over real HTTP (or targets `--url`),
+drives each endpoint with concurrent clients, and reports p50/p95/p99
+latency, requests per second and error rate per endpoint. Results are
+written as JSON so releases can be compared.
+
+    python -m benchmarks.loadtest --scale 100k --concurrency 16 --requests 50 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.seed import BENCHMARK_PASSWORD, SCALES, seed_users
+from benchmarks.stub_upstream import start_stub_server
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that skips per-request access logging"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(pct / 100.0 * len(samples))) - 1))
+    return samples[index]
+
+
+def login(session, base_url, username):
+    return session.post(f"{base_url}/api/auth/login",
+                        json={'username': username, 'password': BENCHMARK_PASSWORD})
+
+
+def send_message(session, base_url, i):
+    return session.post(f"{base_url}/api/chat/message", json={'message': f"Benchmark question {i} {time.time()}"})
+
+
+def stream_message(session, base_url, i):
+    response = session.post(f"{base_url}/api/chat/stream", json={'message': f"Benchmark stream {i} {time.time()}"},
+                            stream=True)
+    for _ in response.iter_content(chunk_size=None):
+        pass
+    return response
+
+
+def history_page(session, base_url, i):
+    return session.get(f"{base_url}/api/chat/history", params={'limit': 50})
+
+
+ENDPOINTS = {
+    'login': None,  # Handled specially: every request is a fresh login
+    'message': send_message,
+    'stream': stream_message,
+    'history': history_page
+}
+
+
+def run_endpoint(name, base_url, usernames, concurrency, requests_per_client):
+    """Drive one endpoint with `concurrency` clients and collect latencies"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def client(index):
+        nonlocal errors
+        session = requests.Session()
+        username = usernames[index % len(usernames)]
+        if name != 'login':
+            login(session, base_url, username)
+        barrier.wait()
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                if name == 'login':
+                    response = login(requests.Session(), base_url, username)
+                else:
+                    response = ENDPOINTS[name](session, base_url, i)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'error_rate': errors / len(latencies) if latencies else 0.0,
+        'rps': len(latencies) / wall if wall else 0.0,
+        'mean_ms': statistics.mean(latencies) if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def serve_app(args, stub_url):
+    """Build, seed and serve the app on a random local port"""
+    path = os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        OPENAI_API_KEY = 'stub-key'
+        OPENAI_BASE_URL = stub_url
+        OPENAI_MAX_CONCURRENT_REQUESTS = max(args.concurrency, 10)
+        RATE_LIMIT_ENABLED = args.rate_limit
+
+    app = create_app(LoadTestConfig)
+    with app.app_context():
+        usernames = seed_users(args.users, SCALES[args.scale])
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", usernames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test')
+    parser.add_argument('--url', help='Target an already running backend instead of serving one locally')
+    parser.add_argument('--endpoints', default='login,message,stream,history',
+                        help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k', help='Chat history seeded before the run')
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=25, help='Requests per client per endpoint')
+    parser.add_argument('--upstream-latency', type=float, default=0.2)
+    parser.add_argument('--upstream-chunk-delay', type=float, default=0.01)
+    parser.add_argument('--upstream-chunks', type=int, default=50, help='Tokens per stub completion')
+    parser.add_argument('--rate-limit', action='store_true', help='Keep rate limiting enabled')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    stub = server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        usernames = [f"bench-user-{i}" for i in range(args.users)]
+    else:
+        stub = start_stub_server(latency=args.upstream_latency, chunk_delay=args.upstream_chunk_delay,
+                                 chunks=args.upstream_chunks)
+        server, base_url, usernames = serve_app(args, stub.base_url)
+
+    results = {}
+    try:
+        for name in args.endpoints.split(','):
+            result = run_endpoint(name, base_url, usernames, args.concurrency, args.requests)
+            results[name] = result
+            print(f"{name:8s} requests={result['requests']:5d} rps={result['rps']:8.1f} "
+                  f"p50={result['p50_ms']:8.1f}ms p95={result['p95_ms']:8.1f}ms p99={result['p99_ms']:8.1f}ms "
+                  f"errors={result['error_rate']:.1%}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        if stub is not None:
+            stub.shutdown()
+
+    if args.output:
+        report = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'parameters': vars(args),
+            'endpoints': results
+        }
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
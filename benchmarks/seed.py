@@ -0,0 +1,95 @@
+"""
+Seed users and chat history for benchmarks.
+
+Run standalone against any database URL:
+
+    python -m benchmarks.seed --database sqlite:////tmp/bench.db --scale 100k --users 10
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from backend import db
+from backend.models import ChatMessage, User
+
+# Total chat messages seeded for each named scale
+SCALES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000
+}
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def create_user(username, password=BENCHMARK_PASSWORD):
+    """Create a user and return its id"""
+    user = User(username=username, email=f"{username}@example.com")
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def seed_messages(user_id, count, batch_size=10000, start=None):
+    """
+    Bulk insert `count` alternating user/bot messages for a user.
+
+    Rows are inserted with executemany in batches so seeding millions of
+    messages stays fast and does not hydrate ORM objects.
+    """
+    start = start or datetime.utcnow() - timedelta(seconds=count)
+    table = ChatMessage.__table__
+    for offset in range(0, count, batch_size):
+        rows = [
+            {
+                'user_id': user_id,
+                'content': f"Message {i} about blood pressure, metformin and sleep hygiene",
+                'is_bot': i % 2 == 1,
+                'timestamp': start + timedelta(seconds=i)
+            }
+            for i in range(offset, min(offset + batch_size, count))
+        ]
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def seed_users(count, messages, prefix='bench-user'):
+    """
+    Create `count` users named `<prefix>-<n>` and spread `messages` chat
+    messages evenly across them.
+
+    Returns:
+        list: The usernames created
+    """
+    usernames = [f"{prefix}-{i}" for i in range(count)]
+    per_user, remainder = divmod(messages, count) if count else (0, 0)
+    for i, username in enumerate(usernames):
+        user_id = create_user(username)
+        seed_messages(user_id, per_user + (1 if i < remainder else 0))
+    return usernames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed benchmark users and chat history')
+    parser.add_argument('--database', required=True, help='SQLAlchemy database URL')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k', help='Total chat messages to seed')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--prefix', default='bench-user')
+    args = parser.parse_args()
+
+    from backend import create_app
+    from backend.config import Config
+
+    class SeedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database
+
+    app = create_app(SeedConfig)
+    start = time.perf_counter()
+    with app.app_context():
+        seed_users(args.users, SCALES[args.scale], args.prefix)
+    print(f"Seeded {args.users} users and {SCALES[args.scale]} messages in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
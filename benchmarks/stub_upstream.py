@@ -0,0 +1,223 @@
+"""
+Local OpenAI-compatible stub server for benchmarks.
+
+Serves `POST /v1/chat/completions` (streaming and non-streaming) with
+configurable latency so the backend can be exercised without calling the
+real API. Point the backend at it with `OPENAI_BASE_URL=http://host:port/v1`.
+
+Faults can be injected: a fraction of requests (`error_rate`) or the next
+N requests (`fail_requests`) answer with `error_status`, and `hang` adds a
+delay to every request to provoke client timeouts.
+
+Run standalone:
+
+    python -m benchmarks.stub_upstream --port 8001 --latency 0.2 --chunk-delay 0.05
+"""
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubUpstreamHandler(BaseHTTPRequestHandler):
+    """Request handler emulating the chat completions endpoint"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Avoid Nagle/delayed-ACK stalls between headers and body writes
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        fault_status = self.server.record_request()
+
+        time.sleep(self.server.latency + self.server.hang)
+
+        if fault_status:
+            self._send_error(fault_status)
+            return
+
+        if body.get('stream'):
+            self._stream_completion(body)
+        else:
+            # Emulate the generation time a streamed reply would take
+            time.sleep(self.server.chunk_delay * max(self.server.chunks - 1, 0))
+            self._send_json(200, self._completion(body))
+
+    def _send_error(self, status):
+        self._send_json(status, {'error': {'message': f"Injected fault {status}", 'type': 'stub_error'}},
+                        {'Retry-After': '1'} if status == 429 else None)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _tokens(self):
+        return [f"token{i} " for i in range(self.server.chunks)]
+
+    def _completion(self, body):
+        tokens = self._tokens()
+        return {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': sum(len(m.get('content', '').split()) for m in body.get('messages', [])),
+                'completion_tokens': len(tokens),
+                'total_tokens': 0
+            }
+        }
+
+    def _stream_completion(self, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.server.chunk_delay)
+            self._write_chunk(completion_id, body, {'content': token}, None)
+        self._write_chunk(completion_id, body, {}, 'stop')
+        self._write_raw(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, completion_id, body, delta, finish_reason):
+        chunk = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+        }
+        self._write_raw(f"data: {json.dumps(chunk)}\n\n".encode())
+
+    def _write_raw(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubUpstreamServer(ThreadingHTTPServer):
+    """Threaded stub server holding the latency configuration and counters"""
+    daemon_threads = True
+    request_queue_size = 1024  # Accept bursts of hundreds of concurrent clients
+
+    def __init__(self, address, latency=0.0, chunk_delay=0.0, chunks=20,
+                 error_rate=0.0, error_status=500, fail_requests=0, hang=0.0):
+        super().__init__(address, StubUpstreamHandler)
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunks = chunks
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_requests = fail_requests
+        self.hang = hang
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._faults = 0
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close the connection mid-response
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def configure(self, **options):
+        """Change latency or fault settings while the server is running"""
+        with self._lock:
+            for name, value in options.items():
+                if not hasattr(self, name):
+                    raise AttributeError(f"Unknown stub option: {name}")
+                setattr(self, name, value)
+
+    def record_request(self):
+        """Count a request and return the status of an injected fault, if any"""
+        with self._lock:
+            self._requests += 1
+            if self.fail_requests > 0:
+                self.fail_requests -= 1
+            elif not (self.error_rate and random.random() < self.error_rate):
+                return None
+            self._faults += 1
+            return self.error_status
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self._requests, 'faults': self._faults}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_stub_server(host='127.0.0.1', port=0, **options):
+    """
+    Start a stub server in a background thread.
+
+    Returns:
+        StubUpstreamServer: The running server; call `shutdown()` to stop it
+    """
+    server = StubUpstreamServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before the first byte')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='Seconds between streamed chunks')
+    parser.add_argument('--chunks', type=int, default=20, help='Number of tokens per completion')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP status of injected failures')
+    parser.add_argument('--hang', type=float, default=0.0, help='Extra seconds added to every request')
+    args = parser.parse_args()
+
+    server = StubUpstreamServer((args.host, args.port), latency=args.latency,
+                                chunk_delay=args.chunk_delay, chunks=args.chunks,
+                                error_rate=args.error_rate, error_status=args.error_status,
+                                hang=args.hang)
+    print(f"Stub upstream listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
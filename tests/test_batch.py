@@ -0,0 +1,46 @@
+import pytest
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.stub_upstream import start_stub_server
+
+
+@pytest.fixture
+def client():
+    stub = start_stub_server()
+    try:
+        class TestConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite://'
+            OPENAI_API_KEY = 'stub-key'
+            OPENAI_BASE_URL = stub.base_url
+            RESPONSE_CACHE_BACKEND = 'none'
+
+        yield create_app(TestConfig).test_client()
+    finally:
+        stub.shutdown()
+
+
+def test_largest_batch_fits_the_default_rate_limit(client):
+    items = Config.CHAT_BATCH_MAX_ITEMS
+    assert items > Config.RATE_LIMIT_BURST
+
+    response = client.post('/api/chat/batch', json={'messages': [f'Question {i}?' for i in range(items)]})
+    assert response.status_code == 200, response.get_json()
+    assert [result['status'] for result in response.get_json()['results']] == [200] * items
+
+    # The batch spent one request token, leaving the rest for chat
+    assert client.post('/api/chat/message', json={'message': 'And one more?'}).status_code == 200
+
+
+def test_batch_items_are_rate_limited(client):
+    items = Config.CHAT_BATCH_MAX_ITEMS
+    assert client.post('/api/chat/batch', json={'messages': ['Question?'] * items}).status_code == 200
+
+    response = client.post('/api/chat/batch', json={'messages': ['Question?'] * items})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+
+@pytest.mark.parametrize('body', [['Question?'], 'Question?', 42])
+def test_batch_rejects_bodies_that_are_not_objects(client, body):
+    assert client.post('/api/chat/batch', json=body).status_code == 400
@@ -0,0 +1,72 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import create_app
+from backend.config import Config
+from backend.models import db, ChatJob
+from backend.services.conversations import create_conversation
+from benchmarks.seed import create_user
+from benchmarks.stub_upstream import start_stub_server
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    stub = start_stub_server()
+    runners = []
+
+    def make_app(workers):
+        class TestConfig(Config):
+            # A file, as the job workers use their own connections
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'jobs.db'}"
+            OPENAI_API_KEY = 'stub-key'
+            OPENAI_BASE_URL = stub.base_url
+            RATE_LIMIT_ENABLED = False
+            RESPONSE_CACHE_BACKEND = 'none'
+            CHAT_JOBS_WORKERS = workers
+            CHAT_JOBS_POLL_INTERVAL = 0.05
+
+        app = create_app(TestConfig)
+        runners.append(app.extensions.get('chat_job_runner'))
+        return app
+
+    yield make_app
+    for runner in runners:
+        if runner is not None:
+            runner.stop()
+    stub.shutdown()
+
+
+def wait_until_finished(app, job_ids, timeout=10):
+    deadline = time.monotonic() + timeout
+    with app.app_context():
+        while True:
+            statuses = [db.session.get(ChatJob, job_id).status for job_id in job_ids]
+            if all(status in ChatJob.FINISHED for status in statuses) or time.monotonic() > deadline:
+                return statuses
+            db.session.rollback()
+            time.sleep(0.05)
+
+
+def test_runner_starts_only_with_unfinished_jobs(make_app):
+    assert 'chat_job_runner' not in make_app(workers=1).extensions
+
+
+def test_unfinished_jobs_are_resumed_at_startup(make_app):
+    # A process without workers stands in for one that died mid-job
+    app = make_app(workers=0)
+    with app.app_context():
+        user_id = create_user('job-user')
+        conversation_id = create_conversation(user_id, 'First question').id
+        queued = ChatJob(user_id=user_id, conversation_id=conversation_id, message='Queued question?')
+        orphaned = ChatJob(user_id=user_id, conversation_id=conversation_id, message='Orphaned question?',
+                           status=ChatJob.RUNNING, attempts=1, lease_owner='dead-worker',
+                           lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+        db.session.add_all([queued, orphaned])
+        db.session.commit()
+        job_ids = [queued.id, orphaned.id]
+
+    restarted = make_app(workers=1)
+    assert restarted.extensions.get('chat_job_runner') is not None
+    assert wait_until_finished(restarted, job_ids) == [ChatJob.SUCCEEDED, ChatJob.SUCCEEDED]
@@ -0,0 +1,49 @@
+import json
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.bench_export import current_rss
+from benchmarks.seed import BENCHMARK_PASSWORD, create_user, seed_messages
+
+MESSAGES = 100000
+# The export is about 17 MiB; holding it, or all its rows, would exceed this
+MAX_RSS_GROWTH = 8 * 1024 * 1024
+
+
+def test_export_streams_large_history_in_flat_memory(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'export.db'}"
+        RATE_LIMIT_ENABLED = False
+        METRICS_ENABLED = False
+        CHAT_EXPORT_BATCH_SIZE = 1000
+        # Pages of a memory-mapped database file count towards RSS
+        SQLITE_MMAP_SIZE = 0
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        user_id = create_user('export-test')
+        seed_messages(user_id, MESSAGES)
+
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'export-test', 'password': BENCHMARK_PASSWORD})
+
+    baseline = peak = current_rss()
+    response = client.get('/api/chat/export', buffered=False)
+    assert response.status_code == 200
+    assert response.is_streamed
+
+    chunks = rows = size = 0
+    last = b''
+    for chunk in response.response:
+        chunks += 1
+        size += len(chunk)
+        rows += chunk.count(b'\n')
+        last = chunk
+        peak = max(peak, current_rss())
+    response.close()
+
+    assert rows == MESSAGES
+    assert chunks >= MESSAGES // TestConfig.CHAT_EXPORT_BATCH_SIZE
+    assert json.loads(last.splitlines()[-1])['content'].startswith(f"Message {MESSAGES - 1} ")
+    assert size > 2 * MAX_RSS_GROWTH
+    assert peak - baseline < MAX_RSS_GROWTH, f"RSS grew by {(peak - baseline) / 1024 / 1024:.1f} MiB"
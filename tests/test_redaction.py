@@ -0,0 +1,79 @@
+import pytest
+
+from backend.utils.redaction import Redaction, Redactor
+
+
+@pytest.fixture
+def redactor():
+    return Redactor()
+
+
+@pytest.mark.parametrize('text', [
+    'if a<b and c>d then what',
+    'glucose <140 and A1c >7',
+    'is 3<5 and 7>2?',
+    'a < b > c',
+])
+def test_comparison_operators_are_kept(redactor, text):
+    assert redactor.redact(text)[0] == text
+
+
+def test_html_tags_are_dropped(redactor):
+    text = '<p class="note">Take <b>two</b> tablets<br/></p><script src="x.js">alert(1)</script>'
+    assert redactor.redact(text)[0] == 'Take two tabletsalert(1)'
+
+
+def test_labelled_names_are_masked(redactor):
+    text, redaction = redactor.redact('My name is Jane Doe. Patient: John Smith. Dr. Gregory House')
+    assert text == 'My name is [NAME_1]. Patient: [NAME_2]. Dr. [NAME_3]'
+    assert redaction.restore(text) == 'My name is Jane Doe. Patient: John Smith. Dr. Gregory House'
+
+
+@pytest.mark.parametrize('text', ["I'm Fine today", 'I am Worried about this', 'This is Urgent'])
+def test_conversational_phrases_are_not_names(redactor, text):
+    assert redactor.redact(text)[0] == text
+
+
+@pytest.mark.parametrize('text', [
+    'BP readings 135 140 165 this week',
+    'Should I take 1000 1500 2000 mg',
+    'Platelets 150 000 450 000',
+    'WBC 4 500 11 000 per microliter',
+    'Potassium range 3.5-5.0, mine was 4.1',
+    'Dose 250 500 1000 mg on 12/05/2023',
+])
+def test_clinical_numbers_are_not_phone_numbers(redactor, text):
+    assert redactor.redact(text)[0] == text
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Call me on 555 123 4567', 'Call me on [PHONE_1]'),
+    ('Phone: 020 7946 0958', 'Phone: [PHONE_1]'),
+    ('Reach me at 555-123-4567', 'Reach me at [PHONE_1]'),
+    ('Reach me at (555) 123-4567', 'Reach me at [PHONE_1]'),
+    ('Reach me at +44 20 7946 0958', 'Reach me at [PHONE_1]'),
+    ('Reach me at 020 7946 0958', 'Reach me at [PHONE_1]'),
+])
+def test_phone_numbers_are_masked(redactor, text, expected):
+    assert redactor.redact(text)[0] == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Is the Mr Freeze diet safe?', 'Is the Mr Freeze diet safe?'),
+    ('Dr Gregory House said', 'Dr [NAME_1] said'),
+    ('Mr John Smith called', 'Mr [NAME_1] called'),
+    ('Ms. Jones called', 'Ms. [NAME_1] called'),
+])
+def test_titles_without_a_period_need_a_full_name(redactor, text, expected):
+    assert redactor.redact(text)[0] == expected
+
+
+def test_streamed_redaction_matches_whole_text(redactor):
+    text = ' '.join([
+        'if a<b and c>d, call 555-123-4567 or mail jane.doe@example.com.',
+        '<b>MRN: A1234567</b>, DOB 03/04/1985, glucose <140 and A1c >7.',
+    ] * 200)
+    whole = redactor.redact(text)[0]
+    for size in (1, 13, 1000):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert ''.join(redactor.redact_stream(chunks, Redaction())) == whole
@@ -0,0 +1,39 @@
+import pytest
+
+from benchmarks.bench_single_flight import fire
+from benchmarks.bench_stream import make_app
+from benchmarks.stub_upstream import start_stub_server
+
+CLIENTS = 20
+
+
+@pytest.fixture
+def stub():
+    stub = start_stub_server(latency=0.5)
+    yield stub
+    stub.shutdown()
+
+
+def make_uncached_app(stub):
+    app = make_app(stub.base_url)
+    app.extensions.pop('response_cache', None)  # Measure coalescing alone
+    return app
+
+
+def test_concurrent_identical_requests_make_one_upstream_call(stub):
+    app = make_uncached_app(stub)
+
+    statuses, _ = fire(app, CLIENTS, 'What is a normal blood pressure?')
+
+    assert statuses == [200] * CLIENTS
+    assert stub.stats()['requests'] == 1
+
+
+def test_without_coalescing_every_request_goes_upstream(stub):
+    app = make_uncached_app(stub)
+    app.extensions['openai_service'].inflight = None
+
+    statuses, _ = fire(app, CLIENTS, 'What is a normal blood pressure?')
+
+    assert statuses == [200] * CLIENTS
+    assert stub.stats()['requests'] == CLIENTS
@@ -0,0 +1,32 @@
+import pytest
+
+from benchmarks.bench_stream import make_app, time_blocking, time_streaming
+from benchmarks.stub_upstream import start_stub_server
+
+LATENCY = 0.1
+CHUNK_DELAY = 0.05
+CHUNKS = 20
+
+
+@pytest.fixture
+def client():
+    stub = start_stub_server(latency=LATENCY, chunk_delay=CHUNK_DELAY, chunks=CHUNKS)
+    try:
+        app = make_app(stub.base_url)
+        app.extensions.pop('response_cache', None)  # Every request goes upstream
+        yield app.test_client()
+    finally:
+        stub.shutdown()
+
+
+def test_first_token_arrives_before_the_full_response(client):
+    blocking, _ = time_blocking(client)
+    first_token, total = time_streaming(client)
+
+    generation = CHUNK_DELAY * (CHUNKS - 1)
+    assert blocking >= LATENCY + generation
+    # The first delta is sent as soon as the upstream produces it, not
+    # after the whole completion
+    assert first_token < LATENCY + generation / 2
+    assert first_token < blocking / 2
+    assert total >= LATENCY + generation
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from backend import create_app
+from backend.config import Config
+from benchmarks.stub_upstream import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    stub = start_stub_server(chunks=5)
+    yield stub
+    stub.shutdown()
+
+
+@pytest.fixture
+def client(stub):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        OPENAI_API_KEY = 'stub-key'
+        OPENAI_BASE_URL = stub.base_url
+        OPENAI_TIMEOUT = 0.5
+        OPENAI_MAX_RETRIES = 2
+        OPENAI_RETRY_BASE_DELAY = 0.01
+        OPENAI_RETRY_MAX_DELAY = 0.05
+        OPENAI_CIRCUIT_FAILURE_THRESHOLD = 3
+        OPENAI_CIRCUIT_RESET_TIMEOUT = 0.5
+        RESPONSE_CACHE_BACKEND = 'none'
+        RATE_LIMIT_ENABLED = False
+
+    return create_app(TestConfig).test_client()
+
+
+def send(client, text='What is a normal blood pressure?'):
+    start = time.perf_counter()
+    response = client.post('/api/chat/message', json={'message': text})
+    return response, (time.perf_counter() - start) * 1000
+
+
+def test_transient_errors_are_retried(stub, client):
+    stub.configure(fail_requests=2, error_status=500)
+    response, _ = send(client)
+    assert response.status_code == 200, response.get_json()
+    assert stub.stats()['requests'] == 3
+
+
+def test_auth_errors_are_not_retried(stub, client):
+    stub.configure(fail_requests=1, error_status=401)
+    response, _ = send(client)
+    assert response.status_code == 500
+    assert response.get_json()['error_type'] == 'service_error'
+    assert stub.stats()['requests'] == 1
+
+
+def test_rate_limits_return_503_with_retry_after(stub, client):
+    stub.configure(error_rate=1.0, error_status=429)
+    response, _ = send(client)
+    assert response.status_code == 503
+    assert response.headers.get('Retry-After')
+    assert stub.stats()['requests'] == 3
+
+
+def test_timeouts_return_504(stub, client):
+    stub.configure(hang=1.0)
+    response, _ = send(client)
+    assert response.status_code == 504
+
+
+def test_circuit_opens_and_recovers(stub, client):
+    stub.configure(error_rate=1.0, error_status=503)
+    response, _ = send(client)  # Three failed attempts trip the breaker
+    assert response.status_code == 502
+    calls = stub.stats()['requests']
+
+    response, elapsed = send(client)
+    assert response.status_code == 503
+    assert elapsed < 50
+    assert stub.stats()['requests'] == calls, 'an open circuit must not call the upstream'
+
+    stub.configure(error_rate=0.0)
+    time.sleep(0.6)
+    response, _ = send(client)  # The half-open probe succeeds
+    assert response.status_code == 200
+
+
+def test_genuine_replies_are_not_misread_as_errors(client):
+    # Replies are not scanned for phrases such as "contact support"
+    response, _ = send(client, 'contact support')
+    assert response.status_code == 200
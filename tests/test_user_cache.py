@@ -0,0 +1,39 @@
+from sqlalchemy import event
+
+from backend import create_app
+from backend.config import Config
+from backend.models import db, User
+from backend.services.user_cache import _invalidate_on_change
+
+
+class TestConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    OPENAI_API_KEY = 'stub-key'
+
+
+def test_listeners_do_not_accumulate_across_apps():
+    listeners = len(User.__mapper__.dispatch.after_update)
+    create_app(TestConfig)
+    create_app(TestConfig)
+    assert len(User.__mapper__.dispatch.after_update) == listeners
+    assert event.contains(User, 'after_update', _invalidate_on_change)
+
+
+def test_updates_and_deletes_invalidate_the_cached_user():
+    app = create_app(TestConfig)
+    cache = app.extensions['user_cache']
+    with app.app_context():
+        user = User(username='cached', email='cached@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        assert cache.load(user.id).username == 'cached'
+
+        user.username = 'renamed'
+        db.session.commit()
+        assert cache.get(user.id) is None
+        assert cache.load(user.id).username == 'renamed'
+
+        db.session.delete(user)
+        db.session.commit()
+        assert cache.get(user.id) is None